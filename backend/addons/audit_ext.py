@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Query
 from typing import List, Dict, Any, Optional
 import hashlib, json, time
+from .fast_json import FastJSONResponse
 
 router = APIRouter()
 AUDIT: List[Dict[str, Any]] = []
@@ -23,17 +24,19 @@ def append_audit(actor: str, action: str, resource: str, meta: Optional[Dict[str
     AUDIT.append(entry)
     return entry
 
-@router.get("/api/audit", tags=["audit"])
+@router.get("/api/audit", tags=["audit"], response_class=FastJSONResponse)
 def get_audit(limit: int = Query(10, ge=1, le=100)):
-    return {"items": AUDIT[-limit:], "count": len(AUDIT)}
+    return FastJSONResponse({"items": AUDIT[-limit:], "count": len(AUDIT)})
 
-@router.post("/api/audit/export", tags=["audit"])
+def _redact(e: Dict[str, Any]) -> Dict[str, Any]:
+    meta = e.get("meta") or {}
+    if not any(isinstance(v, str) and "@" in v for v in meta.values()):
+        return e  # serialized as-is, never mutated
+    c = dict(e)
+    c["meta"] = {k: "[redacted]" if isinstance(v, str) and "@" in v else v for k, v in meta.items()}
+    return c
+
+@router.post("/api/audit/export", tags=["audit"], response_class=FastJSONResponse)
 def export_audit():
-    redacted = []
-    for e in AUDIT:
-        c = json.loads(json.dumps(e))
-        for k, v in list(c.get("meta", {}).items()):
-            if isinstance(v, str) and "@" in v:
-                c["meta"][k] = "[redacted]"
-        redacted.append(c)
-    return {"items": redacted, "count": len(AUDIT), "strategy": "basic-email-redaction"}
+    return FastJSONResponse({"items": [_redact(e) for e in AUDIT], "count": len(AUDIT),
+                             "strategy": "basic-email-redaction"})
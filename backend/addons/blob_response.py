@@ -0,0 +1,75 @@
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from typing import Optional, Tuple
+import os, anyio
+
+CHUNK = 256 * 1024
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Single 'bytes=' range -> inclusive (start, end). None = serve whole file.
+    Raises ValueError when the range can't be satisfied (caller answers 416)."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None  # absent, foreign unit, or multi-range: full 200 is allowed
+    spec = header[6:].strip()
+    first, _, last = spec.partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                raise ValueError
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError("bad range")
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable")
+    return start, min(end, size - 1)
+
+class BlobResponse(Response):
+    """Serve a byte range of an immutable file.
+
+    Uses the ASGI `http.response.zerocopysend` extension (sendfile) when the server
+    offers it, `http.response.pathsend` for whole files, and falls back to chunked
+    reads otherwise.
+    """
+
+    def __init__(self, path: str, size: int, headers: dict, byte_range: Optional[Tuple[int, int]] = None):
+        self.path = path
+        self.background = None
+        self.start, self.end = byte_range if byte_range else (0, size - 1)
+        self.length = max(0, self.end - self.start + 1)
+        self.status_code = 206 if byte_range else 200
+        hdrs = dict(headers, **{"accept-ranges": "bytes", "content-length": str(self.length)})
+        if byte_range:
+            hdrs["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        self.raw_headers = [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in hdrs.items()]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        ext = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in ext:
+            fd = os.open(self.path, os.O_RDONLY)
+            try:
+                await send({"type": "http.response.zerocopysend", "file": fd,
+                            "offset": self.start, "count": self.length, "more_body": False})
+            finally:
+                os.close(fd)
+            return
+        if "http.response.pathsend" in ext and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = self.length
+            while remaining:
+                chunk = await f.read(min(CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
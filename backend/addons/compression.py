@@ -0,0 +1,140 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional, Sequence
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional dependency; gzip only without it
+    brotli = None
+
+COMPRESSIBLE = ("text/", "application/json", "application/javascript", "application/xml",
+                "image/svg+xml", "application/manifest+json")
+
+SUPPORTED = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose_encoding(accept_encoding: str, supported: Sequence[str] = SUPPORTED) -> Optional[str]:
+    """First of `supported` (in preference order) the Accept-Encoding header allows, honoring q=0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for enc in supported:
+        if accepted.get(enc, wildcard) > 0:
+            return enc
+    return None
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=brotli_quality)
+            self.compress, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+            self.compress, self._finish = self._c.compress, self._c.flush
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+class CompressionMiddleware:
+    """gzip/brotli for compressible responses of at least `minimum_size` bytes.
+
+    Responses that already carry Content-Encoding (e.g. precompressed static files), range-capable
+    blob responses and `exclude_paths` pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, exclude_paths: Sequence[str] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self, encoding)(scope, receive, send)
+
+class _Responder:
+    def __init__(self, mw: CompressionMiddleware, encoding: str):
+        self.mw = mw
+        self.encoding = encoding
+        self.start: Message = {}
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.mw.app(scope, receive, self.send_compressed)
+
+    def eligible(self) -> bool:
+        headers = Headers(raw=self.start["headers"])
+        if self.start["status"] in (204, 206, 304) or "content-encoding" in headers or "accept-ranges" in headers:
+            return False
+        ctype = headers.get("content-type", "").lower()
+        return ctype.startswith(COMPRESSIBLE) and not ctype.startswith("text/event-stream")
+
+    def rewrite_headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag  # the encoded bytes differ, so only a weak validator holds
+
+    async def send_compressed(self, message: Message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message  # held back until the first body chunk decides the encoding
+            return
+        if kind != "http.response.body":
+            if not self.started:
+                self.started = True
+                await self.send(self.start)
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            self.passthrough = not self.eligible() or (not more and len(body) < self.mw.minimum_size)
+            if self.passthrough:
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.encoder = _Encoder(self.encoding, self.mw.gzip_level, self.mw.brotli_quality)
+            if not more:
+                data = self.encoder.compress(body) + self.encoder.finish()
+                self.rewrite_headers(len(data))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            self.rewrite_headers(None)
+            await self.send(self.start)
+        elif self.passthrough:
+            await self.send(message)
+            return
+        data = self.encoder.compress(body)
+        if not more:
+            data += self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more})
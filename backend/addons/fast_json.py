@@ -0,0 +1,27 @@
+from starlette.responses import Response
+from typing import Any
+import json, os
+
+# FAST_JSON=0 forces the stdlib encoder even when orjson is installed.
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENGINE = "orjson" if orjson is not None and os.getenv("FAST_JSON", "1") != "0" else "stdlib"
+
+def dumps(content: Any) -> bytes:
+    if ENGINE == "orjson":
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response that skips `jsonable_encoder`.
+
+    Content must already be plain JSON types (dicts, lists, tuples, str/int/float/bool/None);
+    routes shape their rows into those before returning.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+from typing import Callable, Dict, Optional
+import importlib.util, os, json, pathlib, threading, multiprocessing
+
+# Pillow is optional; without it no variants are produced. It is imported by the pool workers
+# only, so the app process doesn't pay for it at startup.
+HAVE_PIL = importlib.util.find_spec("PIL") is not None
+
+IMAGE_MIMES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+VARIANT_SIZES = tuple(int(x) for x in os.getenv("IMAGE_VARIANT_SIZES", "64,256,1024").split(","))
+VARIANT_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("IMAGE_POOL_MAX_PENDING", "32"))
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+RETRY_AFTER = float(os.getenv("IMAGE_RETRY_AFTER_SEC", "300"))  # before a failed render is tried again
+
+def variant_dir(root: pathlib.Path, digest: str) -> pathlib.Path:
+    return root / "variants" / digest[:2] / digest
+
+def render_variants(src: str, out_dir: str, sizes=VARIANT_SIZES) -> Dict[str, Dict[str, str]]:
+    """Decode once, then write every size/format. Runs inside the process pool.
+
+    EXIF orientation is applied to the pixels and no metadata is written back, so
+    variants carry no EXIF/GPS data.
+    """
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    with Image.open(src) as im:
+        im.draft("RGB", (max(sizes), max(sizes)))  # JPEG: let libjpeg decode at reduced scale
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+        im.load()
+    manifest: Dict[str, Dict[str, str]] = {}
+    for size in sorted(sizes, reverse=True):
+        v = im.copy()
+        v.thumbnail((size, size), Image.LANCZOS)
+        files = {}
+        for ext, (fmt, opts) in VARIANT_FORMATS.items():
+            img = v.convert("RGB") if fmt == "JPEG" and v.mode != "RGB" else v
+            name = f"{size}.{ext}"
+            tmp = out / (name + ".tmp")
+            img.save(tmp, fmt, **opts)
+            os.replace(tmp, out / name)
+            files[ext] = name
+        manifest[str(size)] = files
+    (out / "manifest.json").write_text(json.dumps(manifest))
+    return manifest
+
+def read_manifest(root: pathlib.Path, digest: str) -> Optional[dict]:
+    p = variant_dir(root, digest) / "manifest.json"
+    try:
+        return json.loads(p.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+class VariantPool:
+    """Bounded process pool for image work; request threads only enqueue.
+
+    Results are keyed by content hash, so an image that already has a manifest
+    (or is being rendered) is never processed twice. `on_rendered(digest)` runs on the pool's
+    result thread after each successful render.
+
+    Nothing is queued beyond `max_pending`: an image turned away when the pool is full, or whose
+    render failed, is simply submitted again by the next reader that finds no manifest
+    (failures wait `retry_after` seconds first, so a broken image isn't decoded on every read).
+    """
+
+    def __init__(self, root: pathlib.Path, workers: int = POOL_WORKERS, max_pending: int = MAX_PENDING,
+                 on_rendered: Optional[Callable[[str], None]] = None, retry_after: float = RETRY_AFTER):
+        self.root = root
+        self.retry_after = retry_after
+        self.on_rendered = on_rendered
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight = set()
+        self._failed_at: Dict[str, float] = {}  # digest -> monotonic time of its last failed render
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return HAVE_PIL and self.workers > 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, digest: str, src: str) -> bool:
+        if not self.enabled or read_manifest(self.root, digest) is not None:
+            return False
+        with self._lock:
+            if digest in self._inflight or monotonic() - self._failed_at.get(digest, -self.retry_after) < self.retry_after:
+                return False
+            if len(self._inflight) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._inflight.add(digest)
+            fut = self._executor().submit(render_variants, src, str(variant_dir(self.root, digest)))
+        fut.add_done_callback(lambda f, d=digest: self._done(d, f))
+        return True
+
+    def _done(self, digest: str, fut):
+        with self._lock:
+            self._inflight.discard(digest)
+            ok = fut.exception() is None
+            if ok:
+                self.rendered += 1
+                self._failed_at.pop(digest, None)
+            else:
+                self.failed += 1
+                now = monotonic()
+                for d in [d for d, t in self._failed_at.items() if now - t >= self.retry_after]:
+                    del self._failed_at[d]  # due for a retry anyway; keeps the map to recent failures
+                self._failed_at[digest] = now
+        if ok and self.on_rendered is not None:
+            try:
+                self.on_rendered(digest)
+            except Exception:
+                pass  # a stale cache entry still expires with its TTL
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
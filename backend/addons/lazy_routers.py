@@ -0,0 +1,65 @@
+from starlette.routing import BaseRoute, Match
+from starlette.types import Receive, Scope, Send
+from typing import Dict, List
+import importlib, threading
+
+# Routers behind a placeholder route: their module (its imports, pydantic models and route
+# registration) loads on the first request under their prefix instead of at app import.
+
+class LazyRouter(BaseRoute):
+    """Matches every path under `prefix`; the first hit includes the real router and re-dispatches.
+
+    Installed after the eager routes, so it only sees paths nothing else matched. Once loaded it
+    removes itself, and the real routes answer (including 404/405) from then on.
+    """
+
+    def __init__(self, app, prefix: str, target: str):
+        self.fastapi_app = app
+        self.prefix = prefix.rstrip("/")
+        self.target = target  # "package.module:attribute"
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def matches(self, scope: Scope):
+        if scope["type"] == "http" and (scope["path"] == self.prefix or scope["path"].startswith(self.prefix + "/")):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def load(self) -> None:
+        with self._lock:
+            if self.loaded:
+                return
+            self.fastapi_app.include_router(self.router())
+            self.fastapi_app.router.routes.remove(self)
+            self.fastapi_app.openapi_schema = None
+            self.loaded = True
+
+    def router(self):
+        module, attr = self.target.split(":")
+        return getattr(importlib.import_module(module), attr)
+
+    def url_path_for(self, name: str, /, **path_params):
+        # Asks the real router without including it: the app's Router.url_path_for is iterating its
+        # routes, so load() (which edits that list) can't run here. Unknown names raise NoMatchFound.
+        return self.router().url_path_for(name, **path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.load()
+        await self.fastapi_app.router(scope, receive, send)
+
+def install(app, routers: Dict[str, str]) -> List[LazyRouter]:
+    """Add a LazyRouter per {prefix: "module:attr"}; the OpenAPI schema loads them all first."""
+    lazy = [LazyRouter(app, prefix, target) for prefix, target in routers.items()]
+    app.router.routes.extend(lazy)
+    build_openapi = app.openapi
+
+    def openapi():
+        for r in lazy:
+            r.load()
+        return build_openapi()
+
+    app.openapi = openapi
+    return lazy
+
+def loaded(lazy: List[LazyRouter]) -> Dict[str, bool]:
+    return {r.prefix: r.loaded for r in lazy}
@@ -1,28 +1,159 @@
 from fastapi import APIRouter
-from time import monotonic
-from typing import Dict
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from bisect import bisect_left
+from time import monotonic, perf_counter
+from typing import Dict, Callable, List, Tuple
+import os, threading
 
 router = APIRouter()
 START = monotonic()
-COUNTERS: Dict[str, int] = {}
+COUNTERS: Dict[Tuple[str, str], int] = {}  # (metric, '{label="value",...}' or "") -> count
+SAMPLED: Dict[str, Tuple[str, Callable[[], float]]] = {}  # metric -> ("gauge" | "counter", fn)
+SNAPSHOTS: List[Tuple[Callable[[], dict], Dict[str, Tuple[str, str]]]] = []  # (fn, {metric: (type, key)})
+_counter_lock = threading.Lock()  # inc() is called from threadpool handlers
+
+# Request duration buckets in seconds (Prometheus `le` bounds); +Inf is implied.
+LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(","))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 def inc(metric: str, labels: str = ""):
-    key = f"{metric}{labels}"
-    COUNTERS[key] = COUNTERS.get(key, 0) + 1
+    """Add one to `metric`; `labels` is a Prometheus label set such as '{action="invite"}'."""
+    labels = labels.split("}", 1)[0] + "}" if "{" in labels else ""  # older callers appended " 1"
+    with _counter_lock:
+        COUNTERS[(metric, labels)] = COUNTERS.get((metric, labels), 0) + 1
 
-@router.get("/metrics", tags=["metrics"])
-def metrics():
-    lines = []
-    for key, val in sorted(COUNTERS.items()):
-        if "{" in key:
-            metric, rest = key.split("{", 1)
-            lines.append(f"{metric}{{{rest}")
-        else:
-            lines.append(f"{key} {val}")
-    if not lines:
-        lines.append("app_actions_total 0")
+def register_gauge(metric: str, fn: Callable[[], float]):
+    """Register a callable returning a current value (size, depth, ...), sampled on every scrape."""
+    SAMPLED[metric] = ("gauge", fn)
+
+def register_counter(metric: str, fn: Callable[[], float]):
+    """Register a callable returning a running total that only goes up (until restart); name it `*_total`."""
+    SAMPLED[metric] = ("counter", fn)
+
+def register_snapshot(fn: Callable[[], dict], gauges: Dict[str, str] = None, counters: Dict[str, str] = None):
+    """Export several keys of one dict, calling `fn` once per scrape so they agree; {metric: key}, missing keys are 0."""
+    metrics = {m: ("gauge", k) for m, k in (gauges or {}).items()}
+    metrics.update({m: ("counter", k) for m, k in (counters or {}).items()})
+    SNAPSHOTS.append((fn, metrics))
+
+class RouteHistogram:
+    """Request durations per (method, route template, status class), cumulative only when rendered.
+
+    Updated from the event loop only (by RequestMetricsMiddleware), so no lock is taken.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, str, str], List] = {}  # key -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, f"{status // 100}xx")
+        s = self.series.get(key)
+        if s is None:
+            s = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        s[0][bisect_left(self.buckets, seconds)] += 1
+        s[1] += seconds
+
+    def render(self, name: str) -> List[str]:
+        lines = [f"# HELP {name} HTTP request duration by route template, method and status class.",
+                 f"# TYPE {name} histogram"]
+        for (method, route, status), (counts, total) in sorted(self.series.items()):
+            labels = f'method="{_escape(method)}",route="{_escape(route)}",status="{status}"'
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {running}')
+            running += counts[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {running}')
+            lines.append(f"{name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{name}_count{{{labels}}} {running}")
+        return lines
+
+REQUEST_DURATION = RouteHistogram()
+IN_FLIGHT = 0
+
+def route_template(scope: Scope, root_path: str) -> str:
+    """The matched route's path template, so label cardinality stays bounded by the route table."""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", "")
+    if scope.get("root_path", "") != root_path:  # served by a Mount (static files)
+        return scope["root_path"][len(root_path):] + "/{path}"
+    return "unmatched"
+
+class RequestMetricsMiddleware:
+    """Feeds REQUEST_DURATION and the in-flight gauge; add it last so it wraps every other middleware.
+
+    The duration runs until the response body is complete. A request that raises is recorded as 500.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        global IN_FLIGHT
+        root_path, status = scope.get("root_path", ""), 500
+        started = perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT -= 1
+            REQUEST_DURATION.observe(scope["method"], route_template(scope, root_path), status,
+                                     perf_counter() - started)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def render() -> str:
+    """Every counter, gauge and histogram in the Prometheus text exposition format (0.0.4)."""
+    lines = ["# TYPE process_uptime_seconds gauge", f"process_uptime_seconds {_number(round(monotonic() - START, 3))}",
+             "# TYPE http_requests_in_flight gauge", f"http_requests_in_flight {IN_FLIGHT}"]
+    with _counter_lock:
+        counters = sorted(COUNTERS.items())
+    typed = set()
+    for (metric, labels), val in counters:
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{labels} {val}")
+    sampled = []
+    for metric, (kind, fn) in SAMPLED.items():
+        try:
+            sampled.append((metric, kind, _number(fn())))
+        except Exception:
+            continue
+    for fn, metrics in SNAPSHOTS:
+        try:
+            snap = fn()
+            sampled += [(metric, kind, _number(snap.get(key, 0))) for metric, (kind, key) in metrics.items()]
+        except Exception:
+            continue
+    for metric, kind, value in sorted(sampled):
+        lines += [f"# TYPE {metric} {kind}", f"{metric} {value}"]
+    lines += REQUEST_DURATION.render("http_request_duration_seconds")
     return "\n".join(lines) + "\n"
 
+@router.get("/metrics", tags=["metrics"], response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
 @router.get("/health/extended", tags=["metrics"])
 def extended():
     uptime_ms = int((monotonic() - START) * 1000)
@@ -0,0 +1,126 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from typing import Callable, Dict, List, NamedTuple, Sequence
+import threading, time
+
+# Versioned schema migrations. Applied versions live in `schema_migrations`; the app only reads
+# the highest one at startup. Run every pending migration once per deploy with
+# `python migrate.py` (from backend/).
+TABLE = "schema_migrations"
+PG_LOCK_KEY = 0x6F69_6D67  # pg_advisory_xact_lock key for the migration run
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable  # offline: apply(conn) inside the migration transaction; online: apply(engine)
+    online: bool = False  # index builds: deferred to a background thread, never block startup
+
+def _lock(conn) -> None:
+    """One migrator at a time across workers and hosts; held until the transaction ends."""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": PG_LOCK_KEY})
+
+def _ensure_table(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLE} (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+                          "applied_at INTEGER NOT NULL, duration_ms INTEGER NOT NULL)"))
+
+def applied_versions(conn) -> set:
+    """Applied versions, or an empty set for a database that predates the runner."""
+    try:
+        return {v for (v,) in conn.execute(text(f"SELECT version FROM {TABLE}"))}
+    except DBAPIError:
+        conn.rollback()
+        return set()
+
+def status(engine, migrations: Sequence[Migration]) -> Dict:
+    """The cheap startup check: a single read of the applied versions."""
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    pending = [m for m in migrations if m.version not in done]
+    return {"version": max(done, default=0), "expected": max((m.version for m in migrations), default=0),
+            "pending": [m.version for m in pending if not m.online],
+            "online_pending": [m.version for m in pending if m.online]}
+
+def _record(conn, m: Migration, started: float) -> None:
+    conn.execute(text(f"INSERT INTO {TABLE} (version, name, applied_at, duration_ms) VALUES (:v, :n, :a, :d)"),
+                 {"v": m.version, "n": m.name, "a": int(time.time() * 1000),
+                  "d": int((time.perf_counter() - started) * 1000)})
+
+def migrate(engine, migrations: Sequence[Migration], online: bool = True, log=print) -> List[int]:
+    """Apply pending migrations in version order; returns the versions this call applied.
+
+    Each offline migration runs in its own transaction under the migration lock and is recorded
+    in that transaction, so a failure leaves it pending and concurrent runners apply it once.
+    With online=False, online migrations are left for `run_online`.
+    """
+    _ensure_table(engine)
+    applied = []
+    for m in sorted(migrations, key=lambda m: m.version):
+        if m.online:
+            if online and _run_online(engine, m, log):
+                applied.append(m.version)
+            continue
+        with engine.connect() as conn:
+            _lock(conn)
+            if m.version in applied_versions(conn):
+                conn.rollback()
+                continue
+            started = time.perf_counter()
+            m.apply(conn)
+            _record(conn, m, started)
+            conn.commit()
+        log(f"[migrate] {m.version} {m.name}: {int((time.perf_counter() - started) * 1000)} ms")
+        applied.append(m.version)
+    return applied
+
+def _run_online(engine, m: Migration, log) -> bool:
+    with engine.connect() as conn:
+        if m.version in applied_versions(conn):
+            return False
+    started = time.perf_counter()
+    m.apply(engine)  # idempotent (IF NOT EXISTS), outside any transaction so CONCURRENTLY works
+    with engine.connect() as conn:
+        _lock(conn)
+        if m.version in applied_versions(conn):  # another worker finished it first
+            conn.rollback()
+            return False
+        _record(conn, m, started)
+        conn.commit()
+    log(f"[migrate] {m.version} {m.name} (online): {int((time.perf_counter() - started) * 1000)} ms")
+    return True
+
+def run_online(engine, migrations: Sequence[Migration], stop: threading.Event, retry: float = 5.0, log=print) -> None:
+    """Background thread body: build pending online migrations, retrying on lock timeouts."""
+    for m in sorted((m for m in migrations if m.online), key=lambda m: m.version):
+        while not stop.is_set():
+            try:
+                _run_online(engine, m, log)
+                break
+            except Exception as exc:  # busy database (another worker building); try again later
+                log(f"[migrate] {m.version} {m.name} (online) failed: {exc}")
+                stop.wait(retry)
+
+def create_index_online(engine, index) -> None:
+    """Build `index` without holding up the app.
+
+    PostgreSQL builds it CONCURRENTLY, so reads and writes continue; a failed build leaves an
+    invalid index that is dropped before re-raising. SQLite has no concurrent build: the index is
+    created in one short-lived transaction while the app is already serving, so WAL readers carry
+    on and writers wait (up to busy_timeout) for the build to finish.
+    """
+    cols = ", ".join(c.name for c in index.columns)
+    unique = "UNIQUE " if index.unique else ""
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            try:
+                conn.execute(text(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} "
+                                  f"ON {index.table.name} ({cols})"))
+            except DBAPIError:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+                raise
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {index.table.name} ({cols})"))
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, Dict, Any
-import os, time, json, pathlib, secrets, base64, hmac, hashlib
+import os, time, json, pathlib, secrets
+from .fast_json import FastJSONResponse
+from .signed_links import SECRET, sign_link, read_token
 
 router = APIRouter(prefix="/api/notify", tags=["notify"])
 
 MODE = os.getenv("NOTIFY_MODE", "mock").lower()  # mock | smtp | provider
-OUTBOX_DIR = pathlib.Path("qa/notify/outbox")
-STATE_PATH = pathlib.Path("qa/_state/session.json")
-SECRET = os.getenv("NOTIFY_SIGNING_SECRET", "dev-secret")
+OUTBOX_DIR = pathlib.Path(os.getenv("NOTIFY_OUTBOX_DIR", "qa/notify/outbox"))
+STATE_PATH = pathlib.Path(os.getenv("NOTIFY_STATE_PATH", "qa/_state/session.json"))
 
 def now_iso():
     return time.strftime("%Y-%m-%dT%H:%M:%S%z")
@@ -29,27 +30,8 @@ def merge_state(key: str, data: Dict[str, Any]):
     state["notifications"][key] = data
     STATE_PATH.write_text(json.dumps(state, indent=2))
 
-def sign_link(payload: Dict[str, Any], ttl_seconds: int = 900) -> str:
-    payload = dict(payload)
-    payload["exp"] = int(time.time()) + ttl_seconds
-    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
-    sig = hmac.new(SECRET.encode(), raw, hashlib.sha256).digest()
-    token = base64.urlsafe_b64encode(raw + b"." + sig).decode().rstrip("=")
-    return token
-
 def verify_token(token: str) -> bool:
-    try:
-        raw = base64.urlsafe_b64decode(token + "===")
-        raw_payload, sig = raw.rsplit(b".", 1)
-        expect = hmac.new(SECRET.encode(), raw_payload, hashlib.sha256).digest()
-        if not hmac.compare_digest(sig, expect):
-            return False
-        data = json.loads(raw_payload.decode())
-        if int(time.time()) > int(data.get("exp", 0)):
-            return False
-        return True
-    except Exception:
-        return False
+    return read_token(token) is not None
 
 class SendPayload(BaseModel):
     to: EmailStr
@@ -115,8 +97,8 @@ def send_otp(payload: OtpPayload):
     merge_state("otp", {"email": payload.email, "token_ok": verify_token(token), "outbox": path, "time": now_iso()})
     return {"ok": True, "token": token, "outbox": path}
 
-@router.get("/outbox")
+@router.get("/outbox", response_class=FastJSONResponse)
 def list_outbox():
     ensure_dirs()
     items = sorted([str(p) for p in OUTBOX_DIR.glob("*.json")])
-    return {"ok": True, "items": items}
+    return FastJSONResponse({"ok": True, "items": items})
@@ -35,7 +35,7 @@ def create_org(body: CreateOrg, x_demo_user: Optional[str] = Header(None)):
     ORGS[ORG_SEQ] = org
     ORG_SEQ += 1
     append_audit(actor, "create_org", f"org:{org.id}", {"name": body.name})
-    inc("app_actions_total", '{action="create_org"} 1')
+    inc("app_actions_total", '{action="create_org"}')
     return org
 
 class Invite(BaseModel):
@@ -51,7 +51,7 @@ def invite(body: Invite, x_demo_user: Optional[str] = Header(None)):
     require_owner(org, actor)
     org.invites[body.email] = body.role
     append_audit(actor, "invite_sent", f"org:{org.id}", {"email": body.email, "role": body.role})
-    inc("app_actions_total", '{action="invite"} 1')
+    inc("app_actions_total", '{action="invite"}')
     return {"status":"ok"}
 
 class Accept(BaseModel):
@@ -66,7 +66,7 @@ def accept(body: Accept):
     if not role: raise HTTPException(status_code=400, detail="no invite")
     org.members[body.email] = role
     append_audit(body.email, "invite_accepted", f"org:{org.id}", {"role": role})
-    inc("app_actions_total", '{action="accept_invite"} 1')
+    inc("app_actions_total", '{action="accept_invite"}')
     return {"status":"ok"}
 
 @router.get("/api/org/members", tags=["org"])
@@ -93,5 +93,5 @@ def set_role(body: SetRole, x_demo_user: Optional[str] = Header(None)):
         raise HTTPException(status_code=404, detail="member not found")
     org.members[body.email] = body.role
     append_audit(actor, "role_changed", f"org:{org.id}", {"email": body.email, "role": body.role})
-    inc("app_actions_total", '{action="role_change"} 1')
+    inc("app_actions_total", '{action="role_change"}')
     return {"status":"ok"}
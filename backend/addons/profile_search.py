@@ -0,0 +1,96 @@
+from sqlalchemy import bindparam, inspect, text
+from typing import List, Optional, Tuple
+import base64, html, os, re
+
+# Full-text index over published profiles (SQLite FTS5). The table holds one row per published
+# profile with rowid = profiles.id; drafts are never inserted, so every match is searchable.
+TABLE = "profile_search"
+SEARCH_MIN_PREFIX = int(os.getenv("SEARCH_MIN_PREFIX", "3"))  # shorter last words match whole words only
+SEARCH_MAX_TERMS = 8
+WEIGHTS = (10.0, 4.0, 1.0)  # bm25 column weights: name, headline, bio
+SNIPPET_TOKENS = 16
+
+DDL = (f"CREATE VIRTUAL TABLE {TABLE} USING fts5(name, headline, bio, "
+       f"tokenize='unicode61 remove_diacritics 2', prefix='{SEARCH_MIN_PREFIX}')")
+TERM = re.compile(r"[^\W_]+")
+MARK_OPEN, MARK_CLOSE = "\x02", "\x03"  # never in tokenized text; swapped for <mark> after escaping
+SCORE = f"bm25({TABLE}, {', '.join(map(str, WEIGHTS))})"
+
+def ensure_index(conn) -> bool:
+    """Create the index and fill it from the published profiles, in the caller's transaction.
+
+    True if it was built; a database that already has it is left alone.
+    """
+    if TABLE in inspect(conn).get_table_names():
+        return False
+    conn.execute(text(DDL))
+    conn.execute(text(f"INSERT INTO {TABLE}(rowid, name, headline, bio) "
+                      "SELECT id, name, headline, bio FROM profiles WHERE is_published"))
+    conn.execute(text(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"))  # one b-tree after the bulk fill
+    return True
+
+def index_profile(db, profile_id: int, name: str, headline: str, bio: str, published: bool) -> None:
+    """Mirror one profile write into the index, in the caller's transaction."""
+    db.execute(text(f"DELETE FROM {TABLE} WHERE rowid = :id"), {"id": profile_id})
+    if published:
+        db.execute(text(f"INSERT INTO {TABLE}(rowid, name, headline, bio) VALUES (:id, :name, :headline, :bio)"),
+                   {"id": profile_id, "name": name or "", "headline": headline or "", "bio": bio or ""})
+
+def match_query(q: str, min_prefix: int = SEARCH_MIN_PREFIX) -> Optional[str]:
+    """User text -> FTS5 query: every word must match, the last one as a prefix.
+
+    Words are quoted, so FTS5 operators in the input are treated as text. A last word shorter
+    than `min_prefix` must match whole, which keeps "a*"-style scans over the whole index out.
+    """
+    terms = TERM.findall(q.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    if len(terms[-1]) >= min_prefix:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+def encode_cursor(score: float, profile_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{score!r}|{profile_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    s, i = base64.urlsafe_b64decode(cursor + "===").decode().split("|")
+    return float(s), int(i)
+
+def highlight(snippet: str) -> str:
+    return html.escape(snippet or "").replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>")
+
+def search(db, match: str, after: Optional[Tuple[float, int]], limit: int) -> Tuple[List[dict], Optional[tuple]]:
+    """One page of published profiles for an FTS5 query, best match first.
+
+    Pages are keyed on (score, id), so a page costs the same however deep it is. The ranking
+    pass reads only rowids and scores; snippets and profile columns are fetched for the page alone.
+    """
+    params = {"q": match, "n": limit + 1}
+    if after is None:
+        sql = (f"SELECT rowid AS id, {SCORE} AS score FROM {TABLE} WHERE {TABLE} MATCH :q "
+               "ORDER BY score, id LIMIT :n")
+    else:
+        sql = (f"SELECT id, score FROM (SELECT rowid AS id, {SCORE} AS score FROM {TABLE} WHERE {TABLE} MATCH :q) "
+               "WHERE score > :s OR (score = :s AND id > :i) ORDER BY score, id LIMIT :n")
+        params.update(s=after[0], i=after[1])
+    ranked = db.execute(text(sql), params).all()
+    more = len(ranked) > limit
+    ranked = ranked[:limit]
+    if not ranked:
+        return [], None
+    rows = db.execute(
+        text(f"SELECT p.id, p.public_slug, p.name, p.headline, p.avatar_url, "
+             f"snippet({TABLE}, -1, :mo, :mc, '…', {SNIPPET_TOKENS}) AS snippet "
+             f"FROM {TABLE} JOIN profiles p ON p.id = {TABLE}.rowid "
+             f"WHERE {TABLE} MATCH :q AND {TABLE}.rowid IN :ids AND p.is_published")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"q": match, "ids": [r.id for r in ranked], "mo": MARK_OPEN, "mc": MARK_CLOSE}).all()
+    by_id = {r.id: r for r in rows}
+    items = []
+    for r in ranked:
+        p = by_id.get(r.id)
+        if p is not None:
+            items.append({"id": p.id, "public_slug": p.public_slug, "name": p.name, "headline": p.headline,
+                          "avatar_url": p.avatar_url, "snippet": highlight(p.snippet)})
+    return items, ((ranked[-1].score, ranked[-1].id) if more else None)
@@ -0,0 +1,68 @@
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+import bisect, heapq
+
+def parse_weekdays(value: str) -> List[int]:
+    """"0,2,4" -> [0, 2, 4] (Monday = 0)."""
+    return sorted({int(x) for x in value.split(",") if x.strip()})
+
+def expand(weekdays: Sequence[int], start_time: str, end_time: str, slot_minutes: int, tz: str,
+           valid_from: str, valid_until: Optional[str], skip: Set[Tuple[str, Optional[str]]],
+           window_start: int, window_end: int) -> Iterator[dict]:
+    """Lazily yield the occurrences of a weekly rule that start in [window_start, window_end).
+
+    Occurrences are `slot_minutes` long and tile [start_time, end_time) on each matching local day.
+    `skip` holds (date, None) for a whole skipped day or (date, "HH:MM") for one occurrence.
+    Yields in start order; nothing outside the window is materialized.
+    """
+    zone = ZoneInfo(tz or "UTC")
+    days = set(weekdays)
+    first = max(date.fromisoformat(valid_from), datetime.fromtimestamp(window_start, zone).date())
+    last = datetime.fromtimestamp(window_end, zone).date()
+    if valid_until:
+        last = min(last, date.fromisoformat(valid_until))
+    t0, t1 = time.fromisoformat(start_time), time.fromisoformat(end_time)
+    step = timedelta(minutes=slot_minutes)
+    d = first
+    while d <= last:
+        ds = d.isoformat()
+        if d.weekday() in days and (ds, None) not in skip:
+            local, end = datetime.combine(d, t0, zone), datetime.combine(d, t1, zone)
+            while local + step <= end:
+                ts = int(local.timestamp())
+                if ts >= window_end:
+                    return
+                hm = local.strftime("%H:%M")
+                if ts >= window_start and (ds, hm) not in skip:
+                    yield {"starts_at": ts, "duration_min": slot_minutes, "date": ds, "time": hm, "timezone": tz}
+                local += step
+        d += timedelta(days=1)
+
+def merge(concrete: List[dict], virtual: Iterable[dict], max_span: int) -> Iterator[dict]:
+    """Merge stored slots with generated occurrences, both sorted by starts_at.
+
+    A stored slot (booked, closed or a one-off) masks every occurrence it overlaps, and only the
+    first occurrence at a given start survives when rules overlap. `max_span` (seconds) bounds
+    how far back a stored slot can start and still overlap.
+    """
+    starts = [c["starts_at"] for c in concrete]
+
+    def unmasked():
+        last = None
+        for v in virtual:
+            if v["starts_at"] == last:
+                continue
+            end = v["starts_at"] + v["duration_min"] * 60
+            j = bisect.bisect_left(starts, end) - 1
+            masked = False
+            while j >= 0 and starts[j] > v["starts_at"] - max_span:
+                if starts[j] + concrete[j]["duration_min"] * 60 > v["starts_at"]:
+                    masked = True
+                    break
+                j -= 1
+            if not masked:
+                last = v["starts_at"]
+                yield v
+
+    return heapq.merge(concrete, unmasked(), key=lambda s: s["starts_at"])
@@ -0,0 +1,34 @@
+from typing import Any, Dict, Optional
+import base64, hashlib, hmac, json, os, time
+
+# HMAC-signed, expiring tokens for links (notify OTP links, signed upload downloads). Kept apart
+# from notify_ext so the app can use them without loading the notify router.
+SECRET = os.getenv("NOTIFY_SIGNING_SECRET", "dev-secret")
+
+def sign_link(payload: Dict[str, Any], ttl_seconds: int = 900, secret: Optional[str] = None) -> str:
+    payload = dict(payload)
+    payload["exp"] = int(time.time()) + ttl_seconds
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    sig = hmac.new((secret or SECRET).encode(), raw, hashlib.sha256).digest()
+    token = base64.urlsafe_b64encode(raw + b"." + sig).decode().rstrip("=")
+    return token
+
+SIG_BYTES = hashlib.sha256().digest_size
+
+def read_token(token: str, secret: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Payload of a valid, unexpired sign_link token; None otherwise."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "===")
+        # The signature is raw bytes and may itself contain b".", so split by length, not separator.
+        if len(raw) <= SIG_BYTES or raw[-SIG_BYTES - 1:-SIG_BYTES] != b".":
+            return None
+        raw_payload, sig = raw[:-SIG_BYTES - 1], raw[-SIG_BYTES:]
+        expect = hmac.new((secret or SECRET).encode(), raw_payload, hashlib.sha256).digest()
+        if not hmac.compare_digest(sig, expect):
+            return None
+        data = json.loads(raw_payload.decode())
+        if int(time.time()) > int(data.get("exp", 0)):
+            return None
+        return data
+    except Exception:
+        return None
@@ -0,0 +1,54 @@
+from sqlalchemy import event, text
+import os
+
+# Pragmas applied to every new SQLite connection. "default" leaves SQLite's own
+# defaults alone (rollback journal, synchronous=FULL, no busy timeout).
+PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "5000",
+        "mmap_size": str(256 * 1024 * 1024),
+        "cache_size": "-65536",  # negative = KiB, i.e. 64 MiB per connection
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": "1000",  # pages
+    },
+}
+
+def pragmas_for(profile: str) -> dict:
+    """Profile pragmas with SQLITE_<PRAGMA> env overrides (e.g. SQLITE_BUSY_TIMEOUT=10000)."""
+    out = dict(PROFILES.get(profile, PROFILES["production"]))
+    for name in PROFILES["production"]:
+        v = os.getenv(f"SQLITE_{name.upper()}")
+        if v:
+            out[name] = v
+    return out
+
+def apply_pragmas(engine, pragmas: dict):
+    """Run the pragmas on connect; journal_mode first so later pragmas see WAL."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name in sorted(pragmas, key=lambda k: k != "journal_mode"):
+                cur.execute(f"PRAGMA {name}={pragmas[name]}")
+        finally:
+            cur.close()
+
+def wal_checkpoint(engine, mode: str = "PASSIVE") -> dict:
+    """PASSIVE never blocks writers; TRUNCATE (used at shutdown) also resets the -wal file."""
+    mode = mode.upper()
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"bad checkpoint mode: {mode}")
+    with engine.connect() as conn:
+        busy, log, done = conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).one()
+    return {"mode": mode, "busy": busy, "wal_pages": log, "checkpointed": done}
+
+def current_pragmas(engine) -> dict:
+    with engine.connect() as conn:
+        return {name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in PROFILES["production"]}
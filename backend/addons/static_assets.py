@@ -0,0 +1,331 @@
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from .compression import brotli, choose_encoding
+from .ttl_cache import TTLCache
+from typing import Dict, Optional, Sequence, Tuple
+import anyio, gzip, hashlib, json, mimetypes, os, pathlib, posixpath, re, stat, sys, threading, time
+
+PRECOMPRESS_EXTS = (".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".xml", ".map")
+PRECOMPRESS_MIN_BYTES = int(os.getenv("PRECOMPRESS_MIN_BYTES", "1024"))
+SIBLINGS = (("br", ".br"), ("gzip", ".gz"))
+
+FINGERPRINT_EXTS = (".js", ".mjs", ".css", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+                    ".woff", ".woff2")
+MANIFEST_NAME = "asset-manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+STATIC_CACHE_ENTRIES = int(os.getenv("STATIC_CACHE_ENTRIES", "256"))
+STATIC_CACHE_MAX_FILE = int(os.getenv("STATIC_CACHE_MAX_FILE", str(64 * 1024)))
+STATIC_CACHE_TTL = float(os.getenv("STATIC_CACHE_TTL", "30"))
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "")  # default: "<static root>-build"
+
+def accepted_encodings(accept_encoding: str) -> Tuple[str, ...]:
+    return tuple(enc for enc, _ in SIBLINGS if choose_encoding(accept_encoding, (enc,)))
+
+def fresh_sibling(full_path, stat_result: os.stat_result, accepted: Sequence[str]):
+    """(path, stat, encoding) of the preferred precompressed sibling, or None."""
+    for encoding, ext in SIBLINGS:
+        if encoding not in accepted:
+            continue
+        try:
+            st = os.stat(f"{full_path}{ext}")
+        except OSError:
+            continue
+        if st.st_mtime >= stat_result.st_mtime:
+            return f"{full_path}{ext}", st, encoding
+    return None
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves a fresh `.br`/`.gz` sibling when the client accepts it.
+
+    Siblings are produced ahead of time by `precompress()`; nothing is compressed per request.
+    A sibling older than its source is ignored, so a forgotten rebuild serves the plain file.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        sib = fresh_sibling(full_path, stat_result, accepted_encodings(request_headers.get("accept-encoding", "")))
+        headers = self.extra_headers(scope)
+        if sib:
+            path, st, encoding = sib
+            media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+            response = FileResponse(path, status_code=status_code, stat_result=st, media_type=media_type,
+                                    headers={"content-encoding": encoding, "vary": "Accept-Encoding", **headers})
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def extra_headers(self, scope: Scope) -> Dict[str, str]:
+        return {}
+
+def fingerprinted_name(rel: str, digest: str) -> str:
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{digest[:10]}{ext}"
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(256 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def build_manifest(root: str) -> Dict[str, str]:
+    """{"js/app.js": "js/app.<sha256[:10]>.js", ...} for every fingerprintable file under root."""
+    base = pathlib.Path(root)
+    manifest = {}
+    for p in sorted(base.rglob("*")):
+        if p.suffix.lower() in FINGERPRINT_EXTS and p.is_file():
+            rel = p.relative_to(base).as_posix()
+            manifest[rel] = fingerprinted_name(rel, file_sha256(p))
+    return manifest
+
+ASSET_REF = re.compile(r"""((?:src|href)\s*=\s*)(["'])([^"'?#]+)([^"']*)\2""", re.I)
+
+def rewrite_html(html: str, page: str, manifest: Dict[str, str], url_prefix: str = "") -> str:
+    """Point src/href references at their fingerprinted names.
+
+    Root-relative URLs ("/js/app.js", "/public/js/app.js") and page-relative ones ("js/app.js")
+    resolve against the static root; anything not in the manifest is left alone.
+    """
+    page_dir = posixpath.dirname(page)
+
+    def sub(m):
+        url = m.group(3)
+        if "://" in url or url.startswith(("//", "data:")):
+            return m.group(0)
+        if url.startswith("/"):
+            key = url[1:]
+            if url_prefix and key.startswith(url_prefix):
+                key = key[len(url_prefix):]
+        else:
+            key = posixpath.normpath(posixpath.join(page_dir, url))
+        hashed = manifest.get(key)
+        if not hashed:
+            return m.group(0)
+        new = url[:url.rfind("/") + 1] + posixpath.basename(hashed)
+        return f"{m.group(1)}{m.group(2)}{new}{m.group(4)}{m.group(2)}"
+
+    return ASSET_REF.sub(sub, html)
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    return brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+
+def normalize_prefix(url_prefix: str) -> str:
+    return url_prefix.strip("/") + "/" if url_prefix.strip("/") else ""
+
+def default_build_dir(root) -> pathlib.Path:
+    """Where `build()` writes rewritten pages: STATIC_BUILD_DIR, or a sibling of the static root."""
+    root = pathlib.Path(root)
+    return pathlib.Path(STATIC_BUILD_DIR) if STATIC_BUILD_DIR else root.with_name(root.name + "-build")
+
+def read_build_manifest(build_dir) -> Optional[dict]:
+    try:
+        return json.loads((pathlib.Path(build_dir) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+class AssetStaticFiles(PrecompressedStaticFiles):
+    """Static mount with fingerprinted asset URLs and an in-memory LRU of small files.
+
+    - `<name>.<hash>.<ext>` resolves to `<name>.<ext>` and is served with `Cache-Control: immutable`.
+    - HTML pages are served with their asset references rewritten to fingerprinted names
+      (`no-cache`, so a deploy is picked up on the next revalidation). `build()` writes them,
+      precompressed, to `build_directory`; a page whose build is missing or was made against
+      other assets is rewritten on load and served uncompressed.
+    - `/asset-manifest.json` under the mount returns the logical -> fingerprinted map.
+    - Pages and other files up to `cache_max_file` bytes are held in memory per accepted encoding for
+      `cache_ttl` seconds, so hot hits cost no open/stat/read syscalls.
+    The manifest is built on first use. A fingerprinted URL whose file no longer has that hash
+    (edited in place after startup) is answered 404, and the manifest and cache are rebuilt so
+    pages point at the new name; hashes are re-checked only when a file's mtime or size changes.
+    """
+
+    def __init__(self, *, directory: str, url_prefix: str = "", build_directory: Optional[str] = None,
+                 cache_entries: int = STATIC_CACHE_ENTRIES, cache_max_file: int = STATIC_CACHE_MAX_FILE,
+                 cache_ttl: float = STATIC_CACHE_TTL, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.url_prefix = normalize_prefix(url_prefix)
+        self.build_directory = pathlib.Path(build_directory or default_build_dir(directory))
+        self.cache = TTLCache(cache_entries, cache_ttl)
+        self.cache_max_file = cache_max_file
+        self._assets: Optional[tuple] = None
+        self._verified: Dict[str, tuple] = {}  # real path -> ((mtime_ns, size), sha256)
+        self._lock = threading.Lock()
+
+    def assets(self) -> tuple:
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    manifest = build_manifest(str(self.directory))
+                    built = read_build_manifest(self.build_directory)
+                    # Built pages are usable only if they were rewritten against these exact assets.
+                    usable = built == {"url_prefix": self.url_prefix, "files": manifest}
+                    self._assets = (manifest, {v: k for k, v in manifest.items()}, usable)
+        return self._assets
+
+    def refresh(self) -> None:
+        """Forget the manifest and every cached response; the next request rebuilds both."""
+        with self._lock:
+            self._assets = None
+        self.cache.clear()
+
+    def verify(self, path: str) -> bool:
+        """Whether the file behind fingerprinted `path` still has that hash. Blocking."""
+        manifest, reverse, _ = self.assets()
+        real = reverse[path]
+        full_path, st = self.lookup_path(real)
+        ok = st is not None and stat.S_ISREG(st.st_mode)
+        if ok:
+            sig = (st.st_mtime_ns, st.st_size)
+            known = self._verified.get(real)
+            if known is None or known[0] != sig:
+                known = self._verified[real] = (sig, file_sha256(full_path))
+            ok = fingerprinted_name(real, known[1]) == path
+        if not ok and manifest.get(real) == path:  # first request to notice: rebuild once
+            self.refresh()
+        return ok
+
+    def built_page(self, real: str, st: os.stat_result, accepted: Tuple[str, ...]):
+        """(path, encoding) of the prebuilt page or its preferred sibling; None if not built for this source."""
+        if not self.assets()[2]:
+            return None
+        path = self.build_directory / real
+        try:
+            built = path.stat()
+        except OSError:
+            return None
+        if built.st_mtime < st.st_mtime:  # source edited after the build
+            return None
+        sib = fresh_sibling(path, built, accepted)
+        return (sib[0], sib[2]) if sib else (path, None)
+
+    def extra_headers(self, scope: Scope) -> Dict[str, str]:
+        return {"cache-control": IMMUTABLE} if self.get_path(scope).replace(os.sep, "/") in self.assets()[1] else {}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        request_headers = Headers(scope=scope)
+        path = path.replace(os.sep, "/")
+        key = (path, accepted_encodings(request_headers.get("accept-encoding", "")))
+        entry = self.cache.get(key)
+        if entry is None:
+            generation = self.cache.generation(key)  # a refresh() during the load drops its result
+            if path in self.assets()[1] and not await anyio.to_thread.run_sync(self.verify, path):
+                raise HTTPException(status_code=404)
+            entry = await anyio.to_thread.run_sync(self.load, path, key[1])
+            if entry is None:  # directories, 404s and large files take the regular path
+                return await super().get_response(self.assets()[1].get(path, path), scope)
+            self.cache.set(key, entry, generation)
+        body, media_type, headers = entry
+        if self.is_not_modified(Headers(headers=headers), request_headers):
+            return NotModifiedResponse(Headers(headers=headers))
+        return Response(body, media_type=media_type, headers=headers)
+
+    def load(self, path: str, accepted: Tuple[str, ...]):
+        manifest, reverse, _ = self.assets()
+        if path == MANIFEST_NAME:
+            body = json.dumps(manifest, separators=(",", ":"), sort_keys=True).encode()
+            return self._entry(body, "application/json", None, "no-cache")
+        real = reverse.get(path, path)
+        full_path, st = self.lookup_path(real)
+        if st is None or not stat.S_ISREG(st.st_mode):
+            return None
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        if st.st_size > self.cache_max_file and media_type != "text/html":  # pages are always rewritten
+            return None
+        if media_type == "text/html":
+            built = self.built_page(real, st, accepted)
+            if built:
+                return self._entry(pathlib.Path(built[0]).read_bytes(), media_type, built[1], "no-cache")
+            html = pathlib.Path(full_path).read_text(encoding="utf-8", errors="surrogateescape")
+            body = rewrite_html(html, real, manifest, self.url_prefix).encode("utf-8", errors="surrogateescape")
+            return self._entry(body, media_type, None, "no-cache")
+        sib = fresh_sibling(full_path, st, accepted)
+        cache_control = IMMUTABLE if path in reverse else None
+        if sib:
+            return self._entry(pathlib.Path(sib[0]).read_bytes(), media_type, sib[2], cache_control)
+        return self._entry(pathlib.Path(full_path).read_bytes(), media_type, None, cache_control)
+
+    @staticmethod
+    def _entry(body: bytes, media_type: str, encoding: Optional[str], cache_control: Optional[str]) -> tuple:
+        headers = {"etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"', "vary": "Accept-Encoding"}
+        if encoding:
+            headers["content-encoding"] = encoding
+        if cache_control:
+            headers["cache-control"] = cache_control
+        return body, media_type, headers
+
+def _write(path: pathlib.Path, data: bytes, mtime: float) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.utime(tmp, (mtime, mtime))
+    os.replace(tmp, path)
+
+def precompress(root: str, min_bytes: int = PRECOMPRESS_MIN_BYTES) -> dict:
+    """Write `.gz` (and `.br` when brotli is installed) next to every compressible file under root.
+
+    Up-to-date siblings are skipped; siblings that would not be smaller than the source are removed.
+    """
+    stats = {"written": 0, "fresh": 0, "skipped": 0}
+    for src in sorted(pathlib.Path(root).rglob("*")):
+        if not src.is_file() or src.suffix.lower() not in PRECOMPRESS_EXTS:
+            continue
+        st = src.stat()
+        if st.st_size < min_bytes:
+            stats["skipped"] += 1
+            continue
+        data = None
+        for encoding, ext in SIBLINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            dst = src.with_name(src.name + ext)
+            if dst.exists() and dst.stat().st_mtime >= st.st_mtime:
+                stats["fresh"] += 1
+                continue
+            data = data if data is not None else src.read_bytes()
+            packed = compress_bytes(data, encoding)
+            if len(packed) >= len(data):
+                dst.unlink(missing_ok=True)
+                continue
+            _write(dst, packed, st.st_mtime)
+            stats["written"] += 1
+    return stats
+
+def build(root: str, out: Optional[str] = None, url_prefix: Optional[str] = None,
+          min_bytes: int = PRECOMPRESS_MIN_BYTES) -> dict:
+    """Deploy step: precompress the static root, then write every HTML page with fingerprinted asset
+    references (plus its `.gz`/`.br`) and the manifest they were built against into `out`.
+
+    `url_prefix` is where the root is mounted (default: "/<root's name>", as main mounts ../public).
+    """
+    src_root = pathlib.Path(root)
+    out_dir = pathlib.Path(out) if out else default_build_dir(src_root)
+    prefix = normalize_prefix(url_prefix if url_prefix is not None else src_root.resolve().name)
+    manifest = build_manifest(str(src_root))
+    pages = 0
+    for src in sorted(src_root.rglob("*.html")):
+        if not src.is_file():
+            continue
+        rel = src.relative_to(src_root).as_posix()
+        html = src.read_text(encoding="utf-8", errors="surrogateescape")
+        body = rewrite_html(html, rel, manifest, prefix).encode("utf-8", errors="surrogateescape")
+        dst = out_dir / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if not dst.exists() or dst.read_bytes() != body:
+            for _, ext in SIBLINGS:  # same mtime as before, so precompress() would call them fresh
+                dst.with_name(dst.name + ext).unlink(missing_ok=True)
+            _write(dst, body, src.stat().st_mtime)
+        pages += 1
+    _write(out_dir / MANIFEST_NAME, json.dumps({"url_prefix": prefix, "files": manifest}, sort_keys=True).encode(),
+           time.time())
+    return {"static": precompress(str(src_root), min_bytes), "pages": pages, "built": precompress(str(out_dir), min_bytes)}
+
+if __name__ == "__main__":
+    # Build step: python -m addons.static_assets ../public [url_prefix] [out_dir]
+    args = sys.argv[1:]
+    print(build(args[0] if args else "../public", args[2] if len(args) > 2 else None, args[1] if len(args) > 1 else None))
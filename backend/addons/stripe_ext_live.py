@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Optional
 import os, hmac, hashlib, time, json
 
 router = APIRouter(prefix="/api/stripe", tags=["stripe-live"])
@@ -7,6 +9,27 @@ router = APIRouter(prefix="/api/stripe", tags=["stripe-live"])
 STRIPE_SIGNING_SECRET = os.getenv("STRIPE_SIGNING_SECRET", "whsec_dev")
 STRIPE_TEST = os.getenv("STRIPE_TEST", "1") == "1"
 
+# Set by the app (main.py) to persist + enqueue verified events; returns {"event_id", "duplicate"}.
+EVENT_SINK: Optional[Callable[[dict], dict]] = None
+
+def set_event_sink(fn: Callable[[dict], dict]):
+    global EVENT_SINK
+    EVENT_SINK = fn
+
+def parse_event(raw: str) -> dict:
+    """Signed bodies are '<ts>.<json>'; fall back to plain JSON."""
+    head, _, rest = raw.partition(".")
+    body = rest if head.isdigit() and rest else raw
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bad_payload")
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="bad_payload")
+    # Events without an id (test fixtures) dedupe on their exact bytes.
+    event.setdefault("id", "evt_sha256_" + hashlib.sha256(body.encode()).hexdigest()[:32])
+    return event
+
 class Checkout(BaseModel):
     plan: str
     email: str
@@ -41,4 +64,9 @@ async def webhook(request: Request):
     ok = verify_webhook(sig, raw.decode(), STRIPE_SIGNING_SECRET)
     if not ok:
         raise HTTPException(status_code=400, detail="bad_signature")
-    return {"ok": True, "handled": True}
+    event = parse_event(raw.decode())
+    if EVENT_SINK is None:
+        return {"ok": True, "handled": True, "event_id": event["id"]}
+    # Persist + enqueue only; subscription changes are applied by the background worker.
+    res = await run_in_threadpool(EVENT_SINK, event)
+    return {"ok": True, "handled": True, **res}
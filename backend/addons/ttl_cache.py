@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import threading, time
+
+GENERATION_STRIPES = 1024
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Read-through callers take `generation(key)` before loading and pass it to `set`; a `pop` in
+    between (an invalidating write) bumps the generation, so the stale load is not stored.
+    Generations are striped by key hash, so a collision only skips a cache fill.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._generations = [0] * GENERATION_STRIPES
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def generation(self, key: Hashable) -> int:
+        return self._generations[hash(key) % GENERATION_STRIPES]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """Store `value`; with `generation`, only if `key` was not invalidated since it was taken."""
+        if self.maxsize <= 0:
+            return False
+        with self._lock:
+            if generation is not None and self._generations[hash(key) % GENERATION_STRIPES] != generation:
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def pop(self, key: Hashable):
+        """Invalidate `key`: drop it and turn away fills that started before this call."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[hash(key) % GENERATION_STRIPES] += 1
+
+    def clear(self):
+        """Invalidate everything, including fills already in flight (as pop() does for one key)."""
+        with self._lock:
+            self._data.clear()
+            self._generations = [g + 1 for g in self._generations]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import os, re, time, hashlib, pathlib, threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process guard in PartialFile applies
+    fcntl = None
+
+UPLOAD_DIR = pathlib.Path(os.getenv("UPLOAD_DIR", "upload_store"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))  # uploads_pack: 5 MB
+READ_CHUNK = 256 * 1024
+PARTIAL_TTL = int(os.getenv("UPLOAD_PARTIAL_TTL_SEC", str(24 * 3600)))
+HASH_STATE_MAX = int(os.getenv("UPLOAD_HASH_STATE_MAX", "256"))  # live hashers kept between chunks
+
+# Serializes blob file placement against GC unlinks within this process.
+BLOB_LOCK = threading.Lock()
+
+_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+def partial_path(upload_id: int) -> pathlib.Path:
+    return UPLOAD_DIR / "partial" / f"{upload_id}.part"
+
+def blob_path(digest: str) -> pathlib.Path:
+    """Content-addressed location: blobs/ab/cd/<sha256>."""
+    return UPLOAD_DIR / "blobs" / digest[:2] / digest[2:4] / digest
+
+def ensure_dirs():
+    (UPLOAD_DIR / "partial").mkdir(parents=True, exist_ok=True)
+    (UPLOAD_DIR / "blobs").mkdir(parents=True, exist_ok=True)
+
+def parse_content_range(header: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """'bytes 0-1023/5000' -> (0, 1023, 5000); None when absent. Raises ValueError if malformed."""
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if not m:
+        raise ValueError("bad Content-Range")
+    start, end, total = (int(x) for x in m.groups())
+    if start > end or end >= total:
+        raise ValueError("bad Content-Range")
+    return start, end, total
+
+def current_offset(upload_id: int) -> int:
+    p = partial_path(upload_id)
+    return p.stat().st_size if p.exists() else 0
+
+class HashState:
+    """Running sha256 for a partial file, kept between chunks of one upload.
+
+    At most HASH_STATE_MAX uploads are kept, least recently written first out, so abandoned
+    uploads don't pile up; an evicted upload's next chunk rehashes its partial file from disk.
+    """
+    _live: "OrderedDict[int, tuple]" = OrderedDict()
+    _lock = threading.Lock()  # chunks of different uploads are written from threadpool threads
+
+    @classmethod
+    def resume(cls, upload_id: int, offset: int):
+        with cls._lock:
+            h, at = cls._live.get(upload_id, (None, -1))
+        if h is not None and at == offset:
+            return h
+        # Lost (restart / other worker): rebuild from the bytes already on disk.
+        h = hashlib.sha256()
+        if offset:
+            with open(partial_path(upload_id), "rb") as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                    h.update(chunk)
+        return h
+
+    @classmethod
+    def save(cls, upload_id: int, h, offset: int):
+        with cls._lock:
+            cls._live[upload_id] = (h, offset)
+            cls._live.move_to_end(upload_id)
+            while len(cls._live) > HASH_STATE_MAX:
+                cls._live.popitem(last=False)
+
+    @classmethod
+    def drop(cls, upload_id: int):
+        with cls._lock:
+            cls._live.pop(upload_id, None)
+
+class UploadBusy(Exception):
+    """Another request, in this worker or another, is writing the same upload."""
+
+class PartialFile:
+    """An upload's partial file, open for appending under an exclusive, non-blocking flock.
+
+    The offset is read once the lock is held, so two requests with the same Content-Range
+    (even in different worker processes) can't both append. Every method touches the disk:
+    call them from a worker thread, and always close().
+    """
+    _busy = set()  # flock is per open file, so this also keeps one process's requests apart
+    _busy_lock = threading.Lock()
+
+    def __init__(self, upload_id: int):
+        with self._busy_lock:
+            if upload_id in self._busy:
+                raise UploadBusy(upload_id)
+            self._busy.add(upload_id)
+        self.upload_id, self.f = upload_id, None
+        try:
+            self.f = self._open_locked(partial_path(upload_id))
+            self.start = self.offset = os.fstat(self.f.fileno()).st_size
+            self.hasher = HashState.resume(upload_id, self.offset)
+        except BaseException:
+            self.close()
+            raise
+
+    @staticmethod
+    def _open_locked(path: pathlib.Path):
+        ensure_dirs()
+        f = open(path, "ab")
+        if fcntl is None:
+            return f
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Finalized (renamed into the blob store) between our open and the lock: the file we
+            # hold is no longer the upload's partial.
+            if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                raise UploadBusy(path.stem)
+        except (BlockingIOError, FileNotFoundError, UploadBusy):
+            f.close()
+            raise UploadBusy(path.stem)
+        return f
+
+    def write(self, chunk: bytes):
+        self.f.write(chunk)
+        self.hasher.update(chunk)
+        self.offset += len(chunk)
+
+    def discard(self):
+        """Drop everything written by this request."""
+        self.f.truncate(self.start)
+        self.offset = self.start
+        HashState.drop(self.upload_id)
+
+    def save(self):
+        self.f.flush()
+        HashState.save(self.upload_id, self.hasher, self.offset)
+
+    def finalize(self, digest: str) -> pathlib.Path:
+        self.f.flush()
+        return finalize(self.upload_id, digest)
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()  # releases the flock
+            self.f = None
+        with self._busy_lock:
+            self._busy.discard(self.upload_id)
+
+def finalize(upload_id: int, digest: str) -> pathlib.Path:
+    """Move a finished partial into the blob store. Call only once the blob row holds a
+    reference, so GC can't remove the file underneath it; an identical existing blob is
+    simply replaced by a rename, never copied."""
+    dest = blob_path(digest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with BLOB_LOCK:
+        os.replace(partial_path(upload_id), dest)
+    HashState.drop(upload_id)
+    return dest
+
+def remove_blob(digest: str, still_referenced) -> bool:
+    """Unlink a blob unless `still_referenced()` says a new reference appeared meanwhile."""
+    with BLOB_LOCK:
+        if still_referenced():
+            return False
+        try:
+            blob_path(digest).unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+def stale_partials(now: Optional[float] = None):
+    now = now or time.time()
+    d = UPLOAD_DIR / "partial"
+    if not d.exists():
+        return []
+    return [p for p in d.glob("*.part") if now - p.stat().st_mtime > PARTIAL_TTL]
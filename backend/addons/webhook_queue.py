@@ -0,0 +1,100 @@
+from typing import Any, Callable, Hashable, List, Set
+import queue, threading, zlib
+
+class RetryLater(Exception):
+    """Raised by a handler to count the item as failed and run it again after `delay` seconds."""
+
+    def __init__(self, delay: float):
+        super().__init__(f"retry in {delay:g}s")
+        self.delay = delay
+
+class KeyedWorkQueue:
+    """Background workers that keep items with the same key in submission order.
+
+    Items are sharded by key onto a fixed set of threads, each draining its own FIFO,
+    so two events for one customer never run concurrently or out of order while
+    different customers are processed in parallel. A handler that raises counts as
+    failed; one that raises RetryLater is also resubmitted once its delay has passed.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], workers: int = 4, name: str = "webhook"):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.name = name
+        self._queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._timers: Set[threading.Timer] = set()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _shard(self, key: Hashable) -> int:
+        return zlib.crc32(str(key).encode()) % self.workers
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                q: queue.Queue = queue.Queue()
+                t = threading.Thread(target=self._run, args=(q,), name=f"{self.name}-{i}", daemon=True)
+                self._queues.append(q)
+                self._threads.append(t)
+                t.start()
+
+    def submit(self, key: Hashable, item: Any):
+        self.start()
+        self._queues[self._shard(key)].put((key, item))
+
+    def submit_later(self, key: Hashable, item: Any, delay: float):
+        """Submit after `delay` seconds unless the queue is stopped first."""
+        def fire():
+            with self._lock:
+                if timer not in self._timers:
+                    return
+                self._timers.discard(timer)
+            self.submit(key, item)
+        timer = threading.Timer(max(0.0, delay), fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _run(self, q: queue.Queue):
+        while True:
+            entry = q.get()
+            if entry is None:
+                q.task_done()
+                return
+            key, item = entry
+            try:
+                self.handler(item)
+                self.processed += 1
+            except RetryLater as exc:
+                self.failed += 1
+                self.retried += 1
+                self.submit_later(key, item, exc.delay)
+            except Exception:
+                self.failed += 1
+            finally:
+                q.task_done()
+
+    def join(self):
+        """Block until everything submitted so far has been handled."""
+        for q in list(self._queues):
+            q.join()
+
+    def stop(self):
+        with self._lock:
+            for timer in self._timers:
+                timer.cancel()
+            self._timers.clear()
+            for q in self._queues:
+                q.put(None)
+            for t in self._threads:
+                t.join(timeout=5)
+            self._queues, self._threads = [], []
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
@@ -0,0 +1,56 @@
+import os, sys, json, time, socket, pathlib, tempfile, importlib, subprocess
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+OUT = pathlib.Path(os.getenv("BENCH_OUT", "qa/perf"))
+
+def load_app(db_url: str = None, **env):
+    """Import backend/main.py against a throwaway database so runs never touch app.db."""
+    if db_url is None:
+        db_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="oi_bench_"), "bench.db")
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.update({k: str(v) for k, v in env.items()})
+    os.chdir(ROOT)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    main = importlib.reload(sys.modules["main"]) if "main" in sys.modules else importlib.import_module("main")
+    main.migrations.migrate(main.engine, main.MIGRATIONS, log=lambda *_: None)
+    return main
+
+def pct(samples, p):
+    if not samples:
+        return None
+    s = sorted(samples)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * len(s))) - 1))
+    return s[k]
+
+def save(name: str, data) -> str:
+    OUT.mkdir(parents=True, exist_ok=True)
+    p = OUT / f"{name}.json"
+    p.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    print(json.dumps(data, indent=2))
+    return str(p)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int = 1, **env):
+    """uvicorn main:app in a subprocess on a fresh SQLite file; returns (proc, base_url)."""
+    import httpx
+    port = free_port()
+    db = os.path.join(tempfile.mkdtemp(prefix="oi_bench_"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db}", **{k: str(v) for k, v in env.items()})
+    subprocess.run([sys.executable, "migrate.py"], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+                             "--workers", str(workers)], cwd=ROOT, env=env)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(base + "/health", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Throughput of the sync (threadpool) vs. DB_ASYNC=1 handlers under 50-500 concurrent clients.
+# Each mode runs in its own uvicorn process against a fresh SQLite file seeded with the same data.
+# Usage (from backend/): python -m bench.async_vs_sync [seconds_per_level]
+import os, sys, time, asyncio
+import httpx
+from bench._common import pct, save, start_server
+
+LEVELS = [int(x) for x in os.getenv("BENCH_LEVELS", "50,100,250,500").split(",")]
+SLOTS = 200
+
+def seed(base: str):
+    httpx.post(base + "/api/profile", json={"user_id": 1, "name": "Bench", "is_published": True})
+    rows = [{"profile_id": 1, "date": f"2030-01-{1 + i // 48:02d}", "time": f"{(i % 48) // 4 + 8:02d}:{(i % 4) * 15:02d}",
+             "timezone": "UTC", "duration_min": 15} for i in range(SLOTS)]
+    httpx.post(base + "/api/availability", json=rows, timeout=30)
+    httpx.post(base + "/api/uploads", json={"filename": "cv.pdf", "mime": "application/pdf", "size": 1000})
+
+async def drive(base: str, clients: int, seconds: float) -> dict:
+    paths = ["/api/availability/1?limit=50", "/api/uploads/1", "/api/profile/bench"]
+    lat, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        async def worker(i: int):
+            nonlocal errors
+            n = i
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(paths[n % len(paths)])
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                lat.append((time.perf_counter() - t0) * 1000)
+                n += 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        wall = time.perf_counter() - t0
+    return {"clients": clients, "requests": len(lat), "rps": round(len(lat) / wall, 1), "errors": errors,
+            "p50_ms": round(pct(lat, 50), 2), "p99_ms": round(pct(lat, 99), 2)}
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    result = {"seconds_per_level": seconds}
+    for mode in ("sync", "async"):
+        proc, base = start_server(DB_ASYNC="1" if mode == "async" else "0", PROFILE_CACHE_SIZE="0")
+        try:
+            seed(base)
+            result[mode] = [asyncio.run(drive(base, c, seconds)) for c in LEVELS]
+        finally:
+            proc.terminate(); proc.wait()
+    save("async_vs_sync", result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Per-slot commit (old upsert_slots) vs. single-transaction bulk insert for a week of slots.
+# Usage (from backend/): python -m bench.availability_bulk [slots]
+import sys, time
+from datetime import date, timedelta
+from bench._common import load_app, save
+
+def week(profile_id: int, n: int):
+    start = date(2030, 1, 7)
+    for i in range(n):
+        d = start + timedelta(days=i // 48)
+        m = (i % 48) * 15
+        yield {"profile_id": profile_id, "date": d.isoformat(), "time": f"{8 + m // 60:02d}:{m % 60:02d}",
+               "timezone": "UTC", "status": "open", "duration_min": 15}
+
+def per_row(main, rows):
+    db = main.SessionLocal()
+    try:
+        for r in rows:
+            s = main.Slot(**r)
+            db.add(s); db.commit(); db.refresh(s)
+    finally:
+        db.close()
+
+def main_():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    main = load_app()
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    rows = list(week(1, n))
+
+    t0 = time.perf_counter(); per_row(main, rows[:1]); one_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter(); per_row(main, rows); legacy_ms = (time.perf_counter() - t0) * 1000
+    items = [main.SlotIn(**r) for r in week(2, n)]  # separate profiles: slots may not overlap
+    db = main.SessionLocal()
+    try:
+        t0 = time.perf_counter(); main.upsert_slots(items, db); handler_ms = (time.perf_counter() - t0) * 1000
+    finally:
+        db.close()
+    t0 = time.perf_counter()
+    r = client.post("/api/availability", json=list(week(3, n)))
+    bulk_ms = (time.perf_counter() - t0) * 1000
+    assert r.status_code == 200 and len(r.json()) == n, r.text[:200]
+
+    save("availability_bulk", {
+        "slots": n,
+        "single_slot_ms": round(one_ms, 2),
+        "per_row_commit_ms": round(legacy_ms, 2),
+        "bulk_handler_ms": round(handler_ms, 2),
+        "bulk_endpoint_ms": round(bulk_ms, 2),
+        "speedup_handler": round(legacy_ms / handler_ms, 1) if handler_ms else None,
+    })
+
+if __name__ == "__main__":
+    main_()
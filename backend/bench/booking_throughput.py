@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Booking throughput under contention: hundreds of concurrent clients hammer a handful of hot
+# slots through POST /api/slots/{id}/book (one conditional UPDATE, no locks). Each round opens a
+# fresh set of hot slots; every slot must end up with exactly one winner.
+# Usage (from backend/): python -m bench.booking_throughput [bookers,...] [hot] [rounds]
+#   (default 100,300,500 bookers, 8 hot slots, 5 rounds; BENCH_WORKERS=uvicorn workers, default 2)
+import os, sys, time, asyncio
+import httpx
+from bench._common import pct, save, start_server
+
+WORKERS = int(os.getenv("BENCH_WORKERS", "2"))
+
+async def seed(client, count: int) -> list:
+    ids = []
+    for i in range(0, count, 500):
+        batch = [{"profile_id": 1, "date": f"2030-{1 + k // (28 * 24):02d}-{1 + k // 24 % 28:02d}",
+                  "time": f"{k % 24:02d}:00", "timezone": "UTC"} for k in range(i, min(i + 500, count))]
+        r = await client.post("/api/availability", json=batch)
+        assert r.status_code == 200, r.text[:200]
+        ids += [s["id"] for s in r.json()]
+    return ids
+
+async def run(client, ids: list, bookers: int, hot: int, rounds: int) -> dict:
+    lat, errors, bad_slots, attempts = [], 0, 0, 0
+    elapsed = 0.0
+    for rnd in range(rounds):
+        slots = ids[rnd * hot:(rnd + 1) * hot]
+        wins = {s: 0 for s in slots}
+
+        async def one(k: int):
+            sid = slots[k % hot]
+            t0 = time.perf_counter()
+            r = await client.post(f"/api/slots/{sid}/book")
+            lat.append((time.perf_counter() - t0) * 1000)
+            return sid, r.status_code
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(k) for k in range(bookers)))
+        elapsed += time.perf_counter() - t0
+        attempts += bookers
+        for sid, code in results:
+            if code == 200:
+                wins[sid] += 1
+            elif code != 409:
+                errors += 1
+        bad_slots += sum(1 for w in wins.values() if w != 1)
+    return {"bookers": bookers, "hot_slots": hot, "rounds": rounds, "attempts": attempts,
+            "attempts_per_s": round(attempts / elapsed, 1), "p50_ms": round(pct(lat, 50), 2),
+            "p99_ms": round(pct(lat, 99), 2), "errors": errors, "slots_not_won_exactly_once": bad_slots}
+
+async def drive(base: str, levels: list, hot: int, rounds: int) -> list:
+    top = max(levels)
+    limits = httpx.Limits(max_connections=top, max_keepalive_connections=top)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        ids = await seed(client, len(levels) * hot * rounds)
+        out = []
+        for i, n in enumerate(levels):
+            chunk = ids[i * hot * rounds:(i + 1) * hot * rounds]
+            out.append(await run(client, chunk, n, hot, rounds))
+            print(f"{n} bookers done", file=sys.stderr)
+        return out
+
+def main_():
+    levels = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "100,300,500").split(",")]
+    hot = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    proc, base = start_server(workers=WORKERS)
+    try:
+        results = asyncio.run(drive(base, levels, hot, rounds))
+    finally:
+        proc.terminate(); proc.wait()
+    save("booking_throughput", {"workers": WORKERS, "results": results})
+
+if __name__ == "__main__":
+    main_()
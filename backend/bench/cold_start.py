@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Cold start: `python -X importtime -c "import main"` broken down per module, time from spawning
+# uvicorn to the first 200 on /health, and first vs warm request latency for one route per router
+# module (the first hit on a lazy prefix includes its import).
+# Usage (from backend/): python -m bench.cold_start [runs]          (default 3; medians reported)
+#                        python -m bench.cold_start --gate [runs]   exit 1 if a budget is exceeded
+# Budgets (ms): IMPORT_BUDGET_MS, COLD_START_BUDGET_MS, FIRST_REQUEST_BUDGET_MS.
+import os, re, sys, time, tempfile, statistics, subprocess
+from bench._common import ROOT, free_port, save
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2500"))
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "4000"))
+FIRST_REQUEST_BUDGET_MS = float(os.getenv("FIRST_REQUEST_BUDGET_MS", "500"))
+
+ROUTES = [  # (module, method, path)
+    ("main", "GET", "/health/db"),
+    ("main", "GET", "/api/profiles"),
+    ("metrics_ext", "GET", "/metrics"),
+    ("stripe_ext_live", "POST", "/api/stripe/checkout"),
+    ("auth_ext", "GET", "/api/auth/session"),
+    ("notify_ext", "GET", "/api/notify/outbox"),
+    ("security_ext", "GET", "/api/security/csrf"),
+    ("org_ext", "GET", "/api/org/members?org_id=1"),
+    ("audit_ext", "GET", "/api/audit"),
+]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+def fresh_env() -> dict:
+    db = os.path.join(tempfile.mkdtemp(prefix="oi_bench_"), "bench.db")
+    return dict(os.environ, DATABASE_URL=f"sqlite:///{db}")
+
+def import_profile(env: dict, top: int = 15) -> dict:
+    """One `-X importtime` run: total for main, the heaviest top-level imports, and our addons."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = [(int(s), int(c), len(ind), name) for s, c, ind, name in IMPORT_LINE.findall(out)]
+    ms = lambda us: round(us / 1000, 1)
+    main = next(c for s, c, depth, name in rows if name == "main")
+    own = [(name, s, c) for s, c, depth, name in rows if name.startswith("addons.")]
+    # Modules imported directly by main (depth 3) or at interpreter startup (depth 1, e.g. .pth files).
+    direct = sorted(((name, c) for s, c, depth, name in rows if depth in (1, 3)), key=lambda r: -r[1])
+    direct = [(name, c) for name, c in direct if name != "main"]
+    return {"main_ms": ms(main),
+            "main_self_ms": ms(next(s for s, c, depth, name in rows if name == "main")),
+            "top_imports_ms": {name: ms(c) for name, c in direct[:top]},
+            "addons_ms": {name: ms(c) for name, s, c in sorted(own, key=lambda r: -r[2])}}
+
+def server_start(env: dict) -> dict:
+    """Spawn uvicorn on a migrated database; time to the first /health 200, then each route twice."""
+    import httpx
+    subprocess.run([sys.executable, "migrate.py"], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=ROOT, env=env)
+    try:
+        with httpx.Client(base_url=base, timeout=30) as client:
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if proc.poll() is not None or time.perf_counter() - t0 > 60:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.01)
+            ready_ms = (time.perf_counter() - t0) * 1000
+            routes = {}
+            for module, method, path in ROUTES:
+                samples, status = [], None
+                for _ in range(2):
+                    t1 = time.perf_counter()
+                    status = client.request(method, path).status_code
+                    samples.append((time.perf_counter() - t1) * 1000)
+                routes[path] = {"module": module, "status": status, "first_ms": samples[0], "warm_ms": samples[1]}
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"ready_ms": ready_ms, "routes": routes}
+
+def median_of(values) -> float:
+    return round(statistics.median(values), 1)
+
+def main_(argv) -> int:
+    gate = "--gate" in argv
+    args = [a for a in argv if not a.startswith("--")]
+    runs = int(args[0]) if args else 3
+    imports = [import_profile(fresh_env()) for _ in range(runs)]
+    starts = [server_start(fresh_env()) for _ in range(runs)]
+    first_request = {path: {"module": module, "status": starts[0]["routes"][path]["status"],
+                            "first_ms": median_of(s["routes"][path]["first_ms"] for s in starts),
+                            "warm_ms": median_of(s["routes"][path]["warm_ms"] for s in starts)}
+                     for module, _, path in ROUTES}
+    result = {"runs": runs,
+              "import_ms": median_of(i["main_ms"] for i in imports),
+              "ready_ms": median_of(s["ready_ms"] for s in starts),
+              "first_request": first_request,
+              "import_profile": min(imports, key=lambda i: i["main_ms"]),
+              "budget_ms": {"import": IMPORT_BUDGET_MS, "cold_start": COLD_START_BUDGET_MS,
+                            "first_request": FIRST_REQUEST_BUDGET_MS}}
+    failures = []
+    if result["import_ms"] > IMPORT_BUDGET_MS:
+        failures.append(f"import {result['import_ms']} ms > {IMPORT_BUDGET_MS} ms")
+    if result["ready_ms"] > COLD_START_BUDGET_MS:
+        failures.append(f"cold start {result['ready_ms']} ms > {COLD_START_BUDGET_MS} ms")
+    for path, r in first_request.items():
+        if r["status"] >= 500:
+            failures.append(f"{path} answered {r['status']}")
+        elif r["first_ms"] > FIRST_REQUEST_BUDGET_MS:
+            failures.append(f"{path} first request {r['first_ms']} ms > {FIRST_REQUEST_BUDGET_MS} ms")
+    result["failures"] = failures
+    result["status"] = "FAIL" if failures else "PASS"
+    save("cold_start", result)
+    return 1 if gate and failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_(sys.argv[1:]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Response encoding for list-heavy routes: FastAPI default (jsonable_encoder + stdlib json on ORM
+# objects) vs. FastJSONResponse over pre-shaped rows, with the stdlib and orjson engines.
+# Usage (from backend/): python -m bench.json_encode [rows,...]   (default 1000,10000,100000)
+import sys, time
+from datetime import date, timedelta
+from bench._common import load_app, pct, save
+
+def timed(fn, reps):
+    samples = []
+    for _ in range(reps):
+        t0 = time.perf_counter(); fn(); samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(pct(samples, 50), 3), "p99_ms": round(pct(samples, 99), 3)}
+
+def main_():
+    sizes = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "1000,10000,100000").split(",")]
+    main = load_app()
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from addons import fast_json, audit_ext
+    engines = ["stdlib"] + (["orjson"] if fast_json.orjson is not None else [])
+
+    with main.SessionLocal() as db:
+        db.execute(main.insert(main.Slot.__table__), [
+            {"profile_id": 1, "date": (date(2030, 1, 1) + timedelta(days=i // 48)).isoformat(),
+             "time": f"{i % 48 // 2:02d}:{i % 2 * 30:02d}", "timezone": "UTC", "status": "open"}
+            for i in range(max(sizes))])
+        db.commit()
+    for i in range(max(sizes)):
+        audit_ext.append_audit("bench", "org.invite", f"org:{i % 50}", {"email": f"u{i}@example.com", "role": "member"})
+
+    results = []
+    for n in sizes:
+        reps = max(5, min(200, 200_000 // n))
+        with main.SessionLocal() as db:
+            orm = db.query(main.Slot).filter(main.Slot.profile_id == 1).order_by(main.Slot.id).limit(n).all()
+            # old list_slots: ORM objects -> slot_dict -> jsonable_encoder -> JSONResponse
+            row = {"rows": n, "slots": {"fastapi_default": timed(
+                lambda: JSONResponse(jsonable_encoder([main.slot_dict(s) for s in orm])), reps)}}
+            shaped = [r._asdict() for r in db.query(*main.SLOT_COLUMNS).filter(main.Slot.profile_id == 1)
+                      .order_by(main.Slot.id).limit(n).all()]
+        items = audit_ext.AUDIT[:n]
+        row["audit"] = {"fastapi_default": timed(lambda: JSONResponse(jsonable_encoder({"items": items})), reps)}
+        for eng in engines:
+            fast_json.ENGINE = eng
+            row["slots"][eng] = timed(lambda: fast_json.FastJSONResponse(shaped), reps)
+            row["audit"][eng] = timed(lambda: fast_json.FastJSONResponse({"items": items}), reps)
+        results.append(row)
+        print(f"{n} rows done", file=sys.stderr)
+    save("json_encode", {"engines": engines, "results": results})
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# HTTP load test of the backend's scripted flows (profile upsert, slot list, upload meta, notify
+# send, org invite) at a fixed arrival rate (--rps, open loop) or a fixed number of clients
+# (--concurrency, closed loop). Reports p50/p95/p99, throughput and error rate per route and overall.
+# Targets: the app in-process over ASGI (default; shares the CPU with the driver), a uvicorn
+# subprocess on a fresh database (--server [--workers N]), or a running deployment (--url).
+# Usage (from backend/): python -m bench.load_test --concurrency 50 --duration 10
+#                        python -m bench.load_test --rps 200 --flows slot_list,profile_upsert --server
+#                        python -m bench.load_test ... --gate   exit 1 if a budget is exceeded
+# Budgets: LOAD_P99_BUDGET_MS, LOAD_ERROR_BUDGET (fraction), LOAD_MIN_THROUGHPUT (fraction of --rps).
+# Orgs live in process memory: run org_invite against one worker.
+import os, sys, time, asyncio, argparse, tempfile
+import httpx
+from bench._common import pct, save, start_server
+
+LOAD_P99_BUDGET_MS = float(os.getenv("LOAD_P99_BUDGET_MS", "500"))
+LOAD_ERROR_BUDGET = float(os.getenv("LOAD_ERROR_BUDGET", "0.01"))
+LOAD_MIN_THROUGHPUT = float(os.getenv("LOAD_MIN_THROUGHPUT", "0.9"))
+USERS = 500  # distinct profiles the upsert flow cycles through
+SLOTS = 200
+MAX_INFLIGHT = 1000  # open loop: arrivals beyond this many unfinished flows are dropped (and count as errors)
+
+FLOWS = {}
+
+def flow(name: str):
+    def register(fn):
+        FLOWS[name] = fn
+        return fn
+    return register
+
+class Run:
+    """Latency samples and outcomes per route template; a status >= 400 or a transport error is an error."""
+
+    def __init__(self, client: httpx.AsyncClient, ctx: dict):
+        self.client, self.ctx = client, ctx
+        self.latency, self.errors, self.statuses = {}, {}, {}
+        self.dropped = 0
+
+    async def request(self, route: str, method: str, url: str, **kw):
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+            status = str(r.status_code)
+        except httpx.HTTPError as exc:
+            r, status = None, type(exc).__name__
+        self.latency.setdefault(route, []).append((time.perf_counter() - t0) * 1000)
+        counts = self.statuses.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+        if r is None or r.status_code >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        return r
+
+@flow("profile_upsert")
+async def profile_upsert(run: Run, i: int):
+    await run.request("POST /api/profile", "POST", "/api/profile", json={
+        "user_id": 1000 + i % USERS, "name": f"Load {i % USERS}", "headline": f"engineer {i}", "is_published": True})
+
+@flow("slot_list")
+async def slot_list(run: Run, i: int):
+    await run.request("GET /api/availability/{profile_id}", "GET",
+                      f"/api/availability/{run.ctx['profile_id']}", params={"limit": 50})
+
+@flow("upload_meta")
+async def upload_meta(run: Run, i: int):
+    r = await run.request("POST /api/uploads", "POST", "/api/uploads",
+                          json={"filename": f"cv{i}.pdf", "mime": "application/pdf", "size": 1000 + i})
+    if r is not None:
+        await run.request("GET /api/uploads/{upload_id}", "GET", f"/api/uploads/{r.json()['id']}")
+
+@flow("notify_send")
+async def notify_send(run: Run, i: int):
+    await run.request("POST /api/notify/send", "POST", "/api/notify/send", json={
+        "to": f"load{i % USERS}@example.com", "template": "generic", "subject": "Load test", "variables": {"i": i}})
+
+@flow("org_invite")
+async def org_invite(run: Run, i: int):
+    await run.request("POST /api/org/invite", "POST", "/api/org/invite",
+                      json={"org_id": run.ctx["org_id"], "email": f"load{i % USERS}@example.com"})
+
+async def seed(client: httpx.AsyncClient) -> dict:
+    """One published profile with SLOTS open slots and one org owned by the default demo user."""
+    profile = (await client.post("/api/profile", json={"user_id": 1, "name": "Load Seed", "is_published": True})).json()
+    rows = [{"profile_id": profile["id"], "date": f"2030-01-{1 + i // 48:02d}",
+             "time": f"{(i % 48) // 4 + 8:02d}:{(i % 4) * 15:02d}", "timezone": "UTC", "duration_min": 15}
+            for i in range(SLOTS)]
+    (await client.post("/api/availability", json=rows)).raise_for_status()
+    org = (await client.post("/api/org", json={"name": "Load"})).json()
+    return {"profile_id": profile["id"], "org_id": org["id"]}
+
+async def closed_loop(run: Run, flows, concurrency: int, seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(w: int):
+        n = 0
+        while time.perf_counter() < deadline:  # each client cycles through every flow
+            await FLOWS[flows[(w + n) % len(flows)]](run, n * concurrency + w)
+            n += 1
+    await asyncio.gather(*(client_loop(w) for w in range(concurrency)))
+
+async def open_loop(run: Run, flows, rps: float, seconds: float) -> None:
+    """Start a flow every 1/rps seconds whether or not earlier ones finished, so a slow server
+    shows up as latency and drops rather than as a lower request rate."""
+    start, inflight = time.perf_counter(), set()
+    for k in range(int(rps * seconds)):
+        delay = start + k / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= MAX_INFLIGHT:
+            run.dropped += 1
+            continue
+        task = asyncio.create_task(FLOWS[flows[k % len(flows)]](run, k))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    await asyncio.gather(*inflight)
+
+def summarize(samples, errors: int, wall: float) -> dict:
+    return {"requests": len(samples), "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "throughput_rps": round(len(samples) / wall, 1),
+            "p50_ms": round(pct(samples, 50), 2) if samples else None,
+            "p95_ms": round(pct(samples, 95), 2) if samples else None,
+            "p99_ms": round(pct(samples, 99), 2) if samples else None}
+
+async def drive(base: str, transport, args, flows) -> dict:
+    clients = args.concurrency or MAX_INFLIGHT
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, transport=transport, limits=limits, timeout=30) as client:
+        run = Run(client, await seed(client))
+        t0 = time.perf_counter()
+        if args.rps:
+            await open_loop(run, flows, args.rps, args.duration)
+        else:
+            await closed_loop(run, flows, args.concurrency, args.duration)
+        wall = time.perf_counter() - t0
+    samples = [ms for route in run.latency.values() for ms in route]
+    overall = summarize(samples, sum(run.errors.values()) + run.dropped, wall)
+    overall["dropped"] = run.dropped
+    if run.dropped:  # dropped arrivals never produced a sample but still count against the error rate
+        overall["error_rate"] = round(overall["errors"] / (len(samples) + run.dropped), 4)
+    return {"overall": overall,
+            "routes": {route: {**summarize(ms, run.errors.get(route, 0), wall), "statuses": run.statuses[route]}
+                       for route, ms in sorted(run.latency.items())}}
+
+async def drive_in_process(args, flows) -> dict:
+    from bench._common import load_app
+    main = load_app()
+    await main.app.router.startup()
+    try:
+        return await drive("http://load.test", httpx.ASGITransport(app=main.app), args, flows)
+    finally:
+        await main.app.router.shutdown()
+
+def check(result: dict, rps: float) -> list:
+    overall, failures = result["overall"], []
+    if overall["p99_ms"] is not None and overall["p99_ms"] > LOAD_P99_BUDGET_MS:
+        failures.append(f"p99 {overall['p99_ms']} ms > {LOAD_P99_BUDGET_MS} ms")
+    if overall["error_rate"] > LOAD_ERROR_BUDGET:
+        failures.append(f"error rate {overall['error_rate']} > {LOAD_ERROR_BUDGET}")
+    if rps and overall["throughput_rps"] < LOAD_MIN_THROUGHPUT * rps * result["requests_per_flow"]:
+        failures.append(f"throughput {overall['throughput_rps']} req/s < {LOAD_MIN_THROUGHPUT:.0%} of target")
+    return failures
+
+def main_(argv) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.load_test")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--rps", type=float, help="flow arrivals per second (open loop)")
+    mode.add_argument("--concurrency", type=int, help="clients, each running flows back to back (default 20)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds (default 10)")
+    ap.add_argument("--flows", default=",".join(FLOWS), help=f"comma-separated, from {','.join(FLOWS)}")
+    target = ap.add_mutually_exclusive_group()
+    target.add_argument("--server", action="store_true", help="uvicorn subprocess on a fresh database")
+    target.add_argument("--url", help="base URL of a running deployment")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers with --server (default 1)")
+    ap.add_argument("--gate", action="store_true", help="exit 1 if a budget is exceeded")
+    args = ap.parse_args(argv)
+    if not args.rps and not args.concurrency:
+        args.concurrency = 20
+    flows = args.flows.split(",")
+    unknown = [f for f in flows if f not in FLOWS]
+    if unknown:
+        ap.error(f"unknown flows: {', '.join(unknown)}")
+
+    # The notify flow writes one outbox file per send; keep them out of the tracked qa/ tree.
+    scratch = tempfile.mkdtemp(prefix="oi_load_")
+    notify_env = {"NOTIFY_OUTBOX_DIR": os.path.join(scratch, "outbox"),
+                  "NOTIFY_STATE_PATH": os.path.join(scratch, "session.json")}
+    if args.url:
+        target_name, result = args.url, asyncio.run(drive(args.url, None, args, flows))
+    elif args.server:
+        target_name = f"server ({args.workers} workers)"
+        proc, base = start_server(workers=args.workers, **notify_env)
+        try:
+            result = asyncio.run(drive(base, None, args, flows))
+        finally:
+            proc.terminate(); proc.wait()
+    else:
+        target_name = "in-process"
+        os.environ.update(notify_env)
+        result = asyncio.run(drive_in_process(args, flows))
+
+    result = {"target": target_name, "mode": "rps" if args.rps else "concurrency",
+              "load": args.rps or args.concurrency, "duration_s": args.duration, "flows": flows,
+              # upload_meta issues two requests per flow, the others one
+              "requests_per_flow": round(sum(2 if f == "upload_meta" else 1 for f in flows) / len(flows), 2),
+              **result,
+              "budget": {"p99_ms": LOAD_P99_BUDGET_MS, "error_rate": LOAD_ERROR_BUDGET,
+                         "min_throughput": LOAD_MIN_THROUGHPUT if args.rps else None}}
+    result["failures"] = check(result, args.rps)
+    result["status"] = "FAIL" if result["failures"] else "PASS"
+    save("load_test", result)
+    return 1 if args.gate and result["failures"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main_(sys.argv[1:]))
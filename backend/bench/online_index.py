@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Online index build: N profiles without the directory indexes, then migration 4 is built by
+# migrations.run_online (as the app's background thread does) while a reader pages the
+# directory and a writer saves profiles. Reports build time and reader/writer latency during it.
+# Usage (from backend/): python -m bench.online_index [profiles]   (default 500000)
+import sys, time, threading
+from sqlalchemy import text
+from bench._common import load_app, pct, save
+
+def main_():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    main = load_app(PROFILE_CACHE_SIZE="0")
+    from addons import migrations
+    with main.engine.begin() as conn:
+        for idx in sorted(main.ONLINE_INDEXES):
+            conn.execute(text(f"DROP INDEX {idx}"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 4"))
+        for start in range(0, n, 50_000):
+            conn.execute(main.insert(main.Profile.__table__), [
+                {"user_id": i % 5000, "name": f"Person {i}", "headline": "engineer", "bio": "bio " * 100,
+                 "avatar_url": "", "is_published": True, "public_slug": f"p{i}", "updated_at": i}
+                for i in range(start, min(start + 50_000, n))])
+
+    stop, reads, writes = threading.Event(), [], []
+
+    def reader():
+        with main.SessionLocal() as db:
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                main.query_directory(db, 7, None, None, None, "id,name", None, 50)
+                reads.append((time.perf_counter() - t0) * 1000)
+
+    def writer():
+        k = 0
+        with main.SessionLocal() as db:
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                main.save_profile(db, main.ProfileIn(user_id=10**6 + k, name=f"New {k}", is_published=True))
+                writes.append((time.perf_counter() - t0) * 1000)
+                k += 1
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=reader), threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    time.sleep(1.0)
+    before = (len(reads), len(writes))
+    t0 = time.perf_counter()
+    migrations.run_online(main.engine, main.MIGRATIONS, threading.Event(), retry=0.5, log=lambda *_: None)
+    build_s = time.perf_counter() - t0
+    during = (reads[before[0]:], writes[before[1]:])
+    time.sleep(1.0)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    def summary(samples):
+        return {"count": len(samples), "p50_ms": round(pct(samples, 50), 2), "p99_ms": round(pct(samples, 99), 2),
+                "max_ms": round(max(samples), 2) if samples else None}
+    save("online_index", {"profiles": n, "build_s": round(build_s, 2),
+                          "schema": migrations.status(main.engine, main.MIGRATIONS),
+                          "reads_before": summary(reads[:before[0]]), "reads_during": summary(during[0]),
+                          "writes_before": summary(writes[:before[1]]), "writes_during": summary(during[1])})
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# Profile directory paging: a full page (with the ~2 KB bio) vs a list-view projection served
+# from the covering index, first page vs a deep page (cursor), and OFFSET paging for comparison.
+# Usage (from backend/): python -m bench.profile_directory [profiles]   (default 200000)
+import sys, time
+from sqlalchemy import text
+from bench._common import load_app, pct, save
+
+LIST_FIELDS = "id,name,headline,public_slug,avatar_url"
+
+def timed(fn, reps: int = 50) -> dict:
+    samples = []
+    for _ in range(reps):
+        t0 = time.perf_counter(); fn(); samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(pct(samples, 50), 3), "p99_ms": round(pct(samples, 99), 3)}
+
+def main_():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    main = load_app()
+    bio = "lorem ipsum dolor sit amet " * 80
+    with main.engine.begin() as conn:
+        for start in range(0, n, 20_000):
+            conn.execute(main.insert(main.Profile.__table__), [
+                {"user_id": i % 1000, "name": f"Person {i}", "headline": "engineer", "bio": bio, "avatar_url": "",
+                 "is_published": i % 5 != 0, "public_slug": f"p{i}", "updated_at": 1_700_000_000_000 + i}
+                for i in range(start, min(start + 20_000, n))])
+    deep = n // 2  # rows to skip for the deep page
+
+    with main.SessionLocal() as db:
+        def walk_to():
+            items, cursor = main.query_directory(db, None, True, None, None, "id", None, 500)
+            skipped = len(items)
+            while cursor and skipped < deep:
+                items, cursor = main.query_directory(db, None, True, None, None, "id", cursor, 500)
+                skipped += len(items)
+            return cursor
+        cursor = walk_to()
+        out = {"profiles": n, "page_size": 50, "deep_page_offset": deep}
+        for label, fields in (("all_fields", None), ("list_fields", LIST_FIELDS)):
+            out[label] = {
+                "first_page": timed(lambda: main.query_directory(db, None, True, None, None, fields, None, 50)),
+                "deep_page_cursor": timed(lambda: main.query_directory(db, None, True, None, None, fields, cursor, 50)),
+            }
+        out["list_fields"]["deep_page_offset"] = timed(lambda: db.execute(text(
+            "SELECT id, name, headline, public_slug, avatar_url FROM profiles WHERE is_published = 1 "
+            "ORDER BY updated_at DESC, id DESC LIMIT 50 OFFSET :o"), {"o": deep}).all(), 10)
+        out["owner_page"] = timed(lambda: main.query_directory(db, 7, None, None, None, LIST_FIELDS, None, 50))
+    save("profile_directory", out)
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Profile search at scale: builds N profiles (80% published), rebuilds the FTS5 index from them,
+# then times ranked searches (selective / common / prefix / multi-word), a deep cursor page,
+# the LIKE scan search replaces, and the extra cost of keeping the index in sync on upsert.
+# Usage (from backend/): python -m bench.profile_search [profiles]   (default 1000000)
+import sys, time, random
+from sqlalchemy import text
+from bench._common import load_app, pct, save
+
+FIRST = [f"fn{i}" for i in range(3000)]
+LAST = [f"ln{i}" for i in range(5000)]
+LEVELS = ["junior", "senior", "staff", "principal", "lead"]
+STACKS = ["python", "rust", "go", "java", "react", "kubernetes", "postgres", "data", "ml", "ios"]
+ROLES = ["engineer", "manager", "coach", "designer", "scientist"]
+WORDS = [f"w{i}" for i in range(20000)]
+
+# ~20% / ~10% / ~0.4% of profiles match the common, prefix and multi-word queries.
+QUERIES = {"selective_name": "ada lovelace", "common_word": "engineer", "prefix": "kuber",
+           "multi_word": "senior rust engineer", "rare_token": "w12345"}
+
+def timed(fn, reps: int) -> dict:
+    samples = []
+    for _ in range(reps):
+        t0 = time.perf_counter(); fn(); samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(pct(samples, 50), 2), "p99_ms": round(pct(samples, 99), 2)}
+
+def seed(main, n: int) -> None:
+    rnd = random.Random(7)
+    with main.engine.begin() as conn:
+        for start in range(0, n, 50_000):
+            conn.execute(main.insert(main.Profile.__table__), [
+                {"user_id": i, "name": "Ada Lovelace" if i % 10_000 == 0 else f"{rnd.choice(FIRST)} {rnd.choice(LAST)}",
+                 "headline": f"{rnd.choice(LEVELS)} {rnd.choice(STACKS)} {rnd.choice(ROLES)}",
+                 "bio": " ".join(rnd.choices(WORDS, k=40)),
+                 "avatar_url": "", "is_published": rnd.random() < 0.8, "public_slug": f"p{i}"}
+                for i in range(start, min(start + 50_000, n))])
+            print(f"{min(start + 50_000, n)} profiles", file=sys.stderr)
+
+def main_():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    main = load_app(PROFILE_CACHE_SIZE="0")
+    from addons import profile_search
+    seed(main, n)
+    with main.engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {profile_search.TABLE}"))
+    t0 = time.perf_counter()
+    with main.engine.begin() as conn:
+        profile_search.ensure_index(conn)
+    build_s = round(time.perf_counter() - t0, 1)
+
+    out = {"profiles": n, "index_build_s": build_s, "queries": {}}
+    with main.SessionLocal() as db:
+        for name, q in QUERIES.items():
+            items, cursor = main.search_profiles(db, q, None, 20)
+            row = {"q": q, "first_page": timed(lambda: main.search_profiles(db, q, None, 20), 30), "hits": len(items)}
+            for _ in range(4):  # walk to page 5
+                if cursor:
+                    _, cursor = main.search_profiles(db, q, cursor, 20)
+            if cursor:
+                row["page_5"] = timed(lambda: main.search_profiles(db, q, cursor, 20), 30)
+            out["queries"][name] = row
+        like = "%lovelace%"
+        out["like_scan"] = timed(lambda: db.execute(text(
+            "SELECT id FROM profiles WHERE is_published AND (name LIKE :q OR headline LIKE :q OR bio LIKE :q) "
+            "ORDER BY id LIMIT 20"), {"q": like}).all(), 3)
+
+    def upsert(k, sync):
+        main.SEARCH_ENABLED = sync
+        main.save_profile(db, main.ProfileIn(user_id=10**9 + k, name=f"Bench {k}", headline="rust engineer",
+                                             bio="writes benchmarks " * 20, is_published=True))
+    with main.SessionLocal() as db:
+        for label, sync in (("upsert_without_index", False), ("upsert_with_index", True)):
+            ks = iter(range(10**6 * sync, 10**6 * sync + 1000))
+            out[label] = timed(lambda: upsert(next(ks), sync), 200)
+    main.SEARCH_ENABLED = True
+    save("profile_search", out)
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Many clients racing for the same slot: every round must have exactly one winner.
+#  - book:   N clients POST /api/availability/1/book for the same open slot
+#  - insert: N clients POST overlapping slots (different starts inside one 30-minute window)
+#  - check:  cost of one overlap check against 1k/10k/100k stored slots (in-process)
+# Usage (from backend/): python -m bench.slot_contention [clients] [rounds]   (BENCH_WORKERS=uvicorn workers)
+import os, sys, time, asyncio
+from datetime import date, timedelta
+import httpx
+from bench._common import load_app, pct, save, start_server
+
+WORKERS = int(os.getenv("BENCH_WORKERS", "1"))
+
+def at(i: int) -> dict:
+    d = date(2030, 1, 1) + timedelta(days=i // 16)
+    return {"date": d.isoformat(), "time": f"{8 + (i % 16) // 2:02d}:{(i % 2) * 30:02d}", "timezone": "UTC"}
+
+async def race(client, clients: int, rounds: int, make) -> dict:
+    lat, winners, errors, bad_rounds = [], [], 0, 0
+    for rnd in range(rounds):
+        async def one(k: int):
+            t0 = time.perf_counter()
+            method, path, body = make(rnd, k)
+            r = await client.request(method, path, json=body)
+            lat.append((time.perf_counter() - t0) * 1000)
+            return r.status_code
+        codes = await asyncio.gather(*(one(k) for k in range(clients)))
+        won = codes.count(200)
+        errors += sum(1 for c in codes if c not in (200, 409))
+        winners.append(won)
+        bad_rounds += won != 1
+    return {"rounds": rounds, "clients": clients, "winners_per_round": sorted(set(winners)), "bad_rounds": bad_rounds,
+            "errors": errors, "p50_ms": round(pct(lat, 50), 2), "p99_ms": round(pct(lat, 99), 2)}
+
+async def drive(base: str, clients: int, rounds: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        r = await client.post("/api/availability", json=[dict(at(i), profile_id=1) for i in range(rounds)])
+        assert r.status_code == 200, r.text[:200]
+        book = await race(client, clients, rounds, lambda rnd, k: ("POST", "/api/availability/1/book", at(rnd)))
+
+        def overlapping(rnd, k):
+            d = (date(2031, 1, 1) + timedelta(days=rnd)).isoformat()
+            return "POST", "/api/availability", [{"profile_id": 2, "date": d, "time": f"09:{k % 30:02d}", "timezone": "UTC"}]
+        insert = await race(client, clients, rounds, overlapping)
+    return {"book": book, "insert": insert}
+
+def check_cost() -> list:
+    main = load_app()
+    out = []
+    for n in (1_000, 10_000, 100_000):
+        pid = n
+        with main.SessionLocal() as db:
+            base = 1_900_000_000
+            db.execute(main.insert(main.Slot.__table__),
+                       [{"profile_id": pid, "date": "", "time": "", "timezone": "UTC", "status": "open",
+                         "starts_at": base + i * 1800, "duration_min": 30} for i in range(n)])
+            db.commit()
+            samples = []
+            for k in range(500):
+                start = base + (k * 7919 % n) * 1800 + 600
+                t0 = time.perf_counter()
+                main.stored_overlaps(db, [(0, pid, start, start + 1800)])
+                samples.append((time.perf_counter() - t0) * 1000)
+        out.append({"stored_slots": n, "p50_ms": round(pct(samples, 50), 3), "p99_ms": round(pct(samples, 99), 3)})
+    return out
+
+def main_():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    proc, base = start_server(workers=WORKERS)
+    try:
+        result = {"workers": WORKERS, **asyncio.run(drive(base, clients, rounds))}
+    finally:
+        proc.terminate(); proc.wait()
+    result["overlap_check"] = check_cost()
+    save("slot_contention", result)
+
+if __name__ == "__main__":
+    main_()
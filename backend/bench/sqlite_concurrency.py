@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Mixed read/write load against SQLite with its defaults vs. the production pragma profile.
+# Writers insert small slot batches in their own transactions while readers run the
+# public availability query; "database is locked" errors and latencies are recorded.
+# Usage (from backend/): python -m bench.sqlite_concurrency [seconds] [writers] [readers]
+import os, sys, time, tempfile, threading
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from bench._common import load_app, pct, save
+from addons.sqlite_tuning import pragmas_for, apply_pragmas
+
+def run(main, profile: str, seconds: float, writers: int, readers: int) -> dict:
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="oi_bench_"), f"{profile}.db")
+    kw = main.engine_kwargs(url)
+    kw.update(pool_size=writers + readers, max_overflow=0)
+    eng = create_engine(url, **kw)
+    apply_pragmas(eng, pragmas_for(profile))
+    main.Base.metadata.create_all(bind=eng)
+    slots = main.Slot.__table__
+    stats = {"write": [], "read": [], "locked": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(n: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            rows = [{"profile_id": n % 4, "date": f"2030-{1 + i % 12:02d}-{1 + j:02d}", "time": "09:00",
+                     "timezone": "UTC", "status": "open"} for j in range(10)]
+            t0 = time.perf_counter()
+            try:
+                with eng.begin() as conn:
+                    conn.execute(insert(slots), rows)
+                with lock:
+                    stats["write"].append((time.perf_counter() - t0) * 1000)
+            except OperationalError as e:
+                with lock:
+                    stats["locked" if "locked" in str(e) else "errors"] += 1
+            i += 1
+
+    def reader(n: int):
+        q = (select(slots).where(slots.c.profile_id == n % 4, slots.c.date >= "2030-03-01")
+             .order_by(slots.c.date, slots.c.time, slots.c.id).limit(50))
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                with eng.connect() as conn:
+                    conn.execute(q).all()
+                with lock:
+                    stats["read"].append((time.perf_counter() - t0) * 1000)
+            except OperationalError as e:
+                with lock:
+                    stats["locked" if "locked" in str(e) else "errors"] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    eng.dispose()
+    return {
+        "profile": profile,
+        "writes_per_s": round(len(stats["write"]) / seconds, 1),
+        "reads_per_s": round(len(stats["read"]) / seconds, 1),
+        "write_p99_ms": round(pct(stats["write"], 99) or 0, 2),
+        "read_p99_ms": round(pct(stats["read"], 99) or 0, 2),
+        "locked_errors": stats["locked"],
+        "other_errors": stats["errors"],
+    }
+
+def main_():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    main = load_app()
+    save("sqlite_concurrency", {
+        "seconds": seconds, "writers": writers, "readers": readers,
+        "results": [run(main, p, seconds, writers, readers) for p in ("default", "production")],
+    })
+
+if __name__ == "__main__":
+    main_()
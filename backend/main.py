@@ -1,30 +1,155 @@
 
-from fastapi import FastAPI, HTTPException, Request
-from addons.org_ext import router as org_router
-from addons.audit_ext import router as audit_router
-from addons.metrics_ext import router as metrics_router
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, Query
+from addons.metrics_ext import (router as metrics_router, register_gauge, register_counter, register_snapshot,
+                                inc, RequestMetricsMiddleware)
+from addons.ttl_cache import TTLCache
+from addons.sqlite_tuning import pragmas_for, apply_pragmas, wal_checkpoint, current_pragmas
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
-import os, secrets, string
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+import os, shutil, secrets, string, time, threading, base64, json, hashlib, asyncio, logging
+from datetime import date as date_cls, time as time_cls, datetime, timedelta
+from zoneinfo import ZoneInfo
+import bisect, heapq
+from sqlalchemy import create_engine, inspect, text, select, insert, update, delete, tuple_, bindparam, func, or_, and_, Column, Integer, String, Boolean, Text, ForeignKey, Index
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv
-from addons.auth_ext import router as auth_ext_router
-from addons.notify_ext import router as notify_ext_router
-from addons.security_ext import router as security_ext_router
-from addons.stripe_ext_live import router as stripe_ext_live_router
+from addons.signed_links import sign_link, read_token
+from addons import lazy_routers
+from addons.stripe_ext_live import router as stripe_ext_live_router, set_event_sink
+from addons.webhook_queue import KeyedWorkQueue, RetryLater
+from addons import upload_store
+from addons.upload_store import UPLOAD_MAX_BYTES
+from addons.blob_response import BlobResponse, parse_range
+from addons.fast_json import FastJSONResponse
+from addons.compression import CompressionMiddleware
+from addons.static_assets import AssetStaticFiles
+from addons import recurrence, profile_search, migrations
+from addons.image_variants import VariantPool, IMAGE_MIMES, read_manifest, variant_dir
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv(override=True)
 
+log = logging.getLogger("backend")
+
 DATABASE_URL = os.getenv("DATABASE_URL","sqlite:///./app.db")
 STRIPE_MODE = os.getenv("STRIPE_MODE","mock")
 BASE_URL = os.getenv("BASE_URL","http://127.0.0.1:8000")
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+MAX_SLOT_BATCH = int(os.getenv("MAX_SLOT_BATCH", "5000"))
+SLOT_STATUSES = ("open", "booked", "closed")
+SLOT_PAGE_DEFAULT = int(os.getenv("SLOT_PAGE_DEFAULT", "500"))
+SLOT_PAGE_MAX = int(os.getenv("SLOT_PAGE_MAX", "1000"))
+SLOT_DEFAULT_MINUTES = int(os.getenv("SLOT_DEFAULT_MINUTES", "30"))
+SLOT_MAX_MINUTES = int(os.getenv("SLOT_MAX_MINUTES", "1440"))  # also bounds the overlap seek window
+SLOT_WINDOW_MAX_DAYS = int(os.getenv("SLOT_WINDOW_MAX_DAYS", "92"))
+SLOT_BACKFILL_BATCH = int(os.getenv("SLOT_BACKFILL_BATCH", "500"))
+SLOT_BACKFILL_PAUSE = float(os.getenv("SLOT_BACKFILL_PAUSE", "0.05"))  # seconds between batches
+BATCH_GET_MAX = int(os.getenv("BATCH_GET_MAX", "500"))
+DIRECTORY_PAGE_DEFAULT = int(os.getenv("DIRECTORY_PAGE_DEFAULT", "50"))
+DIRECTORY_PAGE_MAX = int(os.getenv("DIRECTORY_PAGE_MAX", "500"))
+SEARCH_PAGE_DEFAULT = int(os.getenv("SEARCH_PAGE_DEFAULT", "20"))
+SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", "100"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "2048"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+
+DOWNLOAD_SIGNING_SECRET = os.getenv("DOWNLOAD_SIGNING_SECRET", "dev-download-secret")
+DOWNLOAD_URL_TTL = int(os.getenv("DOWNLOAD_URL_TTL", "900"))
+
+STRIPE_WEBHOOK_WORKERS = int(os.getenv("STRIPE_WEBHOOK_WORKERS", "2"))
+STRIPE_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("STRIPE_WEBHOOK_MAX_ATTEMPTS", "8"))
+STRIPE_WEBHOOK_RETRY_BASE = float(os.getenv("STRIPE_WEBHOOK_RETRY_BASE", "2"))  # seconds, doubled per attempt
+STRIPE_WEBHOOK_RETRY_MAX = float(os.getenv("STRIPE_WEBHOOK_RETRY_MAX", "600"))
+STRIPE_WEBHOOK_LEASE = int(os.getenv("STRIPE_WEBHOOK_LEASE", "300"))  # seconds before a stuck claim is retaken
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")  # production | default
+SQLITE_SHUTDOWN_CHECKPOINT = os.getenv("SQLITE_SHUTDOWN_CHECKPOINT", "TRUNCATE")  # or "" to skip
+
+EAGER_ROUTERS = os.getenv("EAGER_ROUTERS", "0") == "1"  # load every router at import (no lazy prefixes)
+SCHEMA_MIGRATE = os.getenv("SCHEMA_MIGRATE", "auto")  # auto | check | off (see startup check_schema)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+POOL_STATS = {"checkouts": 0, "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+ASYNC_POOL_STATS = dict(POOL_STATS)  # same figures for the DB_ASYNC=1 engine's pool
+_pool_stats_lock = threading.Lock()
+
+class PoolTiming:
+    """Mixin for QueuePool subclasses: records how often, and how long, callers block waiting
+    for a connection, into the class's `stats` dict.
+
+    A checkout counts as a wait only when the pool was exhausted (no idle connection and no
+    overflow left), i.e. when it had to queue; opening a new overflow connection is not a wait.
+    """
+    stats: dict
+
+    def exhausted(self) -> bool:
+        return self._pool.empty() and -1 < self._max_overflow <= self._overflow
+
+    def _do_get(self):
+        blocked = self.exhausted()
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - t0
+            stats = self.stats
+            with _pool_stats_lock:
+                stats["checkouts"] += 1
+                if blocked:
+                    stats["waits"] += 1
+                    stats["wait_seconds_total"] += waited
+                    stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+class TimedQueuePool(PoolTiming, QueuePool):
+    stats = POOL_STATS
+
+class TimedAsyncQueuePool(PoolTiming, AsyncAdaptedQueuePool):
+    stats = ASYNC_POOL_STATS
+
+def engine_kwargs(url: str) -> dict:
+    kw = {"connect_args": {"check_same_thread": False} if url.startswith("sqlite") else {}}
+    # In-memory SQLite uses a per-thread singleton pool; sizing knobs don't apply there.
+    if ":memory:" not in url:
+        kw.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                  pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return kw
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+def async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+SQLITE_PRAGMAS = pragmas_for(SQLITE_PROFILE) if IS_SQLITE else {}
+
+engine = create_engine(DATABASE_URL, **engine_kwargs(DATABASE_URL))
+apply_pragmas(engine, SQLITE_PRAGMAS)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    # Opt-in; needs the async driver installed (aiosqlite for SQLite, asyncpg for Postgres).
+    _async_kw = engine_kwargs(DATABASE_URL)
+    if _async_kw.get("poolclass"):
+        _async_kw["poolclass"] = TimedAsyncQueuePool
+    async_engine = create_async_engine(os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL), **_async_kw)
+    apply_pragmas(async_engine.sync_engine, SQLITE_PRAGMAS)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class User(Base):
@@ -46,10 +171,21 @@ class Profile(Base):
     headline = Column(String)
     bio = Column(Text)
     avatar_url = Column(String)
+    avatar_sha256 = Column(String, nullable=True)  # set when the avatar is one of our uploads
     is_published = Column(Boolean, default=False)
     public_slug = Column(String, unique=True, index=True)
+    updated_at = Column(Integer, nullable=True)  # epoch ms of the last save_profile
     user = relationship("User", back_populates="profiles")
     slots = relationship("Slot", back_populates="profile")
+    # Directory indexes: filter + (updated_at, id) keyset order, then every listable column except
+    # bio, so a directory page without bio never touches the table.
+    __table_args__ = (
+        Index("ix_profiles_owner_dir", "user_id", "updated_at", "id", "is_published",
+              "name", "headline", "public_slug", "avatar_url"),
+        Index("ix_profiles_published_dir", "is_published", "updated_at", "id", "user_id",
+              "name", "headline", "public_slug", "avatar_url"),
+        Index("ix_profiles_avatar_sha256", "avatar_sha256"),  # profiles to refresh when variants land
+    )
 
 class Slot(Base):
     __tablename__ = "slots"
@@ -59,7 +195,36 @@ class Slot(Base):
     time = Column(String)  # HH:MM
     timezone = Column(String)
     status = Column(String)  # open, booked, closed
+    # Canonical time: UTC epoch seconds + length. date/time/timezone are kept as entered;
+    # rows from before starts_at existed are backfilled by run_slot_backfill().
+    starts_at = Column(Integer, nullable=True)
+    duration_min = Column(Integer, nullable=True)
+    # Why the backfill left a legacy row without a start: "unparseable" or "duplicate of <id>".
+    backfill_issue = Column(String, nullable=True)
     profile = relationship("Profile", back_populates="slots")
+    # Interval index: one slot per start per profile. Serves range scans ordered by (starts_at, id)
+    # (SQLite appends rowid) and bounded overlap seeks.
+    __table_args__ = (Index("ux_slots_profile_start", "profile_id", "starts_at", unique=True),)
+
+class AvailabilityRule(Base):
+    """Weekly pattern expanded into slots at query time, e.g. Tue/Thu 09:00-12:00 in 30-minute slots."""
+    __tablename__ = "availability_rules"
+    id = Column(Integer, primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), index=True)
+    weekdays = Column(String)  # "1,3" (Monday = 0)
+    start_time = Column(String)  # HH:MM local
+    end_time = Column(String)
+    slot_minutes = Column(Integer)
+    timezone = Column(String)
+    valid_from = Column(String)  # ISO date
+    valid_until = Column(String, nullable=True)
+
+class RuleException(Base):
+    __tablename__ = "rule_exceptions"
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey("availability_rules.id"), index=True)
+    date = Column(String)  # local ISO date
+    time = Column(String, nullable=True)  # HH:MM to skip one occurrence; NULL skips the whole day
 
 class Upload(Base):
     __tablename__ = "uploads"
@@ -68,16 +233,125 @@ class Upload(Base):
     mime = Column(String)
     size = Column(Integer)
     owner_user_id = Column(Integer, nullable=True)
+    status = Column(String, nullable=True)  # pending until the last byte arrives, then complete
+    sha256 = Column(String, nullable=True)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    sha256 = Column(String, primary_key=True)  # file lives at upload_store.blob_path(sha256)
+    size = Column(Integer)
+    refcount = Column(Integer, default=0)  # complete Upload rows pointing here; 0 = collectable
+
+class StripeEvent(Base):
+    __tablename__ = "stripe_events"
+    id = Column(String, primary_key=True)  # Stripe event id; duplicates hit the PK
+    customer_key = Column(String, index=True)
+    type = Column(String)
+    payload = Column(Text)
+    status = Column(String, default="pending")  # pending, processing, applied, skipped, superseded, failed
+    error = Column(String, nullable=True)
+    received_at = Column(Integer)  # epoch ms
+    applied_at = Column(Integer, nullable=True)
+    created = Column(Integer, nullable=True)  # Stripe's event.created (epoch s); orders events per customer
+    attempts = Column(Integer, nullable=True)  # failed tries so far
+    next_attempt_at = Column(Integer, nullable=True)  # epoch ms; a pending event is not claimed before it
+    claimed_at = Column(Integer, nullable=True)  # epoch ms the current processing claim was taken
+    __table_args__ = (Index("ix_stripe_events_status_received", "status", "received_at"),
+                      Index("ix_stripe_events_customer_created", "customer_key", "status", "created"))
+
+# Indexes that existing databases get from an online migration rather than the baseline.
+DIRECTORY_INDEXES = {"ix_profiles_owner_dir", "ix_profiles_published_dir"}
+ONLINE_INDEXES = DIRECTORY_INDEXES | {"ix_profiles_avatar_sha256"}
+
+def migrate_baseline(conn):
+    # Adopts databases from before the runner: create missing tables, then the nullable columns
+    # and indexes added since they were created. Fresh databases get the current models here, so
+    # later migrations must tolerate finding their change already made (IF NOT EXISTS).
+    Base.metadata.create_all(bind=conn)
+    for table in Base.metadata.sorted_tables:
+        add_missing_columns(conn, table)
+
+def add_missing_columns(conn, table):
+    """Bring an existing table up to its model: nullable columns and non-online indexes it lacks."""
+    insp = inspect(conn)
+    have = {c["name"] for c in insp.get_columns(table.name)}
+    for col in table.columns:
+        if col.name not in have and col.nullable:
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(conn.dialect)}'))
+    indexes = {i["name"] for i in insp.get_indexes(table.name)}
+    for idx in table.indexes:
+        if idx.name not in indexes and idx.name not in ONLINE_INDEXES:
+            idx.create(bind=conn)
+
+def migrate_profile_updated_at(conn):
+    # Profiles saved before updated_at existed sort as oldest in the directory.
+    conn.execute(update(Profile.__table__).where(Profile.__table__.c.updated_at.is_(None)).values(updated_at=0))
+
+def migrate_profile_search(conn):
+    if IS_SQLITE:
+        profile_search.ensure_index(conn)
 
-Base.metadata.create_all(bind=engine)
+def create_profile_indexes(engine_, names):
+    for idx in Profile.__table__.indexes:
+        if idx.name in names:
+            migrations.create_index_online(engine_, idx)
+
+def migrate_profile_directory_indexes(engine_):
+    create_profile_indexes(engine_, DIRECTORY_INDEXES)
+
+def migrate_profile_avatar_index(engine_):
+    create_profile_indexes(engine_, {"ix_profiles_avatar_sha256"})
+
+def migrate_slot_backfill_issue(conn):
+    add_missing_columns(conn, Slot.__table__)
+
+def migrate_stripe_event_retries(conn):
+    # Retry bookkeeping and Stripe's created time; events stored before this have no `created`
+    # and are applied without the per-customer ordering check.
+    add_missing_columns(conn, StripeEvent.__table__)
+
+# Append only; never renumber or edit an applied migration.
+MIGRATIONS = [
+    migrations.Migration(1, "baseline", migrate_baseline),
+    migrations.Migration(2, "profile_updated_at", migrate_profile_updated_at),
+    migrations.Migration(3, "profile_search_fts", migrate_profile_search),
+    migrations.Migration(4, "profile_directory_indexes", migrate_profile_directory_indexes, online=True),
+    migrations.Migration(5, "stripe_event_retries", migrate_stripe_event_retries),
+    migrations.Migration(6, "profile_avatar_index", migrate_profile_avatar_index, online=True),
+    migrations.Migration(7, "slot_backfill_issue", migrate_slot_backfill_issue),
+]
+
+# Profile search is SQLite FTS5; on other databases the endpoint answers 501.
+SEARCH_ENABLED = IS_SQLITE
 
 app = FastAPI(title="OpenInterview MVP API", version="0.1.0")
-app.include_router(auth_ext_router)
-app.include_router(notify_ext_router)
-app.include_router(security_ext_router)
+
+MIGRATIONS_STOP = threading.Event()
+
+@app.on_event("startup")
+def check_schema():
+    # Registered first so no other startup hook touches an unmigrated database. One read of
+    # schema_migrations when the schema is current; "auto" applies pending migrations (once,
+    # under the migration lock), "check" refuses to start until `python migrate.py` has run.
+    if SCHEMA_MIGRATE == "off":
+        return
+    st = migrations.status(engine, MIGRATIONS)
+    if st["pending"]:
+        if SCHEMA_MIGRATE != "auto":
+            raise RuntimeError(f"database schema is at version {st['version']} with migrations {st['pending']} "
+                               "pending; run `python migrate.py` from backend/")
+        migrations.migrate(engine, MIGRATIONS, online=False)
+    if st["online_pending"]:
+        threading.Thread(target=migrations.run_online, args=(engine, MIGRATIONS, MIGRATIONS_STOP),
+                         name="schema-online", daemon=True).start()
+
 app.include_router(stripe_ext_live_router)
 
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET", "dev-secret-key"))
+# Static files are precompressed at build time and blobs are served byte-for-byte (Range), so
+# neither is compressed per request.
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_level=COMPRESS_GZIP_LEVEL,
+                   brotli_quality=COMPRESS_BROTLI_QUALITY, exclude_paths=("/public", "/api/files", "/api/variants"))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8000", "http://127.0.0.1:8000"],
@@ -85,6 +359,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it is the outermost of ours: durations include compression, CORS and sessions.
+app.add_middleware(RequestMetricsMiddleware)
 
 class ResetRequest(BaseModel):
     email: str
@@ -101,6 +377,7 @@ class ProfileIn(BaseModel):
     avatar_url: Optional[str] = ""
     is_published: bool = False
     public_slug: Optional[str] = None
+    avatar_upload_id: Optional[int] = None
 
 class ProfileOut(ProfileIn):
     id: int
@@ -111,12 +388,38 @@ class SlotIn(BaseModel):
     time: str
     timezone: str
     status: str = "open"
+    duration_min: int = SLOT_DEFAULT_MINUTES
+
+class BookIn(BaseModel):
+    date: str
+    time: str
+    timezone: str
+
+class RuleIn(BaseModel):
+    weekdays: List[int]  # Monday = 0
+    start_time: str
+    end_time: str
+    slot_minutes: int = SLOT_DEFAULT_MINUTES
+    timezone: str = "UTC"
+    valid_from: str
+    valid_until: Optional[str] = None
+
+class RuleExceptionIn(BaseModel):
+    date: str
+    time: Optional[str] = None
 
 class UploadIn(BaseModel):
     filename: str
     mime: str
     size: int
 
+# Too many keys is a validation error (422), like any other malformed body.
+class ProfileBatchIn(BaseModel):
+    slugs: List[str] = Field(max_length=BATCH_GET_MAX)
+
+class UploadBatchIn(BaseModel):
+    ids: List[int] = Field(max_length=BATCH_GET_MAX)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -124,6 +427,377 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def run_db(fn, *args):
+    """Run fn(session, *args) from async code on whichever engine mode is active."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await run_in_threadpool(call)
+
+def _pool_snapshot(pool) -> dict:
+    out = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0),
+                   checked_in=pool.checkedin())
+    return out
+
+def pool_status() -> dict:
+    out = _pool_snapshot(engine.pool)
+    with _pool_stats_lock:
+        out.update(POOL_STATS)
+    if async_engine is not None:
+        out["async_pool"] = async_pool_status()
+    return out
+
+def async_pool_status() -> dict:
+    out = _pool_snapshot(async_engine.pool)
+    with _pool_stats_lock:
+        out.update(ASYNC_POOL_STATS)
+    return out
+
+def register_pool_metrics(prefix: str, fn):
+    register_snapshot(fn,
+                      gauges={f"{prefix}_size": "size", f"{prefix}_checked_out": "checked_out",
+                              f"{prefix}_overflow": "overflow", f"{prefix}_wait_seconds_max": "wait_seconds_max"},
+                      counters={f"{prefix}_checkouts_total": "checkouts", f"{prefix}_waits_total": "waits",
+                                f"{prefix}_wait_seconds_total": "wait_seconds_total"})
+
+register_pool_metrics("db_pool", pool_status)
+if async_engine is not None:
+    register_pool_metrics("db_async_pool", async_pool_status)
+
+PROFILE_CACHE = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+register_counter("profile_cache_hits_total", lambda: PROFILE_CACHE.hits)
+register_counter("profile_cache_misses_total", lambda: PROFILE_CACHE.misses)
+register_gauge("profile_cache_entries", lambda: PROFILE_CACHE.stats()["size"])
+
+def forget_profiles_with_avatar(digest: str):
+    """Variants for this image just landed: drop cached profiles that still show them as empty."""
+    with SessionLocal() as db:
+        slugs = db.scalars(select(Profile.public_slug).where(Profile.avatar_sha256==digest)).all()
+    for slug in slugs:
+        PROFILE_CACHE.pop(slug)
+
+VARIANTS = VariantPool(upload_store.UPLOAD_DIR, on_rendered=forget_profiles_with_avatar)
+register_gauge("image_variants_pending", VARIANTS.pending)
+register_counter("image_variants_rendered_total", lambda: VARIANTS.rendered)
+register_counter("image_variants_failed_total", lambda: VARIANTS.failed)
+register_counter("image_variants_rejected_total", lambda: VARIANTS.rejected)
+
+def variant_urls(digest: Optional[str]) -> dict:
+    """{"64": {"webp": url, "jpg": url}, ...} for rendered variants; {} if none (yet).
+
+    A missing manifest is (re)submitted here, so images the pool turned away or failed to
+    render get another try; the finished render evicts the cached profile.
+    """
+    manifest = read_manifest(upload_store.UPLOAD_DIR, digest) if digest else None
+    if not manifest:
+        src = upload_store.blob_path(digest) if digest else None
+        if src is not None and src.is_file():
+            VARIANTS.submit(digest, str(src))
+        return {}
+    return {size: {ext: f"{BASE_URL}/api/variants/{digest}/{name}" for ext, name in files.items()}
+            for size, files in manifest.items()}
+
+def profile_dict(prof) -> dict:
+    return {
+        "id": prof.id,
+        "name": prof.name,
+        "headline": prof.headline,
+        "bio": prof.bio,
+        "avatar_url": prof.avatar_url,
+        "avatar_variants": variant_urls(prof.avatar_sha256),
+        "public_slug": prof.public_slug,
+    }
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def upload_dict(rec) -> dict:
+    return {"id": rec.id, "filename": rec.filename, "mime": rec.mime, "size": rec.size,
+            "status": rec.status or "pending", "sha256": rec.sha256}
+
+def slot_dict(s) -> dict:
+    return {"id": s.id, "date": s.date, "time": s.time, "timezone": s.timezone, "status": s.status,
+            "starts_at": s.starts_at, "duration_min": s.duration_min}
+
+def slot_start(date_s: str, time_s: str, tz: str) -> int:
+    """UTC epoch seconds of a local date/time; raises ValueError/ZoneInfoNotFoundError."""
+    return int(datetime.fromisoformat(f"{date_s}T{time_s}").replace(tzinfo=ZoneInfo(tz or "UTC")).timestamp())
+
+def validate_slots(items: List[SlotIn]) -> List[dict]:
+    """Check the whole batch up front; returns per-item errors (empty when valid)."""
+    errors = []
+    if len(items) > MAX_SLOT_BATCH:
+        errors.append({"index": None, "error": f"batch exceeds {MAX_SLOT_BATCH} slots"})
+        return errors
+    for i, it in enumerate(items):
+        try:
+            date_cls.fromisoformat(it.date)
+        except ValueError:
+            errors.append({"index": i, "error": "date must be YYYY-MM-DD"})
+        try:
+            if len(it.time) != 5:
+                raise ValueError
+            time_cls.fromisoformat(it.time)
+        except ValueError:
+            errors.append({"index": i, "error": "time must be HH:MM"})
+        if it.status not in SLOT_STATUSES:
+            errors.append({"index": i, "error": f"status must be one of {', '.join(SLOT_STATUSES)}"})
+        if not 1 <= it.duration_min <= SLOT_MAX_MINUTES:
+            errors.append({"index": i, "error": f"duration_min must be 1-{SLOT_MAX_MINUTES}"})
+        try:
+            ZoneInfo(it.timezone or "UTC")
+        except Exception:
+            errors.append({"index": i, "error": "timezone must be an IANA name (e.g. Europe/Paris)"})
+    return errors
+
+def batch_overlaps(intervals: List[tuple]) -> List[dict]:
+    """Overlaps inside one request; intervals are (index, profile_id, start, end)."""
+    errors, last = [], {}
+    for i, pid, start, end in sorted(intervals, key=lambda v: (v[1], v[2])):
+        prev = last.get(pid)
+        if prev and prev[1] > start:
+            errors.append({"index": i, "error": f"overlaps item {prev[0]}"})
+        if not prev or end > prev[1]:
+            last[pid] = (i, end)
+    return errors
+
+def lock_profiles(db: Session, profile_ids) -> None:
+    """Serialize interval writes per profile so the overlap check and the write see the same rows."""
+    if IS_SQLITE:
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")  # single writer; take it before reading
+    else:
+        db.execute(select(Profile.id).where(Profile.id.in_(sorted(profile_ids))).order_by(Profile.id).with_for_update())
+
+def stored_overlaps(db: Session, intervals: List[tuple]) -> List[dict]:
+    """Overlaps with existing slots: one range read per profile over the interval index,
+    then a bisect per item, so each check is O(log n + slots within SLOT_MAX_MINUTES)."""
+    errors, span = [], SLOT_MAX_MINUTES * 60
+    by_profile = {}
+    for iv in intervals:
+        by_profile.setdefault(iv[1], []).append(iv)
+    for pid, ivs in by_profile.items():
+        lo, hi = min(v[2] for v in ivs) - span, max(v[3] for v in ivs)
+        rows = db.execute(select(Slot.id, Slot.starts_at, Slot.duration_min)
+                          .where(Slot.profile_id==pid, Slot.starts_at > lo, Slot.starts_at < hi)
+                          .order_by(Slot.starts_at)).all()
+        starts = [r.starts_at for r in rows]
+        for i, _, start, end in ivs:
+            j = bisect.bisect_left(starts, end) - 1
+            while j >= 0 and starts[j] > start - span:
+                if starts[j] + (rows[j].duration_min or SLOT_DEFAULT_MINUTES) * 60 > start:
+                    errors.append({"index": i, "error": f"overlaps slot {rows[j].id}"})
+                    break
+                j -= 1
+    return errors
+
+def encode_cursor(key: int, row_id: int) -> str:
+    """Opaque keyset cursor for a (sort key, id) position: slots' starts_at, profiles' updated_at."""
+    return base64.urlsafe_b64encode(f"{key}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        ts, i = base64.urlsafe_b64decode(cursor + "===").decode().split("|")
+        return int(ts), int(i)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def viewer_zone(tz: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz or "UTC")
+    except Exception:
+        raise HTTPException(status_code=422, detail="tz must be an IANA name (e.g. Europe/Paris)")
+
+def local_day_start(day: str, zone: ZoneInfo) -> int:
+    try:
+        return int(datetime.combine(date_cls.fromisoformat(day), time_cls(0), zone).timestamp())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="from/to must be YYYY-MM-DD")
+
+def localize(items: List[dict], zone: ZoneInfo) -> List[dict]:
+    """Add start/end as ISO 8601 in the viewer's zone."""
+    for it in items:
+        start = datetime.fromtimestamp(it["starts_at"], zone)
+        it["start"] = start.isoformat()
+        it["end"] = (start + timedelta(minutes=it["duration_min"])).isoformat()
+    return items
+
+RECENT_EVENTS = TTLCache(maxsize=10000, ttl=3600)
+
+def stripe_object(event: dict) -> dict:
+    return (event.get("data") or {}).get("object") or event
+
+def event_customer_key(event: dict) -> str:
+    obj = stripe_object(event)
+    uid = (obj.get("metadata") or {}).get("user_id") or obj.get("user_id")
+    return obj.get("customer") or (f"user:{uid}" if uid else "") or obj.get("customer_email") or "unknown"
+
+def record_stripe_event(db: Session, event: dict) -> dict:
+    """Persist a verified event once and hand it to the worker; never applies it inline."""
+    eid = event["id"]
+    if RECENT_EVENTS.get(eid):
+        return {"event_id": eid, "duplicate": True}
+    key = event_customer_key(event)
+    created = event.get("created")
+    db.add(StripeEvent(id=eid, customer_key=key, type=event.get("type", "unknown"), payload=json.dumps(event),
+                       status="pending", received_at=int(time.time() * 1000), attempts=0,
+                       created=int(created) if isinstance(created, (int, float)) else None))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        RECENT_EVENTS.set(eid, True)
+        return {"event_id": eid, "duplicate": True}
+    RECENT_EVENTS.set(eid, True)
+    WEBHOOK_QUEUE.submit(key, eid)
+    return {"event_id": eid, "duplicate": False}
+
+def apply_subscription(db: Session, event: dict) -> bool:
+    """Copy subscription fields from an event onto its User; False when no user matches."""
+    obj = stripe_object(event)
+    customer = obj.get("customer")
+    user_id = (obj.get("metadata") or {}).get("user_id") or obj.get("user_id")
+    email = obj.get("customer_email") or (obj.get("customer_details") or {}).get("email")
+    user = None
+    if customer:
+        user = db.query(User).filter(User.stripe_customer_id==customer).first()
+    if not user and user_id:
+        user = db.query(User).filter(User.id==int(user_id)).first()
+    if not user and email:
+        user = db.query(User).filter(User.email==email).first()
+    if not user:
+        if not user_id:
+            return False
+        user = User(id=int(user_id), email=email or f"user{user_id}@example.com")
+        db.add(user)
+    if customer:
+        user.stripe_customer_id = customer
+    if obj.get("subscription") or obj.get("object") == "subscription":
+        user.subscription_id = obj.get("subscription") or obj.get("id")
+    plan = obj.get("plan")
+    if isinstance(plan, dict):
+        plan = plan.get("nickname") or plan.get("id")
+    if plan:
+        user.subscription_plan = plan
+    status = obj.get("status")
+    if event.get("type") == "checkout.session.completed":
+        status = "active"
+    elif event.get("type") == "customer.subscription.deleted":
+        status = "canceled"
+    if status:
+        user.subscription_status = status
+    last4 = obj.get("last4")
+    if last4 is not None:
+        user.last4 = last4[:4] or None
+    return True
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next try after `attempts` failures."""
+    return min(STRIPE_WEBHOOK_RETRY_BASE * 2 ** (max(attempts, 1) - 1), STRIPE_WEBHOOK_RETRY_MAX)
+
+def claim_stripe_event(db: Session, event_id: str, now: int) -> bool:
+    """Move a due event to processing. Only the caller whose UPDATE matched applies it, so the
+    worker that received it and another replaying it at startup never both do."""
+    res = db.execute(update(StripeEvent).where(
+        StripeEvent.id==event_id,
+        or_(StripeEvent.status=="pending",
+            and_(StripeEvent.status=="processing", StripeEvent.claimed_at < now - STRIPE_WEBHOOK_LEASE * 1000)),
+        or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now))
+        .values(status="processing", claimed_at=now))
+    db.commit()
+    return res.rowcount == 1
+
+def lock_customer(db: Session, key: str) -> None:
+    """Serialize applies per customer across workers, so the ordering check and the write agree."""
+    if IS_SQLITE:
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    elif engine.dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:k))"), {"k": key})
+
+def superseded(db: Session, ev: StripeEvent) -> bool:
+    """True when an event Stripe created later for the same customer has already been applied."""
+    if ev.created is None:
+        return False
+    return db.scalar(select(StripeEvent.id).where(
+        StripeEvent.customer_key==ev.customer_key, StripeEvent.status=="applied",
+        StripeEvent.created > ev.created).limit(1)) is not None
+
+def process_stripe_event(event_id: str):
+    """Apply one queued event. A failure puts it back to pending with a doubling delay and raises
+    RetryLater, so the queue counts it and runs it again; after STRIPE_WEBHOOK_MAX_ATTEMPTS it
+    stays failed and the error is re-raised."""
+    db = SessionLocal()
+    try:
+        now = int(time.time() * 1000)
+        try:
+            claimed = claim_stripe_event(db, event_id, now)
+        except Exception as e:
+            db.rollback()
+            raise RetryLater(retry_delay(1)) from e
+        if not claimed:
+            ev = db.get(StripeEvent, event_id)
+            if ev and ev.status == "pending" and ev.next_attempt_at and ev.next_attempt_at > now:  # woke early
+                WEBHOOK_QUEUE.submit_later(ev.customer_key, event_id, (ev.next_attempt_at - now) / 1000)
+            return
+        ev = db.get(StripeEvent, event_id)
+        key = ev.customer_key
+        try:
+            lock_customer(db, key)
+            ev = db.get(StripeEvent, event_id, populate_existing=True)
+            if superseded(db, ev):
+                ev.status = "superseded"
+            else:
+                ev.status = "applied" if apply_subscription(db, json.loads(ev.payload)) else "skipped"
+            ev.error, ev.next_attempt_at, ev.applied_at = None, None, int(time.time() * 1000)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            ev = db.get(StripeEvent, event_id, populate_existing=True)
+            ev.attempts = (ev.attempts or 0) + 1
+            ev.error = str(e)[:500]
+            if ev.attempts >= STRIPE_WEBHOOK_MAX_ATTEMPTS:
+                ev.status, ev.applied_at = "failed", int(time.time() * 1000)
+                db.commit()
+                raise
+            delay = retry_delay(ev.attempts)
+            ev.status, ev.next_attempt_at = "pending", int(time.time() * 1000 + delay * 1000)
+            db.commit()
+            raise RetryLater(delay) from e
+    finally:
+        db.close()
+
+WEBHOOK_QUEUE = KeyedWorkQueue(process_stripe_event, workers=STRIPE_WEBHOOK_WORKERS, name="stripe-webhook")
+register_gauge("stripe_webhook_queue_depth", WEBHOOK_QUEUE.depth)
+register_counter("stripe_webhook_processed_total", lambda: WEBHOOK_QUEUE.processed)
+register_counter("stripe_webhook_failed_total", lambda: WEBHOOK_QUEUE.failed)
+register_counter("stripe_webhook_retried_total", lambda: WEBHOOK_QUEUE.retried)
+
+def ingest_stripe_event(event: dict) -> dict:
+    db = SessionLocal()
+    try:
+        return record_stripe_event(db, event)
+    finally:
+        db.close()
+
+set_event_sink(ingest_stripe_event)
+
 def slugify(name: str) -> str:
     s = "".join(c.lower() if c.isalnum() else "-" for c in name).strip("-")
     return s or "profile"
@@ -132,6 +806,60 @@ def slugify(name: str) -> str:
 def health():
     return {"status":"ok"}
 
+@app.get("/health/db")
+def health_db():
+    out = {"status": "ok", "pool": pool_status(), "schema": migrations.status(engine, MIGRATIONS)}
+    if IS_SQLITE:
+        out["sqlite"] = {"profile": SQLITE_PROFILE, "pragmas": current_pragmas(engine)}
+    return out
+
+@app.on_event("startup")
+def replay_pending_stripe_events():
+    # Events acknowledged before a restart but not yet applied, in arrival order: pending ones
+    # (a retry waits out its backoff) and claims left by a worker that died mid-apply.
+    db = SessionLocal()
+    now = int(time.time() * 1000)
+    try:
+        pending = (db.query(StripeEvent.id, StripeEvent.customer_key, StripeEvent.status, StripeEvent.next_attempt_at,
+                            StripeEvent.claimed_at)
+                   .filter(StripeEvent.status.in_(("pending", "processing")))
+                   .order_by(StripeEvent.received_at).all())
+    finally:
+        db.close()
+    for eid, key, status, next_at, claimed_at in pending:
+        if status == "processing":
+            delay = max(0, (claimed_at or 0) + STRIPE_WEBHOOK_LEASE * 1000 - now) / 1000
+        else:
+            delay = max(0, (next_at or 0) - now) / 1000
+        if delay:
+            WEBHOOK_QUEUE.submit_later(key, eid, delay)
+        else:
+            WEBHOOK_QUEUE.submit(key, eid)
+
+BACKFILL_STOP = threading.Event()
+register_counter("slot_backfill_migrated_total", lambda: BACKFILL["migrated"])
+register_counter("slot_backfill_skipped_total", lambda: BACKFILL["skipped"])
+register_counter("slot_backfill_duplicates_total", lambda: BACKFILL["duplicates"])
+register_counter("slot_backfill_unparseable_total", lambda: BACKFILL["unparseable"])
+register_counter("slot_backfill_errors_total", lambda: BACKFILL["errors"])
+register_gauge("slot_backfill_done", lambda: int(BACKFILL["done"]))
+
+@app.on_event("startup")
+def start_slot_backfill():
+    threading.Thread(target=run_slot_backfill, args=(BACKFILL_STOP,), name="slot-backfill", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_webhook_workers():
+    WEBHOOK_QUEUE.stop()
+    VARIANTS.shutdown()
+    BACKFILL_STOP.set()
+    MIGRATIONS_STOP.set()
+
+@app.on_event("shutdown")
+def checkpoint_on_shutdown():
+    if IS_SQLITE and SQLITE_SHUTDOWN_CHECKPOINT and SQLITE_PRAGMAS.get("journal_mode", "").upper() == "WAL":
+        wal_checkpoint(engine, SQLITE_SHUTDOWN_CHECKPOINT)
+
 @app.post("/api/auth/reset")
 def request_reset(payload: ResetRequest):
     return {"ok": True, "message": "Reset email sent (simulated)"}
@@ -148,100 +876,831 @@ def stripe_checkout(user_id: int, plan: str = "pro"):
         return {"url": f"{BASE_URL}/subscription/success.html?plan={plan}"}
     return {"url": f"{BASE_URL}/subscription/success.html?plan={plan}"}
 
-@app.post("/api/stripe/webhook")
-async def stripe_webhook(request: Request):
-    body = await request.json()
-    user_id = body.get("user_id", 1)
-    last4 = body.get("last4", "4242")
-    plan = body.get("plan", "pro")
-    status = body.get("status", "active")
-    db = next(get_db())
-    user = db.query(User).filter(User.id==user_id).first()
-    if not user:
-        user = User(id=user_id, email=f"user{user_id}@example.com")
-        db.add(user)
-    user.subscription_plan = plan
-    user.subscription_status = status
-    user.last4 = last4[:4] if last4 else None
-    db.commit()
-    return {"received": True}
-
 @app.get("/api/stripe/portal")
 def stripe_portal(user_id: int = 1):
     return {"url": f"{BASE_URL}/subscription_test.html"}
 
-@app.post("/api/profile", response_model=ProfileOut)
-def upsert_profile(p: ProfileIn):
-    db = next(get_db())
+# DB-backed operations are written once against a sync Session. The sync routes call
+# them directly; with DB_ASYNC=1 the async routes run the same functions on the async
+# engine via AsyncSession.run_sync, so a request waiting on I/O holds no threadpool slot.
+
+def avatar_digest(db: Session, upload_id: Optional[int]) -> Optional[str]:
+    if upload_id is None:
+        return None
+    rec = db.query(Upload).filter(Upload.id==upload_id).first()
+    if not rec or rec.status != "complete" or rec.mime not in IMAGE_MIMES:
+        raise HTTPException(status_code=422, detail="avatar_upload_id must be a completed image upload")
+    return rec.sha256
+
+def save_profile(db: Session, p: ProfileIn) -> ProfileOut:
     slug = p.public_slug or slugify(p.name)
+    avatar_sha = avatar_digest(db, p.avatar_upload_id)
     existing = db.query(Profile).filter(Profile.user_id==p.user_id, Profile.public_slug==slug).first()
     if existing:
         existing.name = p.name
         existing.headline = p.headline or ""
         existing.bio = p.bio or ""
         existing.avatar_url = p.avatar_url or ""
+        existing.avatar_sha256 = avatar_sha
         existing.is_published = p.is_published
+        existing.updated_at = int(time.time() * 1000)
+        if SEARCH_ENABLED:
+            profile_search.index_profile(db, existing.id, p.name, p.headline, p.bio, p.is_published)
         db.commit()
+        PROFILE_CACHE.pop(slug)
         return ProfileOut(id=existing.id, **p.model_dump())
     obj = Profile(user_id=p.user_id, name=p.name, headline=p.headline or "", bio=p.bio or "",
-                  avatar_url=p.avatar_url or "", is_published=p.is_published, public_slug=slug)
-    db.add(obj); db.commit(); db.refresh(obj)
+                  avatar_url=p.avatar_url or "", avatar_sha256=avatar_sha,
+                  is_published=p.is_published, public_slug=slug, updated_at=int(time.time() * 1000))
+    db.add(obj); db.flush()
+    if SEARCH_ENABLED:
+        profile_search.index_profile(db, obj.id, p.name, p.headline, p.bio, p.is_published)
+    db.commit(); db.refresh(obj)
+    PROFILE_CACHE.pop(slug)
     return ProfileOut(id=obj.id, **p.model_dump())
 
-@app.get("/api/profile/{slug}")
-def get_profile(slug: str):
-    db = next(get_db())
+DIRECTORY_FIELDS = {c.key: c for c in (Profile.id, Profile.user_id, Profile.name, Profile.headline, Profile.bio,
+                                        Profile.avatar_url, Profile.is_published, Profile.public_slug,
+                                        Profile.updated_at)}
+
+def directory_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(DIRECTORY_FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in DIRECTORY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail={"unknown_fields": unknown, "allowed": list(DIRECTORY_FIELDS)})
+    return names
+
+def query_directory(db: Session, owner: Optional[int], published: Optional[bool], updated_since: Optional[int],
+                    updated_before: Optional[int], fields: Optional[str], cursor: Optional[str], limit: int) -> tuple:
+    """Most recently updated profiles first, keyset-paged on (updated_at, id).
+
+    Without `owner` only published profiles are listed. Every query is a seek into one of the
+    directory indexes; selecting only indexed columns (anything but bio) never reads the table.
+    """
+    names = directory_fields(fields)
+    if owner is None and published is not True:
+        if published is False:
+            raise HTTPException(status_code=422, detail="published=false needs owner")
+        published = True
+    cols = [DIRECTORY_FIELDS[n] for n in dict.fromkeys(names + ["id", "updated_at"])]
+    q = select(*cols)
+    if owner is not None:
+        q = q.where(Profile.user_id == owner)
+    if published is not None:
+        q = q.where(Profile.is_published == published)
+    if updated_since is not None:
+        q = q.where(Profile.updated_at >= updated_since)
+    if updated_before is not None:
+        q = q.where(Profile.updated_at < updated_before)
+    if cursor:
+        q = q.where(tuple_(Profile.updated_at, Profile.id) < decode_cursor(cursor))
+    rows = db.execute(q.order_by(Profile.updated_at.desc(), Profile.id.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    return [{n: getattr(r, n) for n in names} for r in rows], next_cursor
+
+def search_profiles(db: Session, q: str, cursor: Optional[str], limit: int) -> tuple:
+    match = profile_search.match_query(q)
+    if match is None:
+        raise HTTPException(status_code=422, detail="q must contain at least one word")
+    try:
+        after = profile_search.decode_cursor(cursor) if cursor else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    items, last = profile_search.search(db, match, after, limit)
+    return items, (profile_search.encode_cursor(*last) if last else None)
+
+def load_public_profile(db: Session, slug: str) -> tuple:
+    generation = PROFILE_CACHE.generation(slug)  # before the read: an upsert committed after it wins
     prof = db.query(Profile).filter(Profile.public_slug==slug).first()
     if not prof or (not prof.is_published):
         raise HTTPException(status_code=404, detail="Profile not found")
-    return {
-        "id": prof.id,
-        "name": prof.name,
-        "headline": prof.headline,
-        "bio": prof.bio,
-        "avatar_url": prof.avatar_url,
-        "public_slug": prof.public_slug,
-    }
+    body = json.dumps(profile_dict(prof), separators=(",", ":")).encode()
+    cached = (body, etag_for(body))
+    PROFILE_CACHE.set(slug, cached, generation)
+    return cached
 
-@app.get("/api/availability/{profile_id}")
-def list_slots(profile_id: int):
-    db = next(get_db())
-    slots = db.query(Slot).filter(Slot.profile_id==profile_id).all()
-    return [{
-        "id": s.id, "date": s.date, "time": s.time, "timezone": s.timezone, "status": s.status
-    } for s in slots]
-
-@app.post("/api/availability")
-def upsert_slots(items: List[SlotIn]):
-    db = next(get_db())
-    out = []
-    for it in items:
-        s = Slot(profile_id=it.profile_id, date=it.date, time=it.time, timezone=it.timezone, status=it.status)
-        db.add(s); db.commit(); db.refresh(s)
-        out.append({"id": s.id, "date": s.date, "time": s.time, "timezone": s.timezone, "status": s.status})
+def profile_response(cached: tuple, request: Request) -> Response:
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+BACKFILL = {"migrated": 0, "skipped": 0, "duplicates": 0, "unparseable": 0, "errors": 0, "done": False}
+BACKFILLED_PROFILES = set()
+
+def legacy_start(date_s: str, time_s: str, tz: str) -> Optional[int]:
+    try:
+        ZoneInfo(tz or "UTC")
+    except Exception:
+        tz = "UTC"  # free-text zones from before validation existed
+    try:
+        return slot_start(date_s, time_s, tz)
+    except (TypeError, ValueError):
+        return None
+
+def backfill_slots(db: Session, after_id: int = 0, profile_id: Optional[int] = None,
+                   batch: int = SLOT_BACKFILL_BATCH) -> tuple:
+    """Give up to `batch` legacy rows (starts_at NULL, no backfill_issue, id > after_id) their UTC start.
+
+    Duplicates were allowed before, so several rows of a profile may share a start. One keeps it:
+    a booked row first, then the slot already holding the start, then the lowest id; an open slot
+    holding the start gives it up to a booked legacy twin. The others, and rows whose date/time
+    can't be parsed, keep NULL and get a backfill_issue (see list_unmigrated_slots).
+    Returns (last_id, seen, migrated, skipped, counts by issue).
+    """
+    q = select(Slot.id, Slot.profile_id, Slot.date, Slot.time, Slot.timezone, Slot.status) \
+        .where(Slot.starts_at.is_(None), Slot.backfill_issue.is_(None), Slot.id > after_id)
+    if profile_id is not None:
+        q = q.where(Slot.profile_id==profile_id)
+    q = q.order_by(Slot.id).limit(batch)
+    first = db.execute(q).all()
+    if not first:
+        return after_id, 0, 0, 0, {"duplicates": 0, "unparseable": 0}
+    locked = {r.profile_id for r in first}
+    lock_profiles(db, locked)
+    # Read again under the lock: another worker may have migrated some of these meanwhile.
+    rows = [r for r in db.execute(q).all() if r.profile_id in locked]
+    if not rows:
+        db.rollback()
+        return after_id, len(first), 0, 0, {"duplicates": 0, "unparseable": 0}
+    groups, issues = {}, []
+    for r in rows:
+        ts = legacy_start(r.date, r.time, r.timezone)
+        if ts is None:
+            issues.append({"b_id": r.id, "b_issue": "unparseable"})
+        else:
+            groups.setdefault((r.profile_id, ts), []).append(r)
+    holders = {}
+    if groups:
+        for h in db.execute(select(Slot.id, Slot.profile_id, Slot.starts_at, Slot.status)
+                            .where(tuple_(Slot.profile_id, Slot.starts_at).in_(list(groups)))).all():
+            holders[(h.profile_id, h.starts_at)] = h
+    place, evict = [], []
+    for key, legacy in groups.items():
+        holder = holders.get(key)
+        candidates = legacy + [holder] if holder else legacy
+        keep = min(candidates, key=lambda c: (c.status != "booked", c is not holder, c.id))
+        for c in candidates:
+            if c is not keep:
+                (evict if c is holder else issues).append({"b_id": c.id, "b_issue": f"duplicate of {keep.id}"})
+        if keep is not holder:
+            place.append({"b_id": keep.id, "b_start": key[1]})
+    t = Slot.__table__
+    if evict:  # frees the start in the unique interval index before the twin takes it
+        db.execute(update(t).where(t.c.id==bindparam("b_id"))
+                   .values(starts_at=None, backfill_issue=bindparam("b_issue")), evict)
+    if issues:
+        db.execute(update(t).where(t.c.id==bindparam("b_id"), t.c.starts_at.is_(None))
+                   .values(backfill_issue=bindparam("b_issue")), issues)
+    if place:
+        db.execute(update(t).where(t.c.id==bindparam("b_id"), t.c.starts_at.is_(None))
+                   .values(starts_at=bindparam("b_start"), duration_min=func.coalesce(t.c.duration_min, SLOT_DEFAULT_MINUTES)),
+                   place)
+    db.commit()
+    counts = {"duplicates": sum(1 for i in issues + evict if i["b_issue"] != "unparseable"),
+              "unparseable": sum(1 for i in issues if i["b_issue"] == "unparseable")}
+    return rows[-1].id, len(rows), len(place), len(rows) - len(place), counts
+
+def ensure_backfilled(db: Session, profile_id: int) -> None:
+    """Reads don't wait for the background pass: a profile's legacy rows are migrated on first use."""
+    if BACKFILL["done"] or profile_id in BACKFILLED_PROFILES:
+        return
+    last, seen = 0, True
+    while seen:
+        last, seen, _, _, _ = backfill_slots(db, last, profile_id)
+    BACKFILLED_PROFILES.add(profile_id)
+
+def run_slot_backfill(stop: threading.Event) -> None:
+    """Online migration of legacy string-only slots, in small batches between requests."""
+    last = 0
+    while not stop.is_set():
+        try:
+            with SessionLocal() as db:
+                last, seen, migrated, skipped, issues = backfill_slots(db, last)
+        except Exception:  # busy database etc.; try the same batch again later
+            BACKFILL["errors"] += 1
+            log.warning("slot backfill batch after id %s failed", last, exc_info=True)
+            stop.wait(1.0)
+            continue
+        BACKFILL["migrated"] += migrated
+        BACKFILL["skipped"] += skipped
+        BACKFILL["duplicates"] += issues["duplicates"]
+        BACKFILL["unparseable"] += issues["unparseable"]
+        if not seen:
+            BACKFILL["done"] = True
+            with engine.begin() as conn:  # the string-ordered index is unused once every row has a start
+                conn.execute(text("DROP INDEX IF EXISTS ix_slots_profile_date_time"))
+            return
+        stop.wait(SLOT_BACKFILL_PAUSE)
+
+SLOT_COLUMNS = (Slot.id, Slot.date, Slot.time, Slot.timezone, Slot.status,
+                Slot.starts_at, Slot.duration_min)  # same keys as slot_dict
+
+def list_unmigrated_slots(db: Session, profile_id: int) -> List[dict]:
+    """Legacy rows of a profile the backfill could not give a start, with the reason, for an admin
+    to fix or delete; they are not listed by query_slots and can't be booked."""
+    ensure_backfilled(db, profile_id)
+    rows = db.execute(select(Slot.id, Slot.date, Slot.time, Slot.timezone, Slot.status, Slot.duration_min,
+                             Slot.backfill_issue)
+                      .where(Slot.profile_id==profile_id, Slot.starts_at.is_(None)).order_by(Slot.id)).all()
+    return [r._asdict() for r in rows]
+
+def query_slots(db: Session, profile_id: int, date_from: Optional[str], date_to: Optional[str],
+                status: Optional[str], cursor: Optional[str], limit: int, tz: Optional[str] = None) -> tuple:
+    """One range scan of the interval index; from/to are dates in the viewer's zone."""
+    zone = viewer_zone(tz)
+    ensure_backfilled(db, profile_id)
+    # Plain column rows instead of ORM objects: no identity map, no attribute instrumentation.
+    q = db.query(*SLOT_COLUMNS).filter(Slot.profile_id==profile_id, Slot.starts_at.isnot(None))
+    if date_from:
+        q = q.filter(Slot.starts_at >= local_day_start(date_from, zone))
+    if date_to:
+        q = q.filter(Slot.starts_at < local_day_start(date_to, zone) + 86400)
+    if status:
+        q = q.filter(Slot.status == status)
+    if cursor:
+        q = q.filter(tuple_(Slot.starts_at, Slot.id) > decode_cursor(cursor))
+    slots = q.order_by(Slot.starts_at, Slot.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(slots) > limit:
+        slots = slots[:limit]
+        next_cursor = encode_cursor(slots[-1].starts_at, slots[-1].id)
+    return localize([s._asdict() for s in slots], zone), next_cursor
+
+def insert_slots(db: Session, items: List[SlotIn]) -> List[dict]:
+    errors = validate_slots(items)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    if not items:
+        return []
+    rows = [dict(it.model_dump(), starts_at=slot_start(it.date, it.time, it.timezone)) for it in items]
+    intervals = [(i, r["profile_id"], r["starts_at"], r["starts_at"] + r["duration_min"] * 60) for i, r in enumerate(rows)]
+    errors = batch_overlaps(intervals)
+    if errors:
+        raise HTTPException(status_code=409, detail=errors)
+    lock_profiles(db, {r["profile_id"] for r in rows})
+    errors = stored_overlaps(db, intervals)
+    if errors:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=errors)
+    # Multi-row INSERT ... RETURNING (batched by the dialect), one commit for the whole request.
+    # SQLite hands out rowids in VALUES order, so sorting on id restores request order.
+    stmt = insert(Slot.__table__).returning(*(Slot.__table__.c[c.key] for c in SLOT_COLUMNS))
+    out = sorted((r._asdict() for r in db.execute(stmt, rows)), key=lambda r: r["id"])
+    db.commit()
     return out
 
-@app.post("/api/uploads")
-def create_upload(u: UploadIn):
-    db = next(get_db())
-    rec = Upload(filename=u.filename, mime=u.mime, size=u.size)
+def book_slot(db: Session, slot_id: int) -> dict:
+    """open -> booked in one conditional UPDATE; the row's own status is the only arbiter.
+
+    No lock: concurrent bookers (in any worker) race on the UPDATE and the database lets exactly
+    one of them match `status = 'open'`. The read in front only turns away bookers that arrive
+    after the slot is taken, so they never queue for the write lock.
+    """
+    row = db.execute(select(Slot.status, Slot.starts_at, Slot.profile_id).where(Slot.id==slot_id)).first()
+    if row and row.starts_at is None:  # a legacy row: migrate its profile first, it may get a start
+        db.rollback()
+        ensure_backfilled(db, row.profile_id)
+        row = db.execute(select(Slot.status, Slot.starts_at, Slot.profile_id).where(Slot.id==slot_id)).first()
+    if row is None or row.starts_at is None:
+        db.rollback()  # unmigrated rows (duplicates, unparseable) have no start to book
+        raise HTTPException(status_code=404, detail="Slot not found")
+    status = row.status
+    if status == "open":
+        won = db.execute(update(Slot).where(Slot.id==slot_id, Slot.status=="open", Slot.starts_at.isnot(None))
+                         .values(status="booked")).rowcount == 1
+        db.commit()
+        if won:
+            inc("slot_bookings_won_total")
+            return {"booked": True, "id": slot_id}
+        status = db.scalar(select(Slot.status).where(Slot.id==slot_id, Slot.starts_at.isnot(None)))
+    else:
+        db.rollback()
+    if status is None:
+        raise HTTPException(status_code=404, detail="Slot not found")
+    inc("slot_bookings_conflict_total")
+    raise HTTPException(status_code=409, detail={"booked": False, "id": slot_id, "status": status})
+
+def book_interval(db: Session, profile_id: int, b: BookIn) -> dict:
+    """Book the slot (or rule occurrence) starting at the given local time if it is still open."""
+    try:
+        start = slot_start(b.date, b.time, b.timezone)
+    except Exception:
+        raise HTTPException(status_code=422, detail="date/time/timezone invalid")
+    slot_id = db.scalar(select(Slot.id).where(Slot.profile_id==profile_id, Slot.starts_at==start))
+    if slot_id is not None:
+        return book_slot(db, slot_id)
+    # Materializing a rule occurrence is an insert, so it takes the profile's interval lock.
+    lock_profiles(db, {profile_id})
+    row = db.execute(select(Slot.id, Slot.status).where(Slot.profile_id==profile_id, Slot.starts_at==start)).first()
+    if not row:
+        occ = next(iter(rule_occurrences(db, profile_id, start, start + 1)), None)
+        if not occ or stored_overlaps(db, [(0, profile_id, start, start + occ["duration_min"] * 60)]):
+            db.rollback()
+            raise HTTPException(status_code=404, detail="No slot starts at that time")
+        # Booking a rule occurrence materializes it; the stored row then masks the occurrence.
+        new_id = db.execute(insert(Slot.__table__).returning(Slot.__table__.c.id),
+                            [{"profile_id": profile_id, "status": "booked", "date": occ["date"], "time": occ["time"],
+                              "timezone": occ["timezone"], "starts_at": start, "duration_min": occ["duration_min"]}]).scalar_one()
+        db.commit()
+        inc("slot_bookings_won_total")
+        return {"booked": True, "id": new_id}
+    db.rollback()  # a slot appeared at that start meanwhile
+    return book_slot(db, row.id)
+
+def validate_rule(r: RuleIn) -> List[str]:
+    errors = []
+    if not r.weekdays or any(d not in range(7) for d in r.weekdays):
+        errors.append("weekdays must be 0-6 (Monday = 0)")
+    try:
+        if not (len(r.start_time) == len(r.end_time) == 5 and time_cls.fromisoformat(r.start_time) < time_cls.fromisoformat(r.end_time)):
+            raise ValueError
+    except ValueError:
+        errors.append("start_time/end_time must be HH:MM with start before end")
+    if not 1 <= r.slot_minutes <= SLOT_MAX_MINUTES:
+        errors.append(f"slot_minutes must be 1-{SLOT_MAX_MINUTES}")
+    try:
+        ZoneInfo(r.timezone or "UTC")
+    except Exception:
+        errors.append("timezone must be an IANA name (e.g. Europe/Paris)")
+    try:
+        if r.valid_until and date_cls.fromisoformat(r.valid_until) < date_cls.fromisoformat(r.valid_from):
+            errors.append("valid_until must not be before valid_from")
+        date_cls.fromisoformat(r.valid_from)
+    except ValueError:
+        errors.append("valid_from/valid_until must be YYYY-MM-DD")
+    return errors
+
+def rule_dict(rule, exceptions=()) -> dict:
+    return {"id": rule.id, "profile_id": rule.profile_id, "weekdays": recurrence.parse_weekdays(rule.weekdays),
+            "start_time": rule.start_time, "end_time": rule.end_time, "slot_minutes": rule.slot_minutes,
+            "timezone": rule.timezone, "valid_from": rule.valid_from, "valid_until": rule.valid_until,
+            "exceptions": [{"id": e.id, "date": e.date, "time": e.time} for e in exceptions]}
+
+def save_rule(db: Session, profile_id: int, r: RuleIn) -> dict:
+    errors = validate_rule(r)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    rule = AvailabilityRule(profile_id=profile_id, weekdays=",".join(map(str, sorted(set(r.weekdays)))),
+                            start_time=r.start_time, end_time=r.end_time, slot_minutes=r.slot_minutes,
+                            timezone=r.timezone or "UTC", valid_from=r.valid_from, valid_until=r.valid_until)
+    db.add(rule)
+    db.commit()
+    return rule_dict(rule)
+
+def list_rules(db: Session, profile_id: int) -> List[dict]:
+    rules = db.scalars(select(AvailabilityRule).where(AvailabilityRule.profile_id==profile_id)
+                       .order_by(AvailabilityRule.id)).all()
+    exc = {}
+    for e in db.scalars(select(RuleException).where(RuleException.rule_id.in_([r.id for r in rules]))
+                        .order_by(RuleException.date, RuleException.time)).all():
+        exc.setdefault(e.rule_id, []).append(e)
+    return [rule_dict(r, exc.get(r.id, ())) for r in rules]
+
+def delete_rule(db: Session, rule_id: int) -> dict:
+    db.execute(delete(RuleException).where(RuleException.rule_id==rule_id))
+    if not db.execute(delete(AvailabilityRule).where(AvailabilityRule.id==rule_id)).rowcount:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Rule not found")
+    db.commit()
+    return {"ok": True, "id": rule_id}
+
+def add_rule_exception(db: Session, rule_id: int, e: RuleExceptionIn) -> dict:
+    if not db.get(AvailabilityRule, rule_id):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    try:
+        date_cls.fromisoformat(e.date)
+        if e.time is not None and (len(e.time) != 5 or not time_cls.fromisoformat(e.time)):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=422, detail="date must be YYYY-MM-DD and time HH:MM")
+    exc = RuleException(rule_id=rule_id, date=e.date, time=e.time)
+    db.add(exc)
+    db.commit()
+    return {"id": exc.id, "rule_id": rule_id, "date": exc.date, "time": exc.time}
+
+def rule_occurrences(db: Session, profile_id: int, start: int, end: int):
+    """Generated (virtual, open) slots of all the profile's rules starting in [start, end), in order."""
+    rules = db.scalars(select(AvailabilityRule).where(AvailabilityRule.profile_id==profile_id)).all()
+    if not rules:
+        return iter(())
+    skips = {}
+    for e in db.scalars(select(RuleException).where(RuleException.rule_id.in_([r.id for r in rules]))).all():
+        skips.setdefault(e.rule_id, set()).add((e.date, e.time))
+    gens = [({"rule_id": r.id, "id": None, "status": "open", **o} for o in recurrence.expand(
+                recurrence.parse_weekdays(r.weekdays), r.start_time, r.end_time, r.slot_minutes, r.timezone,
+                r.valid_from, r.valid_until, skips.get(r.id, set()), start, end)) for r in rules]
+    return heapq.merge(*gens, key=lambda o: o["starts_at"])
+
+def query_window(db: Session, profile_id: int, date_from: Optional[str], date_to: Optional[str],
+                 status: Optional[str], tz: Optional[str] = None, days: int = 7) -> List[dict]:
+    """Stored slots and rule occurrences starting between two dates (inclusive) in the viewer's
+    zone, merged. `from` defaults to today there and `to` to `days` days later."""
+    zone = viewer_zone(tz)
+    date_from = date_from or datetime.now(zone).date().isoformat()
+    start = local_day_start(date_from, zone)
+    end = local_day_start(date_to, zone) + 86400 if date_to else \
+        local_day_start((date_cls.fromisoformat(date_from) + timedelta(days=days)).isoformat(), zone)
+    ensure_backfilled(db, profile_id)
+    if not 0 < end - start <= SLOT_WINDOW_MAX_DAYS * 86400:
+        raise HTTPException(status_code=422, detail=f"window must be 1-{SLOT_WINDOW_MAX_DAYS} days")
+    span = SLOT_MAX_MINUTES * 60
+    # Earlier stored slots are fetched too: they can still mask occurrences at the window start.
+    stored = [dict(r._asdict(), rule_id=None) for r in db.query(*SLOT_COLUMNS)
+              .filter(Slot.profile_id==profile_id, Slot.starts_at > start - span, Slot.starts_at < end)
+              .order_by(Slot.starts_at)]
+    items = (s for s in recurrence.merge(stored, rule_occurrences(db, profile_id, start, end), span)
+             if s["starts_at"] >= start)
+    return localize([s for s in items if not status or s["status"] == status], zone)
+
+def add_blob_ref(db: Session, digest: str) -> bool:
+    """Atomically take a reference on an existing blob; False if there is none to share."""
+    return db.execute(update(Blob).where(Blob.sha256==digest).values(refcount=Blob.refcount + 1)).rowcount == 1
+
+def insert_upload(db: Session, u: UploadIn) -> dict:
+    if u.size < 0 or u.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+    # No dedup on a client-declared digest: digests are public (variant URLs), so reusing a blob
+    # here would hand its bytes to anyone who knows the hash. complete_upload dedups on the
+    # digest of the bytes actually received.
+    rec = Upload(filename=u.filename, mime=u.mime, size=u.size, status="pending")
     db.add(rec); db.commit(); db.refresh(rec)
     return {
         "id": rec.id,
-        "upload_url": f"{BASE_URL}/uploads/mock/{rec.id}",
+        "upload_url": f"{BASE_URL}/api/uploads/{rec.id}/content",
         "filename": rec.filename, "mime": rec.mime, "size": rec.size
     }
 
-@app.get("/api/uploads/{upload_id}")
-def get_upload(upload_id: int):
-    db = next(get_db())
+def load_pending_upload(db: Session, upload_id: int) -> dict:
+    rec = db.query(Upload).filter(Upload.id==upload_id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if rec.status == "complete":
+        raise HTTPException(status_code=409, detail="Upload already complete")
+    return upload_dict(rec)
+
+def complete_upload(db: Session, upload_id: int, size: int, digest: str) -> dict:
+    # Conditional, so an upload finished twice (two workers, a replayed request) holds one blob reference.
+    done = db.execute(update(Upload).where(Upload.id==upload_id, or_(Upload.status.is_(None), Upload.status!="complete"))
+                      .values(size=size, sha256=digest, status="complete")).rowcount
+    if not done:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload already complete")
+    if not add_blob_ref(db, digest):
+        try:
+            db.add(Blob(sha256=digest, size=size, refcount=1))
+            db.flush()
+        except IntegrityError:  # another upload of the same bytes registered it first
+            db.rollback()
+            add_blob_ref(db, digest)
+    db.commit()
+    return upload_dict(db.get(Upload, upload_id))
+
+def issue_download_link(db: Session, upload_id: int, ttl: int) -> dict:
     rec = db.query(Upload).filter(Upload.id==upload_id).first()
     if not rec:
         raise HTTPException(status_code=404, detail="Not Found")
-    return {"id": rec.id, "filename": rec.filename, "mime": rec.mime, "size": rec.size}
+    if rec.status != "complete" or not rec.sha256:
+        raise HTTPException(status_code=409, detail="Upload not complete")
+    # Everything the download needs rides in the signed token, so serving it needs no DB read.
+    token = sign_link({"sha": rec.sha256, "mime": rec.mime, "name": rec.filename}, ttl, secret=DOWNLOAD_SIGNING_SECRET)
+    return {"id": rec.id, "url": f"{BASE_URL}/api/files/{token}", "expires_in": ttl}
 
-app.mount("/public", StaticFiles(directory="../public"), name="public")
+def delete_upload_row(db: Session, upload_id: int) -> dict:
+    rec = db.query(Upload).filter(Upload.id==upload_id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if rec.status == "complete" and rec.sha256:
+        db.execute(update(Blob).where(Blob.sha256==rec.sha256).values(refcount=Blob.refcount - 1))
+    db.delete(rec)
+    db.commit()
+    return {"ok": True, "id": upload_id}
+
+def collect_blobs(db: Session) -> dict:
+    """Delete unreferenced blobs and abandoned partial uploads."""
+    removed = 0
+    for digest in db.scalars(select(Blob.sha256).where(Blob.refcount <= 0)).all():
+        # Conditional delete: a concurrent dedup that just took a reference wins.
+        if db.execute(delete(Blob).where(Blob.sha256==digest, Blob.refcount <= 0)).rowcount:
+            db.commit()
+            if upload_store.remove_blob(digest, lambda: db.query(Blob.sha256).filter(Blob.sha256==digest).first() is not None):
+                shutil.rmtree(variant_dir(upload_store.UPLOAD_DIR, digest), ignore_errors=True)
+                removed += 1
+    partials = 0
+    for p in upload_store.stale_partials():
+        p.unlink(missing_ok=True)
+        upload_store.HashState.drop(int(p.stem))
+        partials += 1
+    db.commit()
+    return {"blobs_removed": removed, "partials_removed": partials}
+
+def load_upload(db: Session, upload_id: int) -> dict:
+    rec = db.query(Upload).filter(Upload.id==upload_id).first()
+    if not rec:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return upload_dict(rec)
+
+def batch_keys(keys: list) -> list:
+    return list(dict.fromkeys(keys))  # de-duplicate, keep request order; the models cap the count
+
+def batch_result(keys: list, found: dict, detail: str) -> dict:
+    """One entry per requested key, in request order, so callers can tell which ones are missing."""
+    return {"items": [{"key": k, "found": True, "data": found[k]} if k in found
+                      else {"key": k, "found": False, "error": detail} for k in keys],
+            "missing": [k for k in keys if k not in found]}
+
+def load_public_profiles(db: Session, slugs: List[str]) -> dict:
+    slugs = batch_keys(slugs)
+    rows = db.scalars(select(Profile).where(Profile.public_slug.in_(slugs), Profile.is_published == True)).all() if slugs else []
+    return batch_result(slugs, {p.public_slug: profile_dict(p) for p in rows}, "Profile not found")
+
+def load_uploads(db: Session, ids: List[int]) -> dict:
+    ids = batch_keys(ids)
+    rows = db.scalars(select(Upload).where(Upload.id.in_(ids))).all() if ids else []
+    return batch_result(ids, {u.id: upload_dict(u) for u in rows}, "Not Found")
+
+sync_api = APIRouter()
+
+@sync_api.post("/api/profile", response_model=ProfileOut)
+def upsert_profile(p: ProfileIn, db: Session = Depends(get_db)):
+    return save_profile(db, p)
+
+@sync_api.get("/api/profile/{slug}")
+def get_profile(slug: str, request: Request, db: Session = Depends(get_db)):
+    # Read-through cache of the serialized public profile; the session stays unused
+    # (no connection checkout) on hits and 304s.
+    cached = PROFILE_CACHE.get(slug) or load_public_profile(db, slug)
+    return profile_response(cached, request)
+
+@sync_api.get("/api/availability/{profile_id}")
+def list_slots(profile_id: int,
+               date_from: Optional[str] = Query(None, alias="from"),
+               date_to: Optional[str] = Query(None, alias="to"),
+               status: Optional[str] = None,
+               cursor: Optional[str] = None,
+               limit: int = Query(SLOT_PAGE_DEFAULT, ge=1, le=SLOT_PAGE_MAX),
+               tz: Optional[str] = None,
+               db: Session = Depends(get_db)):
+    items, next_cursor = query_slots(db, profile_id, date_from, date_to, status, cursor, limit, tz)
+    return FastJSONResponse(items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@sync_api.post("/api/availability")
+def upsert_slots(items: List[SlotIn], db: Session = Depends(get_db)):
+    return insert_slots(db, items)
+
+@sync_api.post("/api/uploads")
+def create_upload(u: UploadIn, db: Session = Depends(get_db)):
+    return insert_upload(db, u)
+
+@sync_api.get("/api/uploads/{upload_id}")
+def get_upload(upload_id: int, db: Session = Depends(get_db)):
+    return load_upload(db, upload_id)
+
+async_api = APIRouter()
+
+@async_api.post("/api/profile", response_model=ProfileOut)
+async def upsert_profile_async(p: ProfileIn, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(save_profile, p)
+
+@async_api.get("/api/profile/{slug}")
+async def get_profile_async(slug: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cached = PROFILE_CACHE.get(slug) or await db.run_sync(load_public_profile, slug)
+    return profile_response(cached, request)
+
+@async_api.get("/api/availability/{profile_id}")
+async def list_slots_async(profile_id: int,
+                           date_from: Optional[str] = Query(None, alias="from"),
+                           date_to: Optional[str] = Query(None, alias="to"),
+                           status: Optional[str] = None,
+                           cursor: Optional[str] = None,
+                           limit: int = Query(SLOT_PAGE_DEFAULT, ge=1, le=SLOT_PAGE_MAX),
+                           tz: Optional[str] = None,
+                           db: AsyncSession = Depends(get_async_db)):
+    items, next_cursor = await db.run_sync(query_slots, profile_id, date_from, date_to, status, cursor, limit, tz)
+    return FastJSONResponse(items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@async_api.post("/api/availability")
+async def upsert_slots_async(items: List[SlotIn], db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(insert_slots, items)
+
+@async_api.post("/api/uploads")
+async def create_upload_async(u: UploadIn, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(insert_upload, u)
+
+@async_api.get("/api/uploads/{upload_id}")
+async def get_upload_async(upload_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(load_upload, upload_id)
+
+app.include_router(async_api if DB_ASYNC else sync_api)
+
+@app.get("/api/availability/{profile_id}/unmigrated")
+async def unmigrated_slots(profile_id: int):
+    return await run_db(list_unmigrated_slots, profile_id)
+
+@app.get("/api/availability/{profile_id}/window")
+async def availability_window(profile_id: int, date_from: Optional[str] = Query(None, alias="from"),
+                              date_to: Optional[str] = Query(None, alias="to"), status: Optional[str] = None,
+                              tz: Optional[str] = None, days: int = Query(7, ge=1, le=SLOT_WINDOW_MAX_DAYS)):
+    return FastJSONResponse(await run_db(query_window, profile_id, date_from, date_to, status, tz, days))
+
+@app.post("/api/availability/{profile_id}/rules")
+async def create_rule(profile_id: int, r: RuleIn):
+    return await run_db(save_rule, profile_id, r)
+
+@app.get("/api/availability/{profile_id}/rules")
+async def get_rules(profile_id: int):
+    return await run_db(list_rules, profile_id)
+
+@app.delete("/api/availability/rules/{rule_id}")
+async def remove_rule(rule_id: int):
+    return await run_db(delete_rule, rule_id)
+
+@app.post("/api/availability/rules/{rule_id}/exceptions")
+async def create_rule_exception(rule_id: int, e: RuleExceptionIn):
+    return await run_db(add_rule_exception, rule_id, e)
+
+
+@app.post("/api/slots/{slot_id}/book")
+async def book_slot_by_id(slot_id: int):
+    return await run_db(book_slot, slot_id)
+
+@app.post("/api/availability/{profile_id}/book")
+async def book_slot_at(profile_id: int, b: BookIn):
+    return await run_db(book_interval, profile_id, b)
+
+@app.get("/api/profiles")
+async def list_profiles(owner: Optional[int] = None,
+                        published: Optional[bool] = None,
+                        updated_since: Optional[int] = None,
+                        updated_before: Optional[int] = None,
+                        fields: Optional[str] = None,
+                        cursor: Optional[str] = None,
+                        limit: int = Query(DIRECTORY_PAGE_DEFAULT, ge=1, le=DIRECTORY_PAGE_MAX)):
+    items, next_cursor = await run_db(query_directory, owner, published, updated_since, updated_before,
+                                      fields, cursor, limit)
+    return FastJSONResponse(items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@app.get("/api/profiles/search")
+async def search_profiles_route(q: str = Query(..., min_length=1, max_length=200),
+                                cursor: Optional[str] = None,
+                                limit: int = Query(SEARCH_PAGE_DEFAULT, ge=1, le=SEARCH_PAGE_MAX)):
+    if not SEARCH_ENABLED:
+        raise HTTPException(status_code=501, detail="Profile search needs SQLite FTS5")
+    items, next_cursor = await run_db(search_profiles, q, cursor, limit)
+    return FastJSONResponse(items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+# POST so the paths don't collide with GET /api/profile/{slug} and /api/uploads/{upload_id}.
+@app.post("/api/profile/batch")
+async def get_profiles(body: ProfileBatchIn):
+    return await run_db(load_public_profiles, body.slugs)
+
+@app.post("/api/uploads/batch")
+async def get_uploads(body: UploadBatchIn):
+    return await run_db(load_uploads, body.ids)
+
+@app.head("/api/uploads/{upload_id}/content")
+async def upload_offset(upload_id: int):
+    """Resume point for an interrupted upload: bytes already stored."""
+    await run_db(load_pending_upload, upload_id)
+    return Response(headers={"Upload-Offset": str(upload_store.current_offset(upload_id))})
+
+@app.put("/api/uploads/{upload_id}/content")
+async def put_upload_content(upload_id: int, request: Request):
+    """Stream (a chunk of) the file body to disk.
+
+    Send the whole file in one PUT, or resume/chunk with `Content-Range: bytes start-end/total`
+    where start must equal the current offset (see HEAD). Size limits are checked from the
+    headers before any of the body is read.
+    """
+    rec = await run_db(load_pending_upload, upload_id)
+    try:
+        rng = upload_store.parse_content_range(request.headers.get("content-range"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range")
+    length = request.headers.get("content-length")
+    length = int(length) if length and length.isdigit() else None
+    total = rng[2] if rng else (length if length is not None else rec["size"])
+    if total > UPLOAD_MAX_BYTES or (length or 0) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES} bytes)")
+    if total != rec["size"]:
+        raise HTTPException(status_code=400, detail="Total size does not match declared size")
+    start, expected = (rng[0], rng[1] - rng[0] + 1) if rng else (0, total)
+    if length is not None and length != expected:
+        raise HTTPException(status_code=400, detail="Content-Length does not match Content-Range")
+
+    # The partial file's flock is the upload's lock: a second writer, in any worker, gets 409.
+    try:
+        part = await run_in_threadpool(upload_store.PartialFile, upload_id)
+    except upload_store.UploadBusy:
+        raise HTTPException(status_code=409, detail="Upload in progress",
+                            headers={"Upload-Offset": str(upload_store.current_offset(upload_id))})
+    try:
+        if start != part.offset:
+            raise HTTPException(status_code=409, detail="Offset mismatch", headers={"Upload-Offset": str(part.offset)})
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            if part.offset - start + len(chunk) > expected:
+                await run_in_threadpool(part.discard)
+                raise HTTPException(status_code=413, detail="Body exceeds declared length")
+            await run_in_threadpool(part.write, chunk)
+        await run_in_threadpool(part.save)
+        if part.offset < total:
+            return {"id": upload_id, "offset": part.offset, "complete": False}
+        digest = part.hasher.hexdigest()
+        # Reference first, then place the file, so GC never sees a referenced-but-missing blob.
+        out = await run_db(complete_upload, upload_id, part.offset, digest)
+        blob = await run_in_threadpool(part.finalize, digest)
+    finally:
+        await run_in_threadpool(part.close)
+    if out["mime"] in IMAGE_MIMES:
+        VARIANTS.submit(digest, str(blob))  # decoded/resized in the process pool, not here
+    return {**out, "complete": True}
+
+@app.get("/api/uploads/{upload_id}/link")
+async def upload_link(upload_id: int, ttl: int = Query(DOWNLOAD_URL_TTL, ge=1, le=7 * 24 * 3600)):
+    return await run_db(issue_download_link, upload_id, ttl)
+
+@app.api_route("/api/files/{token}", methods=["GET", "HEAD"])
+def download_blob(token: str, request: Request):
+    data = read_token(token, secret=DOWNLOAD_SIGNING_SECRET)
+    if not data or "sha" not in data:
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    path = upload_store.blob_path(data["sha"])
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    etag = f'"{data["sha"]}"'  # content hash: a strong validator by construction
+    name = "".join(c for c in data.get("name") or "file" if c.isascii() and c.isprintable() and c not in '"\\')
+    headers = {
+        "etag": etag,
+        "content-type": data.get("mime") or "application/octet-stream",
+        "cache-control": f"private, max-age={max(0, int(data['exp'] - time.time()))}, immutable",
+        "content-disposition": f'inline; filename="{name}"',
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"etag": etag})
+    rng_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        rng_header = None
+    try:
+        byte_range = parse_range(rng_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+    return BlobResponse(str(path), size, headers, byte_range)
+
+VARIANT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+@app.api_route("/api/variants/{digest}/{name}", methods=["GET", "HEAD"])
+def get_variant(digest: str, name: str, request: Request):
+    size, _, ext = name.partition(".")
+    if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest) or not size.isdigit() or ext not in VARIANT_TYPES:
+        raise HTTPException(status_code=404, detail="Not Found")
+    path = variant_dir(upload_store.UPLOAD_DIR, digest) / name
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    etag = f'"{digest[:16]}-{name}"'
+    headers = {"etag": etag, "content-type": VARIANT_TYPES[ext],
+               "cache-control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"etag": etag})
+    return BlobResponse(str(path), st.st_size, headers)
+
+@app.delete("/api/uploads/{upload_id}")
+async def delete_upload(upload_id: int):
+    return await run_db(delete_upload_row, upload_id)
+
+@app.post("/api/uploads/gc")
+async def gc_uploads():
+    return await run_db(collect_blobs)
+
+STATIC_FILES = AssetStaticFiles(directory="../public", url_prefix="/public")
+register_gauge("static_cache_entries", lambda: STATIC_FILES.cache.stats()["size"])
+register_counter("static_cache_hits_total", lambda: STATIC_FILES.cache.hits)
+register_counter("static_cache_misses_total", lambda: STATIC_FILES.cache.misses)
+app.mount("/public", STATIC_FILES, name="public")
 
-app.include_router(org_router)
-app.include_router(audit_router)
 app.include_router(metrics_router)
+
+# Rarely used routers load on the first request under their prefix (see addons/lazy_routers.py).
+LAZY_ROUTERS = lazy_routers.install(app, {
+    "/api/auth": "addons.auth_ext:router",
+    "/api/notify": "addons.notify_ext:router",
+    "/api/security": "addons.security_ext:router",
+    "/api/org": "addons.org_ext:router",
+    "/api/audit": "addons.audit_ext:router",
+})
+if EAGER_ROUTERS:
+    for _lazy in LAZY_ROUTERS:
+        _lazy.load()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# Apply pending schema migrations; run once per deploy, before starting the workers.
+# Usage (from backend/): python migrate.py            apply everything, online index builds included
+#                        python migrate.py --status   print applied / pending versions and exit
+#                        python migrate.py --defer-online   leave index builds to the app's background thread
+import json, sys
+import main
+from addons import migrations
+
+def run(argv) -> int:
+    if "--status" in argv:
+        print(json.dumps(migrations.status(main.engine, main.MIGRATIONS)))
+        return 0
+    applied = migrations.migrate(main.engine, main.MIGRATIONS, online="--defer-online" not in argv)
+    print(json.dumps({"applied": applied, **migrations.status(main.engine, main.MIGRATIONS)}))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run(sys.argv[1:]))
@@ -0,0 +1,47 @@
+import importlib, os, pathlib, sys
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+def load_main(db_url: str, **env):
+    """(Re)import backend/main.py against `db_url`; module-level config is read at import."""
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.update({k: str(v) for k, v in env.items()})
+    return importlib.reload(sys.modules["main"]) if "main" in sys.modules else importlib.import_module("main")
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+@pytest.fixture
+def make_main(tmp_path, db_url, monkeypatch):
+    """Factory: a freshly imported, migrated `main` on a throwaway SQLite file (never app.db)."""
+    from addons import upload_store
+    monkeypatch.chdir(ROOT)  # static files are served from ../public
+    monkeypatch.setattr(upload_store, "UPLOAD_DIR", tmp_path / "uploads")
+    saved_env = dict(os.environ)
+    loaded = []
+
+    def make(migrate: bool = True, **env):
+        main = load_main(db_url, **env)
+        if migrate:
+            main.migrations.migrate(main.engine, main.MIGRATIONS, log=lambda *_: None)
+        loaded.append(main)
+        return main
+    yield make
+    for main in loaded:
+        main.engine.dispose()
+    os.environ.clear()
+    os.environ.update(saved_env)
+
+@pytest.fixture
+def main(make_main):
+    return make_main()
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as c:
+        yield c
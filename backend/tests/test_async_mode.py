@@ -0,0 +1,20 @@
+import re
+
+def test_async_mode_serves_the_swapped_routes_and_times_its_pool(make_main):
+    from fastapi.testclient import TestClient
+    main = make_main(DB_ASYNC="1")
+    assert type(main.async_engine.pool) is main.TimedAsyncQueuePool
+    base = dict(main.ASYNC_POOL_STATS)
+    with TestClient(main.app) as client:
+        body = {"user_id": 1, "name": "Ada", "is_published": True, "public_slug": "ada"}
+        assert client.post("/api/profile", json=body).json()["name"] == "Ada"
+        main.PROFILE_CACHE.pop("ada")
+        assert client.get("/api/profile/ada").json()["name"] == "Ada"
+        slot = {"profile_id": 1, "date": "2030-01-07", "time": "09:00", "timezone": "UTC"}
+        assert client.post("/api/availability", json=[slot]).status_code == 200
+        assert [s["time"] for s in client.get("/api/availability/1").json()] == ["09:00"]
+        assert client.post("/api/slots/1/book").json() == {"booked": True, "id": 1}  # a run_db route
+        text = client.get("/metrics").text
+    assert main.ASYNC_POOL_STATS["checkouts"] >= base["checkouts"] + 5
+    checkouts = re.search(r"^db_async_pool_checkouts_total (\d+)$", text, re.M)
+    assert checkouts and int(checkouts.group(1)) >= base["checkouts"] + 5
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+def slot(date, time, status="open", **kw):
+    return {"profile_id": 1, "date": date, "time": time, "timezone": "UTC", "status": status, **kw}
+
+def stored(main):
+    with main.SessionLocal() as db:
+        return db.query(main.Slot).count()
+
+def test_batch_is_validated_as_a_whole_before_anything_is_written(client, main):
+    r = client.post("/api/availability", json=[slot("2030-01-07", "09:00"), slot("2030-13-01", "9am"),
+                                               slot("2030-01-07", "10:00", status="maybe", timezone="Mars/Base")])
+    assert r.status_code == 422
+    assert {(e["index"], e["error"].split()[0]) for e in r.json()["detail"]} == \
+        {(1, "date"), (1, "time"), (2, "status"), (2, "timezone")}
+    assert stored(main) == 0
+
+def test_oversized_batch_is_rejected(make_main):
+    from fastapi.testclient import TestClient
+    main = make_main(MAX_SLOT_BATCH="2")
+    with TestClient(main.app) as client:
+        r = client.post("/api/availability", json=[slot("2030-01-07", f"0{h}:00") for h in range(3)])
+    assert r.status_code == 422 and r.json()["detail"] == [{"index": None, "error": "batch exceeds 2 slots"}]
+
+def test_batch_is_inserted_in_one_transaction_in_request_order(client, main):
+    times = ["11:00", "09:00", "10:00"]
+    out = client.post("/api/availability", json=[slot("2030-01-07", t) for t in times]).json()
+    assert [s["time"] for s in out] == times and len({s["id"] for s in out}) == 3
+
+def test_a_failing_insert_rolls_back_the_whole_batch(client, main, monkeypatch):
+    client.post("/api/availability", json=[slot("2030-01-07", "09:00")])
+    monkeypatch.setattr(main, "stored_overlaps", lambda db, intervals: [])  # let the duplicate reach the INSERT
+    with pytest.raises(IntegrityError):
+        client.post("/api/availability", json=[slot("2030-01-08", "09:00"), slot("2030-01-07", "09:00")])
+    assert stored(main) == 1
+
+def test_list_filters_by_local_date_range_and_status(client):
+    client.post("/api/availability", json=[slot("2030-01-06", "23:30"), slot("2030-01-07", "09:00"),
+                                           slot("2030-01-07", "10:00", status="booked"), slot("2030-01-08", "09:00")])
+    times = lambda **p: [(s["date"], s["time"]) for s in client.get("/api/availability/1", params=p).json()]
+    assert times(**{"from": "2030-01-07", "to": "2030-01-07"}) == [("2030-01-07", "09:00"), ("2030-01-07", "10:00")]
+    assert times(**{"from": "2030-01-07", "status": "open"}) == [("2030-01-07", "09:00"), ("2030-01-08", "09:00")]
+    # 23:30 UTC on the 6th is already the 7th in Paris.
+    assert times(**{"from": "2030-01-07", "to": "2030-01-07", "tz": "Europe/Paris"})[0] == ("2030-01-06", "23:30")
+
+def test_list_pages_with_a_cursor(client):
+    client.post("/api/availability", json=[slot("2030-01-07", f"{h:02d}:00") for h in range(8, 15)])
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/availability/1", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        seen += [s["time"] for s in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == [f"{h:02d}:00" for h in range(8, 15)]
+    assert client.get("/api/availability/1", params={"cursor": "bogus"}).status_code == 400
+    assert client.get("/api/availability/1", params={"limit": 0}).status_code == 422
+
+def test_overlapping_slots_are_rejected_with_409(client, main):
+    client.post("/api/availability", json=[slot("2030-01-07", "09:00", duration_min=60)])
+    r = client.post("/api/availability", json=[slot("2030-01-07", "11:00"), slot("2030-01-07", "09:30")])
+    assert r.status_code == 409 and r.json()["detail"][0]["index"] == 1
+    assert r.json()["detail"][0]["error"].startswith("overlaps slot ")
+    inside = client.post("/api/availability", json=[slot("2030-01-08", "09:00", duration_min=45),
+                                                    slot("2030-01-08", "09:30")])
+    assert inside.status_code == 409 and inside.json()["detail"] == [{"index": 1, "error": "overlaps item 0"}]
+    assert stored(main) == 1  # neither batch wrote anything
+    assert client.post("/api/availability", json=[slot("2030-01-07", "10:00")]).status_code == 200  # back-to-back
+    other = {**slot("2030-01-07", "09:00"), "profile_id": 2}
+    assert client.post("/api/availability", json=[other]).status_code == 200  # another profile's calendar
@@ -0,0 +1,29 @@
+def profile(client, uid, slug, published=True):
+    body = {"user_id": uid, "name": slug.title(), "is_published": published, "public_slug": slug}
+    assert client.post("/api/profile", json=body).status_code == 200
+
+def test_profile_batch_keeps_request_order_and_reports_missing(client):
+    profile(client, 1, "ada")
+    profile(client, 2, "grace")
+    profile(client, 3, "draft", published=False)
+    r = client.post("/api/profile/batch", json={"slugs": ["grace", "nobody", "ada", "draft", "grace"]})
+    assert r.status_code == 200
+    body = r.json()
+    assert [(i["key"], i["found"]) for i in body["items"]] == \
+        [("grace", True), ("nobody", False), ("ada", True), ("draft", False)]
+    assert body["items"][0]["data"]["name"] == "Grace"
+    assert body["items"][1]["error"] == "Profile not found"
+    assert body["missing"] == ["nobody", "draft"]
+
+def test_upload_batch(client):
+    ids = [client.post("/api/uploads", json={"filename": f"{n}.pdf", "mime": "application/pdf", "size": 1}).json()["id"]
+           for n in ("a", "b")]
+    body = client.post("/api/uploads/batch", json={"ids": [ids[1], 999, ids[0]]}).json()
+    assert [i["key"] for i in body["items"]] == [ids[1], 999, ids[0]]
+    assert body["items"][0]["data"]["filename"] == "b.pdf" and body["missing"] == [999]
+
+def test_too_many_keys_is_a_validation_error(client, main):
+    r = client.post("/api/profile/batch", json={"slugs": [f"s{i}" for i in range(main.BATCH_GET_MAX + 1)]})
+    assert r.status_code == 422
+    assert client.post("/api/uploads/batch", json={"ids": list(range(main.BATCH_GET_MAX + 1))}).status_code == 422
+    assert client.post("/api/uploads/batch", json={"ids": list(range(main.BATCH_GET_MAX))}).status_code == 200
@@ -0,0 +1,31 @@
+def slot(date, time, status="open"):
+    return {"profile_id": 1, "date": date, "time": time, "timezone": "UTC", "duration_min": 30, "status": status}
+
+def test_second_booking_of_a_slot_conflicts(client):
+    ids = [s["id"] for s in client.post("/api/availability", json=[slot("2030-01-07", "09:00")]).json()]
+    first = client.post(f"/api/slots/{ids[0]}/book")
+    assert first.status_code == 200 and first.json() == {"booked": True, "id": ids[0]}
+    second = client.post(f"/api/slots/{ids[0]}/book")
+    assert second.status_code == 409
+    assert client.get("/api/availability/1").json()[0]["status"] == "booked"
+
+def test_booking_a_missing_slot_is_404(client):
+    assert client.post("/api/slots/999/book").status_code == 404
+
+def test_book_by_local_time(client):
+    client.post("/api/availability", json=[slot("2030-01-07", "09:30")])
+    body = {"date": "2030-01-07", "time": "09:30", "timezone": "UTC"}
+    assert client.post("/api/availability/1/book", json=body).status_code == 200
+    assert client.post("/api/availability/1/book", json=body).status_code == 409
+
+def test_concurrent_bookers_are_counted_once_each(client, main):
+    from concurrent.futures import ThreadPoolExecutor
+    from addons import metrics_ext
+    slot_id = client.post("/api/availability", json=[slot("2030-01-08", "09:00")]).json()[0]["id"]
+    count = lambda m: metrics_ext.COUNTERS.get((m, ""), 0)
+    won, conflicts = count("slot_bookings_won_total"), count("slot_bookings_conflict_total")
+    with ThreadPoolExecutor(8) as pool:
+        codes = list(pool.map(lambda _: client.post(f"/api/slots/{slot_id}/book").status_code, range(16)))
+    assert sorted(codes) == [200] + [409] * 15
+    assert count("slot_bookings_won_total") - won == 1
+    assert count("slot_bookings_conflict_total") - conflicts == 15
@@ -0,0 +1,54 @@
+import gzip
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from addons.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"items": ["slot"] * 500}
+
+def client():
+    routes = [
+        Route("/big", lambda r: JSONResponse(BIG, headers={"etag": '"abc"'})),
+        Route("/small", lambda r: JSONResponse({"ok": True})),
+        Route("/png", lambda r: Response(b"\x89PNG" * 1000, media_type="image/png")),
+        Route("/encoded", lambda r: Response(b"x" * 2000, media_type="text/plain", headers={"content-encoding": "gzip"})),
+        Route("/stream", lambda r: StreamingResponse(iter([b"a" * 800, b"b" * 800]), media_type="text/plain")),
+        Route("/skip/big", lambda r: JSONResponse(BIG)),
+    ]
+    mw = Middleware(CompressionMiddleware, minimum_size=1024, exclude_paths=("/skip",))
+    return TestClient(Starlette(routes=routes, middleware=[mw]))
+
+def get(c, path, accept="gzip"):
+    # httpx would decode gzip for us; ask for the raw bytes to check what went over the wire.
+    with c.stream("GET", path, headers={"Accept-Encoding": accept}) as r:
+        return r, b"".join(r.iter_raw())
+
+def test_large_json_is_gzipped_with_vary_and_a_weak_etag():
+    r, raw = get(client(), "/big")
+    assert r.headers["content-encoding"] == "gzip" and "Accept-Encoding" in r.headers["vary"]
+    assert r.headers["etag"] == 'W/"abc"' and int(r.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw) == JSONResponse(BIG).body
+
+def test_small_binary_encoded_and_excluded_responses_pass_through():
+    c = client()
+    for path in ("/small", "/png", "/skip/big"):
+        r, _ = get(c, path)
+        assert "content-encoding" not in r.headers, path
+    r, raw = get(c, "/encoded")
+    assert r.headers["content-encoding"] == "gzip" and raw == b"x" * 2000  # not encoded twice
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    r, raw = get(client(), "/stream")
+    assert r.headers["content-encoding"] == "gzip" and "content-length" not in r.headers
+    assert gzip.decompress(raw) == b"a" * 800 + b"b" * 800
+
+def test_negotiation_honors_q_values_and_wildcards():
+    assert choose_encoding("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0.5", ("br", "gzip")) == "gzip"
+    assert choose_encoding("*", ("br", "gzip")) == "br"
+    assert choose_encoding("*;q=0, identity", ("br", "gzip")) is None
+    assert choose_encoding("", ("gzip",)) is None
+    r, _ = get(client(), "/big", accept="identity")
+    assert "content-encoding" not in r.headers
@@ -0,0 +1,25 @@
+import pytest
+from starlette.routing import NoMatchFound
+
+def test_first_request_loads_the_router(client, main):
+    assert main.lazy_routers.loaded(main.LAZY_ROUTERS)["/api/org"] is False
+    r = client.post("/api/org", json={"name": "Acme"})
+    assert r.status_code == 200 and r.json()["name"] == "Acme"
+    assert main.lazy_routers.loaded(main.LAZY_ROUTERS)["/api/org"] is True
+    assert client.get("/api/org/members", params={"org_id": r.json()["id"]}).status_code == 200
+
+def test_unknown_path_under_a_lazy_prefix_is_404(client):
+    assert client.get("/api/audit/nope").status_code == 404
+
+def test_main_routes_under_a_lazy_prefix_still_win(client):
+    assert client.get("/api/auth/reset").status_code == 405  # main's POST-only route, not the placeholder
+
+def test_openapi_includes_lazy_routes(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    assert "/api/org/invite" in paths and "/api/audit" in paths
+
+def test_url_path_for_resolves_routes_of_an_unloaded_router(main):
+    assert main.app.url_path_for("members") == "/api/org/members"
+    assert main.lazy_routers.loaded(main.LAZY_ROUTERS)["/api/org"] is False
+    with pytest.raises(NoMatchFound):
+        main.app.url_path_for("no_such_route")
@@ -0,0 +1,23 @@
+import re
+from addons import metrics_ext
+
+def test_running_totals_are_counters_and_current_values_gauges(client):
+    text = client.get("/metrics").text
+    types = dict(re.findall(r"^# TYPE (\S+) (\S+)$", text, re.M))
+    assert types["db_pool_checkouts_total"] == types["db_pool_waits_total"] == "counter"
+    assert types["db_pool_checked_out"] == types["stripe_webhook_queue_depth"] == "gauge"
+    assert {m for m, t in types.items() if m.endswith("_total") and t != "counter"} == set()
+
+def test_snapshot_is_taken_once_per_scrape(monkeypatch):
+    monkeypatch.setattr(metrics_ext, "SNAPSHOTS", [])
+    calls = []
+
+    def snap():
+        calls.append(1)
+        return {"size": 5, "used": 2}
+    metrics_ext.register_snapshot(snap, gauges={"t_pool_size": "size", "t_pool_used": "used"},
+                                  counters={"t_pool_waits_total": "waits"})
+    text = metrics_ext.render()
+    assert len(calls) == 1
+    assert "# TYPE t_pool_size gauge\nt_pool_size 5\n" in text
+    assert "# TYPE t_pool_waits_total counter\nt_pool_waits_total 0\n" in text
@@ -0,0 +1,35 @@
+import sqlite3
+from sqlalchemy import inspect
+
+def test_fresh_database_is_at_the_latest_version(main):
+    st = main.migrations.status(main.engine, main.MIGRATIONS)
+    assert st["pending"] == [] and st["online_pending"] == []
+    assert st["version"] == max(m.version for m in main.MIGRATIONS)
+
+def test_runner_adopts_a_database_that_predates_it(make_main, db_url, client):
+    client.post("/api/profile", json={"user_id": 1, "name": "Ada Lovelace", "is_published": True})
+    path = db_url[len("sqlite:///"):]
+    con = sqlite3.connect(path)
+    for q in ("DROP TABLE schema_migrations", "DROP TABLE profile_search", "DROP INDEX ix_profiles_owner_dir",
+              "DROP INDEX ix_profiles_published_dir", "UPDATE profiles SET updated_at = NULL"):
+        con.execute(q)
+    con.commit(); con.close()
+
+    main = make_main(migrate=False)
+    assert main.migrations.status(main.engine, main.MIGRATIONS)["version"] == 0
+    applied = main.migrations.migrate(main.engine, main.MIGRATIONS, log=lambda *_: None)
+    assert applied == [m.version for m in main.MIGRATIONS]
+    assert main.migrations.migrate(main.engine, main.MIGRATIONS, log=lambda *_: None) == []
+    indexes = {ix["name"] for ix in inspect(main.engine).get_indexes("profiles")}
+    assert set(main.ONLINE_INDEXES) <= indexes
+    with main.SessionLocal() as db:
+        items, _ = main.search_profiles(db, "ada", None, 10)
+    assert [p["name"] for p in items] == ["Ada Lovelace"]
+
+def test_check_mode_refuses_to_start_with_pending_migrations(make_main):
+    import pytest
+    from fastapi.testclient import TestClient
+    main = make_main(migrate=False, SCHEMA_MIGRATE="check")
+    with pytest.raises(RuntimeError):
+        with TestClient(main.app):
+            pass
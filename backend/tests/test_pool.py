@@ -0,0 +1,19 @@
+import threading, time
+
+def test_only_blocked_checkouts_count_as_waits(make_main):
+    main = make_main(DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0)
+    base = dict(main.POOL_STATS)
+    for _ in range(5):
+        with main.engine.connect():
+            pass
+    assert main.POOL_STATS["waits"] == base["waits"]
+    assert main.POOL_STATS["checkouts"] == base["checkouts"] + 5
+
+    held = main.engine.connect()
+    waiter = threading.Thread(target=lambda: main.engine.connect().close())
+    waiter.start()
+    time.sleep(0.2)
+    held.close()
+    waiter.join(5)
+    assert main.POOL_STATS["waits"] == base["waits"] + 1
+    assert main.POOL_STATS["wait_seconds_max"] >= 0.15
@@ -0,0 +1,85 @@
+from addons.ttl_cache import TTLCache
+
+def test_fill_started_before_an_invalidation_is_dropped():
+    cache = TTLCache(maxsize=10, ttl=60)
+    gen = cache.generation("ada")
+    cache.pop("ada")  # a write commits while the load is in flight
+    assert cache.set("ada", "stale", gen) is False and cache.get("ada") is None
+    assert cache.set("ada", "fresh", cache.generation("ada")) is True and cache.get("ada") == "fresh"
+
+def test_profile_read_racing_an_upsert_does_not_cache_the_old_row(client, main, monkeypatch):
+    body = {"user_id": 1, "name": "Ada", "headline": "old", "is_published": True, "public_slug": "ada"}
+    client.post("/api/profile", json=body)
+    real = main.profile_dict
+    calls = []
+
+    def racing_profile_dict(prof):
+        out = real(prof)  # the row was read before the upsert below commits
+        if not calls:
+            calls.append(1)
+            with main.SessionLocal() as db:
+                main.save_profile(db, main.ProfileIn(**{**body, "headline": "new"}))
+        return out
+    monkeypatch.setattr(main, "profile_dict", racing_profile_dict)
+    assert client.get("/api/profile/ada").json()["headline"] == "old"  # the in-flight read itself
+    assert client.get("/api/profile/ada").json()["headline"] == "new"
+
+def test_finished_variants_evict_profiles_cached_without_them(client, main):
+    from concurrent.futures import Future
+    from addons import upload_store
+    from addons.image_variants import variant_dir
+    digest = "ab" * 32
+    client.post("/api/profile", json={"user_id": 1, "name": "Ada", "is_published": True, "public_slug": "ada"})
+    with main.SessionLocal() as db:
+        db.query(main.Profile).filter(main.Profile.public_slug=="ada").update({"avatar_sha256": digest})
+        db.commit()
+    main.PROFILE_CACHE.pop("ada")
+    assert client.get("/api/profile/ada").json()["avatar_variants"] == {}  # cached while rendering
+    out = variant_dir(upload_store.UPLOAD_DIR, digest)
+    out.mkdir(parents=True)
+    (out / "manifest.json").write_text('{"64": {"webp": "64.webp"}}')
+    done = Future()
+    done.set_result({})
+    main.VARIANTS._done(digest, done)
+    assert list(client.get("/api/profile/ada").json()["avatar_variants"]) == ["64"]
+
+def test_reading_a_profile_resubmits_missing_variants(client, main, monkeypatch):
+    from concurrent.futures import Future
+    from addons import upload_store
+    digest = "cd" * 32
+    src = upload_store.blob_path(digest)
+    src.parent.mkdir(parents=True, exist_ok=True)
+    src.write_bytes(b"not really an image")
+    client.post("/api/profile", json={"user_id": 1, "name": "Ada", "is_published": True, "public_slug": "ada"})
+    with main.SessionLocal() as db:
+        db.query(main.Profile).filter(main.Profile.public_slug=="ada").update({"avatar_sha256": digest})
+        db.commit()
+    submitted = []
+
+    class Executor:
+        def submit(self, fn, *args):
+            submitted.append(args)
+            return Future()
+    monkeypatch.setattr(main.VARIANTS, "workers", 1)
+    monkeypatch.setattr(main.VARIANTS, "max_pending", 0)
+    monkeypatch.setattr(main.VARIANTS, "_executor", lambda: Executor())
+    monkeypatch.setattr("addons.image_variants.HAVE_PIL", True)
+    main.PROFILE_CACHE.pop("ada")
+    client.get("/api/profile/ada")
+    assert main.VARIANTS.rejected == 1 and submitted == []  # pool full: turned away
+
+    monkeypatch.setattr(main.VARIANTS, "max_pending", 4)
+    main.PROFILE_CACHE.pop("ada")
+    client.get("/api/profile/ada")
+    assert submitted == [(str(src), str(main.variant_dir(upload_store.UPLOAD_DIR, digest)))]
+
+    crashed = Future()
+    crashed.set_exception(RuntimeError("worker died"))
+    main.VARIANTS._done(digest, crashed)
+    main.PROFILE_CACHE.pop("ada")
+    client.get("/api/profile/ada")
+    assert len(submitted) == 1  # a failed render waits retry_after before the next try
+    monkeypatch.setattr(main.VARIANTS, "retry_after", 0)
+    main.PROFILE_CACHE.pop("ada")
+    client.get("/api/profile/ada")
+    assert len(submitted) == 2
@@ -0,0 +1,57 @@
+def save(client, uid, name, published=True, **kw):
+    r = client.post("/api/profile", json={"user_id": uid, "name": name, "is_published": published, **kw})
+    assert r.status_code == 200
+    return r.json()
+
+def walk(client, **params):
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/profiles", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        seen += [p["id"] for p in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return seen
+
+def test_directory_cursor_pages_are_stable_under_new_writes(client):
+    ids = [save(client, i, f"P{i}")["id"] for i in range(1, 13)]
+    first = client.get("/api/profiles", params={"fields": "id", "limit": 5})
+    cursor = first.headers["x-next-cursor"]
+    save(client, 100, "Newcomer")  # sorts first (newest); must not shift later pages
+    rest = walk(client, fields="id", limit=5, cursor=cursor)
+    got = [p["id"] for p in first.json()] + rest
+    assert sorted(got) == sorted(ids) and len(got) == len(set(got))
+
+def test_directory_lists_published_only_without_an_owner(client):
+    save(client, 1, "Shown")
+    save(client, 2, "Draft", published=False)
+    assert [p["name"] for p in client.get("/api/profiles").json()] == ["Shown"]
+    assert client.get("/api/profiles", params={"published": "false"}).status_code == 422
+    assert [p["name"] for p in client.get("/api/profiles", params={"owner": 2, "published": "false"}).json()] == ["Draft"]
+
+def test_search_returns_published_profiles_only(client):
+    save(client, 1, "Ada Lovelace", headline="Analytical engine")
+    save(client, 2, "Ada Draft", published=False)
+    names = [p["name"] for p in client.get("/api/profiles/search", params={"q": "ada"}).json()]
+    assert names == ["Ada Lovelace"]
+    save(client, 1, "Ada Lovelace", published=False, public_slug="ada-lovelace")
+    assert client.get("/api/profiles/search", params={"q": "ada"}).json() == []
+
+def test_search_cursor_walks_every_match_once(client):
+    for i in range(17):
+        save(client, i + 1, f"Engine Person {i}", headline="engine engineer")
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/profiles/search", params={"q": "engine", "limit": 5, **({"cursor": cursor} if cursor else {})})
+        seen += [p["id"] for p in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert len(seen) == 17 and len(set(seen)) == 17
+
+def test_directory_and_slot_cursors_share_one_format(client, main):
+    save(client, 1, "Shown")
+    save(client, 2, "Also shown")
+    first = client.get("/api/profiles", params={"fields": "id", "limit": 1})
+    assert main.decode_cursor(first.headers["x-next-cursor"])[1] == first.json()[0]["id"]
+    assert client.get("/api/profiles", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,37 @@
+RULE = {"weekdays": [0, 2], "start_time": "09:00", "end_time": "10:30", "slot_minutes": 30,
+        "timezone": "Europe/Paris", "valid_from": "2030-01-01", "valid_until": "2030-01-31"}  # Mon + Wed
+
+def window(client, **params):
+    r = client.get("/api/availability/1/window", params={"tz": "Europe/Paris", **params})
+    assert r.status_code == 200
+    return [(s["date"], s["time"], s["status"], s["rule_id"]) for s in r.json()]
+
+def test_rule_expands_to_occurrences_inside_the_window_only(client):
+    rule_id = client.post("/api/availability/1/rules", json=RULE).json()["id"]
+    got = window(client, **{"from": "2030-01-07", "to": "2030-01-09"})
+    assert got == [(d, t, "open", rule_id) for d in ("2030-01-07", "2030-01-09") for t in ("09:00", "09:30", "10:00")]
+    assert window(client, **{"from": "2030-02-03", "to": "2030-02-09"}) == []  # past valid_until
+    assert len(window(client, **{"from": "2030-01-06", "days": 14})) == 4 * 3  # 7, 9, 14, 16 Jan
+
+def test_exceptions_and_stored_slots_mask_occurrences(client):
+    rule_id = client.post("/api/availability/1/rules", json=RULE).json()["id"]
+    client.post(f"/api/availability/rules/{rule_id}/exceptions", json={"date": "2030-01-09"})
+    client.post(f"/api/availability/rules/{rule_id}/exceptions", json={"date": "2030-01-07", "time": "10:00"})
+    client.post("/api/availability", json=[{"profile_id": 1, "date": "2030-01-07", "time": "09:00",
+                                            "timezone": "Europe/Paris", "status": "booked", "duration_min": 45}])
+    got = window(client, **{"from": "2030-01-07", "to": "2030-01-09"})
+    assert got == [("2030-01-07", "09:00", "booked", None)]  # the 45-minute booking also hides 09:30
+
+def test_booking_an_occurrence_materializes_it_once(client):
+    client.post("/api/availability/1/rules", json=RULE)
+    body = {"date": "2030-01-07", "time": "09:30", "timezone": "Europe/Paris"}
+    assert client.post("/api/availability/1/book", json=body).status_code == 200
+    assert client.post("/api/availability/1/book", json=body).status_code == 409
+    assert client.post("/api/availability/1/book", json={**body, "time": "09:15"}).status_code == 404
+    assert ("2030-01-07", "09:30", "booked", None) in window(client, **{"from": "2030-01-07", "to": "2030-01-07"})
+
+def test_invalid_rules_and_windows_are_422(client):
+    bad = {**RULE, "weekdays": [7], "start_time": "11:00", "timezone": "Nowhere/City"}
+    assert len(client.post("/api/availability/1/rules", json=bad).json()["detail"]) == 3
+    r = client.get("/api/availability/1/window", params={"from": "2030-01-01", "to": "2030-06-01"})
+    assert r.status_code == 422
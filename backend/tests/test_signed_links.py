@@ -0,0 +1,28 @@
+import base64, hashlib, hmac, json, time
+from addons.signed_links import sign_link, read_token
+
+def test_round_trip_over_many_signatures():
+    # Roughly one signature in eight contains a b"." byte; 2000 tokens cover that many times over.
+    dotted = 0
+    for i in range(2000):
+        token = sign_link({"sha": f"{i:064x}", "n": i}, secret="s3cret")
+        raw = base64.urlsafe_b64decode(token + "===")
+        dotted += b"." in raw[-32:]
+        assert read_token(token, secret="s3cret") == {"sha": f"{i:064x}", "n": i, "exp": json.loads(raw[:-33])["exp"]}
+    assert dotted > 100
+
+def test_rejects_tampered_expired_and_malformed_tokens():
+    token = sign_link({"n": 1}, secret="s3cret")
+    assert read_token(token, secret="other") is None
+    raw = base64.urlsafe_b64decode(token + "===")
+    forged = raw.replace(b'"n":1', b'"n":2')
+    assert read_token(base64.urlsafe_b64encode(forged).decode(), secret="s3cret") is None
+    assert read_token(sign_link({"n": 1}, ttl_seconds=-1, secret="s3cret"), secret="s3cret") is None
+    assert read_token("", secret="s3cret") is None
+    assert read_token("not a token", secret="s3cret") is None
+
+def test_reads_tokens_signed_before_the_fix():
+    payload = json.dumps({"exp": int(time.time()) + 60, "n": 1}, separators=(",", ":"), sort_keys=True).encode()
+    sig = hmac.new(b"s3cret", payload, hashlib.sha256).digest()
+    token = base64.urlsafe_b64encode(payload + b"." + sig).decode().rstrip("=")
+    assert read_token(token, secret="s3cret")["n"] == 1
@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+
+def legacy(main, rows):
+    """Rows as the old API stored them: date/time/timezone strings, no starts_at."""
+    with main.SessionLocal() as db:
+        db.add_all(main.Slot(profile_id=1, date=d, time=t, timezone="UTC", status=s) for d, t, s in rows)
+        db.commit()
+        return [r.id for r in db.query(main.Slot).order_by(main.Slot.id)]
+
+def test_backfill_keeps_the_booked_twin_and_reports_what_it_could_not_place(main):
+    with main.SessionLocal() as db:  # a slot created through the new API, already holding its start
+        db.add(main.Slot(profile_id=1, date="2030-01-02", time="10:00", timezone="UTC", status="open",
+                         starts_at=main.slot_start("2030-01-02", "10:00", "UTC"), duration_min=30))
+        db.commit()
+    current, open_twin, booked_twin, garbled, over_current, plain = legacy(main, [
+        ("2030-01-01", "09:00", "open"), ("2030-01-01", "09:00", "booked"), ("2030-01-01", "nine", "open"),
+        ("2030-01-02", "10:00", "booked"), ("2030-01-03", "09:00", "open")])
+    with TestClient(main.app) as client:
+        listed = {s["id"]: s["status"] for s in client.get("/api/availability/1").json()}
+        assert listed == {booked_twin: "booked", over_current: "booked", plain: "open"}
+        body = {"date": "2030-01-01", "time": "09:00", "timezone": "UTC"}
+        assert client.post("/api/availability/1/book", json=body).status_code == 409  # not the open twin
+        unmigrated = {s["id"]: (s["status"], s["backfill_issue"])
+                      for s in client.get("/api/availability/1/unmigrated").json()}
+    assert unmigrated == {current: ("open", f"duplicate of {over_current}"),
+                          open_twin: ("open", f"duplicate of {booked_twin}"),
+                          garbled: ("open", "unparseable")}
+
+def test_backfill_resumes_past_rows_it_has_already_reported(main):
+    legacy(main, [("2030-01-01", "09:00", "open"), ("2030-01-01", "09:00", "open"), ("bad", "09:00", "open")])
+    with main.SessionLocal() as db:
+        last, seen, migrated, skipped, issues = main.backfill_slots(db)
+        assert (seen, migrated, skipped, issues) == (3, 1, 2, {"duplicates": 1, "unparseable": 1})
+        assert main.backfill_slots(db)[1] == 0  # reported rows are not scanned again
+
+def test_unmigrated_rows_cannot_be_booked_by_id(main):
+    booked, open_twin, garbled, plain = legacy(main, [
+        ("2030-01-01", "09:00", "booked"), ("2030-01-01", "09:00", "open"), ("bad", "09:00", "open"),
+        ("2030-01-02", "09:00", "open")])
+    with TestClient(main.app) as client:
+        assert client.post(f"/api/slots/{open_twin}/book").status_code == 404  # would double-book 09:00
+        assert client.post(f"/api/slots/{garbled}/book").status_code == 404
+        assert client.post(f"/api/slots/{plain}/book").json() == {"booked": True, "id": plain}
+    with main.SessionLocal() as db:
+        assert db.get(main.Slot, open_twin).status == "open"
+
+def test_failed_batches_are_counted_and_retried(main, monkeypatch, caplog):
+    import threading
+    legacy(main, [("2030-01-01", "09:00", "open")])
+    real, calls = main.backfill_slots, []
+
+    def flaky(db, after_id=0, profile_id=None):
+        calls.append(after_id)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real(db, after_id, profile_id)
+    monkeypatch.setattr(main, "backfill_slots", flaky)
+    monkeypatch.setattr(main, "SLOT_BACKFILL_PAUSE", 0)
+    stop = threading.Event()
+    monkeypatch.setattr(stop, "wait", lambda timeout=None: False)  # no 1 s pause after the failure
+    main.run_slot_backfill(stop)
+    assert main.BACKFILL["errors"] == 1 and main.BACKFILL["migrated"] == 1 and main.BACKFILL["done"]
+    assert "slot backfill batch after id 0 failed" in caplog.text
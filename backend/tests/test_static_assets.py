@@ -0,0 +1,53 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+from addons.static_assets import AssetStaticFiles, build, build_manifest
+
+PAGE = '<html><head><script src="/static/js/app.js"></script></head><body>' + "x" * 2000 + "</body></html>"
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "static"
+    (root / "js").mkdir(parents=True)
+    (root / "js" / "app.js").write_text("console.log(1)\n")
+    (root / "index.html").write_text(PAGE)
+    return root
+
+def serve(root):
+    return TestClient(Starlette(routes=[Mount("/static", AssetStaticFiles(directory=str(root), url_prefix="/static"))]))
+
+def test_unbuilt_page_is_rewritten_but_not_compressed_per_request(site):
+    client = serve(site)
+    r = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+    hashed = build_manifest(str(site))["js/app.js"]
+    assert f'src="/static/{hashed}"' in r.text
+    assert "content-encoding" not in r.headers
+
+def test_built_page_is_served_from_its_precompressed_sibling(site):
+    stats = build(str(site))
+    assert stats["pages"] == 1 and (site.parent / "static-build" / "index.html.gz").exists()
+    client = serve(site)
+    r = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["cache-control"] == "no-cache"
+    assert f'src="/static/{build_manifest(str(site))["js/app.js"]}"' in r.text
+    assert "content-encoding" not in client.get("/static/index.html", headers={"Accept-Encoding": "identity"}).headers
+
+def test_build_against_other_assets_is_ignored(site):
+    build(str(site))
+    (site / "js" / "app.js").write_text("console.log(2)\n")  # deployed without rerunning the build
+    client = serve(site)
+    r = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert f'src="/static/{build_manifest(str(site))["js/app.js"]}"' in r.text
+
+def test_fingerprint_of_a_file_edited_after_startup_is_not_served(site):
+    client = serve(site)
+    old = build_manifest(str(site))["js/app.js"]
+    assert f'src="/static/{old}"' in client.get("/static/index.html").text
+    (site / "js" / "app.js").write_text("console.log('edited in place')\n")
+    assert client.get(f"/static/{old}").status_code == 404  # never the new bytes under the old hash
+    new = build_manifest(str(site))["js/app.js"]
+    assert f'src="/static/{new}"' in client.get("/static/index.html").text
+    r = client.get(f"/static/{new}")
+    assert r.text == "console.log('edited in place')\n" and r.headers["cache-control"].endswith("immutable")
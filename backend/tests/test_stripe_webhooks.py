@@ -0,0 +1,99 @@
+import json, time
+import pytest
+from addons.webhook_queue import RetryLater
+
+def add_event(main, eid, created=None, user_id=7, plan="pro"):
+    event = {"id": eid, "type": "customer.subscription.updated", "created": created,
+             "data": {"object": {"object": "subscription", "id": "sub_1", "customer": "cus_1",
+                                 "plan": plan, "status": "active", "metadata": {"user_id": user_id}}}}
+    with main.SessionLocal() as db:
+        db.add(main.StripeEvent(id=eid, customer_key="cus_1", type=event["type"], payload=json.dumps(event),
+                                status="pending", received_at=int(time.time() * 1000), attempts=0, created=created))
+        db.commit()
+
+def event_row(main, eid):
+    with main.SessionLocal() as db:
+        return db.get(main.StripeEvent, eid)
+
+def user_plan(main, user_id=7):
+    with main.SessionLocal() as db:
+        return db.get(main.User, user_id).subscription_plan
+
+def test_failed_apply_is_retried_after_backoff(main, monkeypatch):
+    add_event(main, "evt_1", created=100)
+    real, calls = main.apply_subscription, []
+
+    def flaky(db, event):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real(db, event)
+    monkeypatch.setattr(main, "apply_subscription", flaky)
+
+    with pytest.raises(RetryLater) as exc:
+        main.process_stripe_event("evt_1")
+    assert exc.value.delay == main.STRIPE_WEBHOOK_RETRY_BASE
+    ev = event_row(main, "evt_1")
+    assert (ev.status, ev.attempts, ev.error) == ("pending", 1, "database is locked")
+    assert ev.next_attempt_at > time.time() * 1000
+
+    main.process_stripe_event("evt_1")  # not due yet: left alone
+    assert len(calls) == 1 and event_row(main, "evt_1").status == "pending"
+
+    with main.SessionLocal() as db:
+        db.get(main.StripeEvent, "evt_1").next_attempt_at = 0
+        db.commit()
+    main.process_stripe_event("evt_1")
+    ev = event_row(main, "evt_1")
+    assert (ev.status, ev.error, ev.next_attempt_at) == ("applied", None, None)
+    assert user_plan(main) == "pro"
+
+def test_queue_counts_failures_and_gives_up_after_max_attempts(make_main, monkeypatch):
+    main = make_main(STRIPE_WEBHOOK_MAX_ATTEMPTS="2", STRIPE_WEBHOOK_RETRY_BASE="0.01")
+    add_event(main, "evt_1")
+
+    def broken(db, event):
+        raise ValueError("bad payload")
+    monkeypatch.setattr(main, "apply_subscription", broken)
+    try:
+        main.WEBHOOK_QUEUE.submit("cus_1", "evt_1")
+        deadline = time.time() + 5
+        while event_row(main, "evt_1").status != "failed" and time.time() < deadline:
+            time.sleep(0.01)
+        main.WEBHOOK_QUEUE.join()
+    finally:
+        main.WEBHOOK_QUEUE.stop()
+    ev = event_row(main, "evt_1")
+    assert (ev.status, ev.attempts, ev.error) == ("failed", 2, "bad payload")
+    assert (main.WEBHOOK_QUEUE.failed, main.WEBHOOK_QUEUE.retried, main.WEBHOOK_QUEUE.processed) == (2, 1, 0)
+
+def test_claim_is_taken_once(main):
+    add_event(main, "evt_1")
+    now = int(time.time() * 1000)
+    with main.SessionLocal() as db:
+        assert main.claim_stripe_event(db, "evt_1", now)
+        assert not main.claim_stripe_event(db, "evt_1", now)
+        # A claim older than the lease belongs to a dead worker and can be retaken.
+        assert main.claim_stripe_event(db, "evt_1", now + main.STRIPE_WEBHOOK_LEASE * 1000 + 1)
+
+def test_event_older_than_an_applied_one_is_superseded(main):
+    add_event(main, "evt_new", created=200, plan="team")
+    add_event(main, "evt_old", created=100, plan="pro")
+    main.process_stripe_event("evt_new")
+    main.process_stripe_event("evt_old")
+    assert event_row(main, "evt_old").status == "superseded"
+    assert user_plan(main) == "team"
+
+def test_webhook_route_verifies_the_signature_then_queues(client, main):
+    from addons import stripe_ext_live
+    event = {"id": "evt_http", "type": "customer.subscription.updated", "created": 100,
+             "data": {"object": {"object": "subscription", "id": "sub_1", "customer": "cus_1",
+                                 "plan": "team", "status": "active", "metadata": {"user_id": 7}}}}
+    header, raw = stripe_ext_live.sign_webhook(event, stripe_ext_live.STRIPE_SIGNING_SECRET)
+    assert client.post("/api/stripe/webhook", content=raw).status_code == 400  # unsigned
+    r = client.post("/api/stripe/webhook", content=raw, headers={"Stripe-Signature": header})
+    assert r.status_code == 200 and (r.json()["event_id"], r.json()["duplicate"]) == ("evt_http", False)
+    main.WEBHOOK_QUEUE.join()
+    assert event_row(main, "evt_http").status == "applied" and user_plan(main) == "team"
+    again = client.post("/api/stripe/webhook", content=raw, headers={"Stripe-Signature": header})
+    assert again.json()["duplicate"] is True
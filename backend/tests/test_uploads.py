@@ -0,0 +1,138 @@
+import hashlib
+import pytest
+from fastapi import HTTPException
+from addons import upload_store
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+def create(client, size=len(DATA), name="cv.pdf"):
+    return client.post("/api/uploads", json={"filename": name, "mime": "application/pdf", "size": size}).json()["id"]
+
+def put(client, upload_id, chunk, start, total=len(DATA)):
+    return client.put(f"/api/uploads/{upload_id}/content", content=chunk,
+                      headers={"Content-Range": f"bytes {start}-{start + len(chunk) - 1}/{total}"})
+
+def test_chunked_upload_resumes_from_the_stored_offset(client):
+    uid = create(client)
+    r = put(client, uid, DATA[:4096], 0)
+    assert r.json() == {"id": uid, "offset": 4096, "complete": False}
+    assert client.head(f"/api/uploads/{uid}/content").headers["upload-offset"] == "4096"
+    stale = put(client, uid, DATA[:4096], 0)  # replayed chunk
+    assert stale.status_code == 409 and stale.headers["upload-offset"] == "4096"
+    done = put(client, uid, DATA[4096:], 4096)
+    assert done.status_code == 200 and done.json()["complete"] is True
+    assert done.json()["sha256"] == hashlib.sha256(DATA).hexdigest()
+
+def test_oversized_uploads_are_rejected_with_413(client, main):
+    assert client.post("/api/uploads", json={"filename": "big", "mime": "application/pdf",
+                                             "size": main.UPLOAD_MAX_BYTES + 1}).status_code == 413
+    uid = create(client, size=100)
+    r = client.put(f"/api/uploads/{uid}/content", content=b"x" * 100,
+                   headers={"Content-Range": f"bytes 0-99/{main.UPLOAD_MAX_BYTES + 1}"})
+    assert r.status_code == 413
+
+def test_body_longer_than_declared_is_413_and_leaves_the_offset(client):
+    uid = create(client, size=10)
+
+    def body():
+        yield b"x" * 6
+        yield b"x" * 6
+    r = client.put(f"/api/uploads/{uid}/content", content=body(), headers={"Content-Range": "bytes 0-9/10"})
+    assert r.status_code == 413
+    assert client.head(f"/api/uploads/{uid}/content").headers["upload-offset"] == "0"
+
+def test_signed_download_supports_ranges(client):
+    uid = create(client)
+    put(client, uid, DATA, 0)
+    url = client.get(f"/api/uploads/{uid}/link").json()["url"]
+    path = url[url.index("/api/files/"):]
+    full = client.get(path)
+    assert full.status_code == 200 and full.content == DATA
+    part = client.get(path, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert part.content == DATA[100:200]
+    tail = client.get(path, headers={"Range": "bytes=-10"})
+    assert tail.status_code == 206 and tail.content == DATA[-10:]
+    assert client.get(path, headers={"Range": f"bytes={len(DATA)}-"}).status_code == 416
+    etag = full.headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+def test_concurrent_writer_gets_409_and_nothing_is_left_locked(client, main):
+    uid = create(client)
+    holder = upload_store.PartialFile(uid)  # as if another request were mid-stream
+    try:
+        r = put(client, uid, DATA[:4096], 0)
+        assert r.status_code == 409 and r.json()["detail"] == "Upload in progress"
+    finally:
+        holder.close()
+    assert put(client, uid, DATA[:100], 100).status_code == 409  # offset mismatch
+    assert upload_store.PartialFile._busy == set()
+    assert put(client, uid, DATA, 0).json()["complete"] is True
+
+def test_flock_from_another_process_blocks_the_write(client):
+    fcntl = pytest.importorskip("fcntl")
+    uid = create(client)
+    upload_store.ensure_dirs()
+    with open(upload_store.partial_path(uid), "ab") as other:  # a separate open file, like another worker
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)
+        assert put(client, uid, DATA, 0).status_code == 409
+    assert put(client, uid, DATA, 0).status_code == 200
+
+def test_completing_twice_takes_one_blob_reference(client, main):
+    uid = create(client)
+    put(client, uid, DATA, 0)
+    digest = hashlib.sha256(DATA).hexdigest()
+    with main.SessionLocal() as db, pytest.raises(HTTPException) as exc:
+        main.complete_upload(db, uid, len(DATA), digest)
+    assert exc.value.status_code == 409
+    with main.SessionLocal() as db:
+        assert db.get(main.Blob, digest).refcount == 1
+
+def test_a_declared_digest_does_not_grant_an_existing_blob(client):
+    put(client, create(client), DATA, 0)
+    digest = hashlib.sha256(DATA).hexdigest()
+    r = client.post("/api/uploads", json={"filename": "x", "mime": "application/pdf", "size": len(DATA), "sha256": digest})
+    assert r.status_code == 200 and r.json()["upload_url"]
+    assert client.get(f"/api/uploads/{r.json()['id']}/link").status_code == 409  # nothing sent, nothing to fetch
+
+def test_live_hashers_are_bounded_and_evicted_ones_are_rebuilt(client, monkeypatch):
+    monkeypatch.setattr(upload_store, "HASH_STATE_MAX", 2)
+    monkeypatch.setattr(upload_store.HashState, "_live", type(upload_store.HashState._live)())
+    ids = [create(client) for _ in range(3)]
+    for uid in ids:  # three abandoned half-uploads
+        put(client, uid, DATA[:4096], 0)
+    assert list(upload_store.HashState._live) == ids[1:]
+    done = put(client, ids[0], DATA[4096:], 4096)  # its hasher was evicted: rebuilt from disk
+    assert done.json()["sha256"] == hashlib.sha256(DATA).hexdigest()
+    assert ids[0] not in upload_store.HashState._live and len(upload_store.HashState._live) <= 2
+
+def test_same_bytes_share_one_blob_until_the_last_reference_is_collected(client, main, monkeypatch):
+    import os, time
+    digest = hashlib.sha256(DATA).hexdigest()
+    first, second = create(client), create(client, name="copy.pdf")
+    put(client, first, DATA, 0)
+    assert put(client, second, DATA, 0).json()["sha256"] == digest
+    blob = upload_store.blob_path(digest)
+
+    def refcount():
+        with main.SessionLocal() as db:
+            return db.get(main.Blob, digest).refcount
+    assert blob.read_bytes() == DATA and refcount() == 2
+    assert list((upload_store.UPLOAD_DIR / "partial").glob("*.part")) == []
+
+    client.delete(f"/api/uploads/{first}")
+    assert refcount() == 1
+    assert client.post("/api/uploads/gc").json()["blobs_removed"] == 0 and blob.exists()
+    url = client.get(f"/api/uploads/{second}/link").json()["url"]
+    assert client.get(url[url.index("/api/files/"):]).content == DATA
+
+    stale = create(client)
+    put(client, stale, DATA[:100], 0)
+    old = time.time() - upload_store.PARTIAL_TTL - 60
+    os.utime(upload_store.partial_path(stale), (old, old))
+    client.delete(f"/api/uploads/{second}")
+    assert client.post("/api/uploads/gc").json() == {"blobs_removed": 1, "partials_removed": 1}
+    assert not blob.exists() and not upload_store.partial_path(stale).exists()
+    with main.SessionLocal() as db:
+        assert db.get(main.Blob, digest) is None
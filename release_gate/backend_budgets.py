@@ -0,0 +1,36 @@
+# Backend performance budgets as a release-gate step. Each step runs one bench from backend/ with
+# --gate, which exits non-zero when a budget is exceeded; results land in backend/qa/perf/<step>.json.
+# Usage (from the repo root): python release_gate/backend_budgets.py [step ...]   (default: all)
+# COLD_START_ARGS / LOAD_TEST_ARGS override a step's bench arguments (defaults below).
+import os, shlex, subprocess, sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+
+STEPS = {
+    "cold_start": lambda: ["-m", "bench.cold_start", *shlex.split(os.environ.get("COLD_START_ARGS", "3"))],
+    "load_test": lambda: ["-m", "bench.load_test",
+                          *shlex.split(os.environ.get("LOAD_TEST_ARGS", "--concurrency 10 --duration 10 --server"))],
+}
+
+def run_step(name: str) -> int:
+    print(f"\n[Backend budgets] Running {name} ...", flush=True)
+    rc = subprocess.call([sys.executable, *STEPS[name](), "--gate"], cwd=BACKEND)
+    if rc != 0:
+        print(f"[Backend budgets] {name} FAILED (see backend/qa/perf/{name}.json)")
+    else:
+        print(f"[Backend budgets] {name} PASS")
+    return rc
+
+def main(argv) -> int:
+    names = argv or list(STEPS)
+    unknown = [n for n in names if n not in STEPS]
+    if unknown:
+        print(f"unknown steps: {', '.join(unknown)} (have {', '.join(STEPS)})", file=sys.stderr)
+        return 2
+    failed = [n for n in names if run_step(n) != 0]
+    print(f"[ReleaseGate] Backend budgets: {'FAIL (' + ', '.join(failed) + ')' if failed else 'PASS'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
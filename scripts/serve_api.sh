@@ -11,4 +11,4 @@ fi
 export $(cat backend/.env | grep -v '^#' | xargs)
 
 echo "Starting FastAPI server on port ${PORT:-8000}..."
-cd backend && uvicorn main:app --host 0.0.0.0 --port "${PORT:-8000}" --reload
+cd backend && python migrate.py && uvicorn main:app --host 0.0.0.0 --port "${PORT:-8000}" --reload